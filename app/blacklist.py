@@ -0,0 +1,201 @@
+import hashlib
+import math
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from .database import SessionLocal
+from . import models
+
+# "set": exact in-memory hash set (~100 bytes/number)
+# "bloom": Bloom filter (~1.2 bytes/number at 1% FP) + primary-key confirmation in the DB on hits
+INDEX_MODE = os.getenv("BLACKLIST_INDEX", "set")
+BLOOM_FP_RATE = float(os.getenv("BLACKLIST_BLOOM_FP_RATE", "0.01"))
+# How often other processes' additions are picked up (incremental, by created_at)
+REFRESH_SECONDS = float(os.getenv("BLACKLIST_REFRESH_SECONDS", "30"))
+# Each refresh re-reads this far before the previous one: created_at is set before commit
+# (a slow transaction commits a row "in the past") and by other hosts' clocks. Re-adding a
+# number is idempotent, so the overlap only costs re-reading a few rows.
+REFRESH_OVERLAP_SECONDS = float(os.getenv("BLACKLIST_REFRESH_OVERLAP_SECONDS", "300"))
+# Deletions are only seen by a full reload in other processes
+FULL_RELOAD_SECONDS = float(os.getenv("BLACKLIST_FULL_RELOAD_SECONDS", "3600"))
+
+
+class BloomFilter:
+    def __init__(self, capacity: int, fp_rate: float = BLOOM_FP_RATE):
+        capacity = max(capacity, 1024)
+        self.capacity = capacity
+        self.size = int(-capacity * math.log(fp_rate) / (math.log(2) ** 2))
+        self.hashes = max(int(round(self.size / capacity * math.log(2))), 1)
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, key: str):
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+class BlacklistIndex:
+    """
+    In-process opt-out index consulted at upload and dial time in O(1) per number.
+    Loaded at startup, then refreshed incrementally from blacklist.created_at.
+    """
+
+    def __init__(self, mode: str = INDEX_MODE):
+        self.mode = mode
+        self._numbers = set()
+        self._bloom = None
+        self._loaded_until = None
+        self._last_refresh = 0.0
+        self._last_full_load = 0.0
+        self._lock = threading.Lock()
+
+    # --- Building ---
+    def build(self, numbers, expected: int = 0):
+        """Replace the index contents from an iterable of E.164 numbers."""
+        if self.mode == "bloom":
+            bloom = BloomFilter(max(expected * 2, 1024))
+            for number in numbers:
+                bloom.add(number)
+            with self._lock:
+                self._bloom = bloom
+        else:
+            numbers = set(numbers)
+            with self._lock:
+                self._numbers = numbers
+
+    def load(self, db: Session):
+        started = datetime.utcnow()
+        total = db.query(models.Blacklist).count()
+        rows = db.query(models.Blacklist.phone_number).yield_per(10000)
+        self.build((row[0] for row in rows), expected=total)
+        self._loaded_until = started
+        self._last_refresh = self._last_full_load = time.monotonic()
+
+    def refresh(self, db: Session):
+        """Pick up numbers added since the last load/refresh (by this or another process)."""
+        if self._loaded_until is None or time.monotonic() - self._last_full_load > FULL_RELOAD_SECONDS:
+            self.load(db)
+            return
+        started = datetime.utcnow()
+        rows = db.query(models.Blacklist.phone_number).filter(
+            models.Blacklist.created_at >= self._loaded_until - timedelta(seconds=REFRESH_OVERLAP_SECONDS)
+        ).all()
+        for row in rows:
+            self._add_local(row[0])
+        self._loaded_until = started
+        self._last_refresh = time.monotonic()
+        if self._bloom is not None and self._bloom.count > self._bloom.capacity:
+            self.load(db)  # grow the filter
+
+    def maybe_refresh(self, db: Session):
+        if time.monotonic() - self._last_refresh > REFRESH_SECONDS:
+            self.refresh(db)
+
+    def _add_local(self, number: str):
+        with self._lock:
+            if self.mode == "bloom":
+                if self._bloom is None:
+                    self._bloom = BloomFilter(1024)
+                if number not in self._bloom:  # re-read by the refresh overlap: keep count honest
+                    self._bloom.add(number)
+            else:
+                self._numbers.add(number)
+
+    # --- Lookups ---
+    def _maybe_contains(self, number: str) -> bool:
+        if self.mode == "bloom":
+            return self._bloom is not None and number in self._bloom
+        return number in self._numbers
+
+    def contains(self, number: str, db: Session = None) -> bool:
+        if not self._maybe_contains(number):
+            return False
+        if self.mode != "bloom":
+            return True
+        # Bloom hit: confirm with a primary-key lookup
+        own_session = db is None
+        db = db or SessionLocal()
+        try:
+            return db.query(models.Blacklist.phone_number).filter(
+                models.Blacklist.phone_number == number
+            ).first() is not None
+        finally:
+            if own_session:
+                db.close()
+
+    def filter_blacklisted(self, numbers, db: Session) -> set:
+        """Subset of `numbers` that is blacklisted. Bloom hits are confirmed with one IN query per chunk."""
+        hits = [n for n in numbers if self._maybe_contains(n)]
+        if self.mode != "bloom" or not hits:
+            return set(hits)
+        confirmed = set()
+        for i in range(0, len(hits), 500):
+            chunk = hits[i:i + 500]
+            confirmed.update(row[0] for row in db.query(models.Blacklist.phone_number).filter(
+                models.Blacklist.phone_number.in_(chunk)
+            ).all())
+        return confirmed
+
+    # --- Changes ---
+    def add(self, db: Session, number: str, reason: str = None) -> bool:
+        """
+        Persist an opt-out and update the index. Returns False if it was already listed.
+        A single INSERT ... ON CONFLICT DO NOTHING, so two concurrent opt-outs of the same
+        number (AI tool and admin) do not race into an IntegrityError.
+        """
+        table = models.Blacklist.__table__
+        values = dict(phone_number=number, reason=reason, created_at=datetime.utcnow())
+        dialect = db.get_bind().dialect.name
+        if dialect in ("postgresql", "sqlite"):
+            if dialect == "postgresql":
+                from sqlalchemy.dialects.postgresql import insert as dialect_insert
+            else:
+                from sqlalchemy.dialects.sqlite import insert as dialect_insert
+            inserted = db.execute(
+                dialect_insert(table).values(**values).on_conflict_do_nothing(index_elements=["phone_number"])
+            ).rowcount == 1
+        else:
+            try:
+                with db.begin_nested():
+                    db.execute(table.insert().values(**values))
+                inserted = True
+            except IntegrityError:
+                inserted = False
+        db.commit()
+        self._add_local(number)  # also when another process listed it first
+        return inserted
+
+    def remove(self, db: Session, number: str) -> bool:
+        entry = db.query(models.Blacklist).get(number)
+        if not entry:
+            return False
+        db.delete(entry)
+        db.commit()
+        if self.mode == "bloom":
+            self.load(db)  # Bloom filters cannot delete
+        else:
+            with self._lock:
+                self._numbers.discard(number)
+        return True
+
+    def __len__(self):
+        if self.mode == "bloom":
+            return self._bloom.count if self._bloom else 0
+        return len(self._numbers)
+
+
+index = BlacklistIndex()
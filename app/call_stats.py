@@ -0,0 +1,161 @@
+from collections import defaultdict
+from datetime import date, datetime, timezone
+from zoneinfo import ZoneInfo
+from sqlalchemy import and_, func, insert, or_, update
+from sqlalchemy.orm import Session
+from . import models, windows
+
+# Daily campaign statistics, maintained incrementally in call_stats_daily.
+# Each call is counted once, when it reaches a final status: an atomic
+# UPDATE calls SET stats_counted = true ... WHERE stats_counted = false RETURNING ...
+# claims it, so retried callbacks, concurrent workers and the backfill never double count.
+# Flags set after a call was counted (bridge, SMS) add their own +1.
+
+# Days are cut in the operators' timezone
+STATS_TIMEZONE = ZoneInfo(windows.DEFAULT_TIMEZONE)
+
+FINAL_STATUSES = ["completed", "busy", "no-answer", "failed", "canceled"]
+
+# Call flag column -> rollup counter it feeds
+FLAG_COUNTERS = {"bridge_executed": "bridged", "sms_sent_log": "sms_sent"}
+
+COUNTERS = ["calls", "completed", "duration_total", "duration_calls", "bridged", "sms_sent"]
+
+# Rollup key for calls without a scenario / classification (primary key columns cannot be NULL)
+NO_SCENARIO = 0
+NO_CLASSIFICATION = ""
+
+
+def stats_day(started_at: datetime) -> date:
+    """started_at is naive UTC (datetime.utcnow)."""
+    if started_at is None:
+        started_at = datetime.utcnow()
+    return started_at.replace(tzinfo=timezone.utc).astimezone(STATS_TIMEZONE).date()
+
+
+def rollup_key(scenario_id, started_at, classification):
+    return (scenario_id or NO_SCENARIO, stats_day(started_at), classification or NO_CLASSIFICATION)
+
+
+def upsert_stmt(db: Session):
+    """INSERT ... ON CONFLICT (key) DO UPDATE SET counter = counter + excluded.counter."""
+    table = models.CallStatDaily.__table__
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        return None
+    stmt = dialect_insert(table)
+    return stmt.on_conflict_do_update(
+        index_elements=["scenario_id", "day", "classification"],
+        set_={**{c: table.c[c] + stmt.excluded[c] for c in COUNTERS}, "updated_at": stmt.excluded.updated_at},
+    )
+
+
+def apply_deltas(db: Session, deltas: dict):
+    """deltas: {(scenario_id, day, classification): {counter: n}}. Caller commits."""
+    if not deltas:
+        return
+    now = datetime.utcnow()
+    rows = [
+        {"scenario_id": key[0], "day": key[1], "classification": key[2],
+         **{c: counters.get(c, 0) for c in COUNTERS}, "updated_at": now}
+        for key, counters in deltas.items()
+    ]
+    stmt = upsert_stmt(db)
+    if stmt is not None:
+        db.execute(stmt, rows)
+        return
+
+    # Other databases: update-then-insert, like dialer.bump_progress
+    t = models.CallStatDaily.__table__
+    for row in rows:
+        key = and_(t.c.scenario_id == row["scenario_id"], t.c.day == row["day"], t.c.classification == row["classification"])
+        values = {c: t.c[c] + row[c] for c in COUNTERS}
+        if db.execute(update(t).where(key).values(updated_at=now, **values)).rowcount == 0:
+            db.execute(insert(t).values(**row))
+
+
+def count_calls(db: Session, *conditions) -> int:
+    """
+    Count the final-status calls matching `conditions` that were not counted yet.
+    Returns how many calls were added to the rollup. Caller commits.
+    """
+    db.flush()  # pending status/duration/classification changes must be visible to the UPDATE
+    t = models.Call.__table__
+    claimed = db.execute(
+        update(t)
+        .where(*conditions, t.c.status.in_(FINAL_STATUSES), or_(t.c.stats_counted.is_(None), t.c.stats_counted == False))  # noqa: E712
+        .values(stats_counted=True)
+        .returning(t.c.scenario_id, t.c.started_at, t.c.classification, t.c.status,
+                   t.c.duration, t.c.bridge_executed, t.c.sms_sent_log)
+        .execution_options(synchronize_session=False)
+    ).all()
+
+    deltas = defaultdict(lambda: defaultdict(int))
+    for row in claimed:
+        counters = deltas[rollup_key(row.scenario_id, row.started_at, row.classification)]
+        counters["calls"] += 1
+        if row.status == "completed":
+            counters["completed"] += 1
+        if row.duration:
+            counters["duration_total"] += row.duration
+            counters["duration_calls"] += 1
+        for flag, counter in FLAG_COUNTERS.items():
+            if getattr(row, flag):
+                counters[counter] += 1
+    apply_deltas(db, deltas)
+    return len(claimed)
+
+
+def count_call(db: Session, call_sid: str) -> bool:
+    return count_calls(db, models.Call.call_sid == call_sid) > 0
+
+
+def set_flag(db: Session, call_sid: str, flag: str) -> bool:
+    """
+    Set calls.<flag> (bridge_executed / sms_sent_log) once. If the call was already counted,
+    its rollup row gets the +1 now; otherwise count_call picks the flag up later.
+    Returns False if the flag was already set. Caller commits.
+    """
+    t = models.Call.__table__
+    column = t.c[flag]
+    row = db.execute(
+        update(t)
+        .where(t.c.call_sid == call_sid, or_(column.is_(None), column == False))  # noqa: E712
+        .values({flag: True})
+        .returning(t.c.stats_counted, t.c.scenario_id, t.c.started_at, t.c.classification)
+        .execution_options(synchronize_session=False)
+    ).first()
+    if row is None:
+        return False
+    if row.stats_counted:
+        apply_deltas(db, {rollup_key(row.scenario_id, row.started_at, row.classification): {FLAG_COUNTERS[flag]: 1}})
+    return True
+
+
+def query_stats(db: Session, group_by, scenario_id: int = None, start: date = None, end: date = None):
+    """Aggregate the rollup (never the calls table) over the requested dimensions."""
+    s = models.CallStatDaily
+    dims = [getattr(s, name) for name in group_by]
+    sums = [func.sum(getattr(s, c)).label(c) for c in COUNTERS]
+    query = db.query(*dims, *sums)
+    if scenario_id is not None:
+        query = query.filter(s.scenario_id == scenario_id)
+    if start:
+        query = query.filter(s.day >= start)
+    if end:
+        query = query.filter(s.day <= end)
+    if dims:
+        query = query.group_by(*dims).order_by(*dims)
+
+    results = []
+    for row in query.all():
+        item = {name: getattr(row, name) for name in group_by}
+        item.update({c: getattr(row, c) or 0 for c in COUNTERS})
+        item["avg_duration"] = round(item["duration_total"] / item["duration_calls"], 1) if item["duration_calls"] else None
+        item["bridge_rate"] = round(item["bridged"] / item["completed"], 4) if item["completed"] else None
+        results.append(item)
+    return results
@@ -1,7 +1,12 @@
+import json
 import os
-from sqlalchemy import create_engine
+from contextlib import contextmanager
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from . import db_pool
 
 # Priority: Environment variable (Railway/Production) -> Local SQLite
 SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./app.db")
@@ -12,11 +17,174 @@ if SQLALCHEMY_DATABASE_URL.startswith("postgres://"):
 
 connect_args = {"check_same_thread": False} if SQLALCHEMY_DATABASE_URL.startswith("sqlite") else {}
 
+def json_serializer(value):
+    # Compact JSON columns: raw UTF-8 for Japanese text instead of \uXXXX escapes, no spaces
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+# --- Engine profiles ---
+# DB_PROFILE selects the tuning; by default it follows the backend of DATABASE_URL.
+# "sqlite": WAL (readers never block the writer, commits append to the log instead of
+# rewriting the database file), synchronous=NORMAL (fsync at checkpoints, still durable
+# against process crashes), a busy timeout so concurrent writers queue instead of failing,
+# and memory-mapped reads with a larger page cache.
+# "sqlite-journal": the SQLite defaults (rollback journal), kept for comparison.
+# "postgresql": a sized pool with pre-ping (Railway drops idle connections) and a
+# server-side statement timeout.
+# Every value can be overridden from the environment.
+ENGINE_PROFILES = ("sqlite", "sqlite-journal", "postgresql")
+
+
+def engine_profile(url: str) -> dict:
+    backend = make_url(url).get_backend_name()
+    name = os.getenv("DB_PROFILE") or ("sqlite" if backend == "sqlite" else "postgresql")
+    if name not in ENGINE_PROFILES:
+        raise ValueError(f"DB_PROFILE must be one of {', '.join(ENGINE_PROFILES)}, got {name!r}")
+    profile = {
+        "name": name,
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "10" if name == "postgresql" else "5")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "20" if name == "postgresql" else "10")),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "30")),
+        "pool_pre_ping": name == "postgresql",
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800")) if name == "postgresql" else -1,
+        "statement_timeout_ms": int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000")) if name == "postgresql" else None,
+        "pragmas": {},
+    }
+    if name == "sqlite":
+        profile["pragmas"] = {
+            "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+            "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+            "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+            "mmap_size": int(os.getenv("SQLITE_MMAP_MB", "256")) * 1024 * 1024,
+            "cache_size": -int(os.getenv("SQLITE_CACHE_MB", "64")) * 1024,  # negative = KiB
+        }
+    return profile
+
+
+def engine_options(profile: dict, url, poolclass) -> dict:
+    """create_engine / create_async_engine keyword arguments for a profile."""
+    url = make_url(url)
+    options = {"json_serializer": json_serializer}
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        return options  # in-memory SQLite keeps its single-connection pool
+    options.update(
+        pool_size=profile["pool_size"],
+        max_overflow=profile["max_overflow"],
+        pool_timeout=profile["pool_timeout"],
+        pool_pre_ping=profile["pool_pre_ping"],
+        pool_recycle=profile["pool_recycle"],
+        poolclass=poolclass,
+    )
+    return options
+
+
+def apply_pragmas(engine, pragmas: dict):
+    """Run the profile's PRAGMAs on every new SQLite connection (sync or async driver)."""
+    if not pragmas:
+        return
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for key, value in pragmas.items():
+            cursor.execute(f"PRAGMA {key}={value}")
+        cursor.close()
+
+
+ENGINE_PROFILE = engine_profile(SQLALCHEMY_DATABASE_URL)
+if ENGINE_PROFILE["statement_timeout_ms"] and SQLALCHEMY_DATABASE_URL.startswith("postgresql"):
+    connect_args["options"] = f"-c statement_timeout={ENGINE_PROFILE['statement_timeout_ms']}"
+
 engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args=connect_args
+    SQLALCHEMY_DATABASE_URL, connect_args=connect_args,
+    **engine_options(ENGINE_PROFILE, SQLALCHEMY_DATABASE_URL, db_pool.pool_class(db_pool.TimedQueuePool, db_pool.sync_metrics))
 )
+apply_pragmas(engine, ENGINE_PROFILE["pragmas"])
+db_pool.instrument(engine, db_pool.sync_metrics)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+
+# --- Index builds on live tables ---
+# A plain CREATE INDEX holds a SHARE lock on the table for the whole build, blocking the
+# dialer, the webhooks and imports. On PostgreSQL indexes are built CONCURRENTLY instead,
+# which cannot run inside a transaction and must outlive statement_timeout.
+
+@contextmanager
+def ddl_connection(bind):
+    """Autocommit connection without statement_timeout on PostgreSQL, one transaction elsewhere."""
+    if bind.dialect.name != "postgresql":
+        with bind.begin() as conn:
+            yield conn
+        return
+    with bind.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("SET statement_timeout = 0"))
+        try:
+            yield conn
+        finally:
+            conn.execute(text("RESET statement_timeout"))
+
+
+def create_index(conn, name: str, ddl: str) -> bool:
+    """
+    Run `ddl` (CREATE [UNIQUE] INDEX [IF NOT EXISTS] <name> ON ...); on PostgreSQL
+    CONCURRENTLY, on a ddl_connection, and only if no valid index <name> exists. A failed
+    concurrent build leaves an INVALID index behind: it is dropped before building again and
+    right after a failure (which is re-raised). Returns whether an index was built.
+    """
+    if conn.dialect.name != "postgresql":
+        conn.execute(text(ddl))
+        return True
+    valid = conn.execute(text(
+        "SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = :name"
+    ), {"name": name}).scalar()
+    if valid:
+        return False
+    if valid is not None:
+        drop_index(conn, name)
+    try:
+        conn.execute(text(ddl.replace(" INDEX ", " INDEX CONCURRENTLY ", 1)))
+    except Exception:
+        drop_index(conn, name)
+        raise
+    return True
+
+
+def drop_index(conn, name: str):
+    concurrently = " CONCURRENTLY" if conn.dialect.name == "postgresql" else ""
+    conn.execute(text(f"DROP INDEX{concurrently} IF EXISTS {name}"))
+
+
+def async_url(url: str):
+    """
+    Same database through an asyncio driver: aiosqlite locally, asyncpg in production.
+    Returns (url, connect_args); libpq's ?sslmode= becomes asyncpg's ssl argument.
+    """
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite":
+        return parsed.set(drivername="sqlite+aiosqlite"), {}
+    if parsed.get_backend_name() == "postgresql":
+        args = {}
+        if "sslmode" in parsed.query:
+            args["ssl"] = parsed.query["sslmode"]
+            parsed = parsed.difference_update_query(["sslmode"])
+        return parsed.set(drivername="postgresql+asyncpg"), args
+    return parsed, {}
+
+
+# Async engine for the code paths that run on the event loop (Twilio webhooks, the media
+# stream): their queries must not block the loop that relays live audio. Everything else
+# (admin API in the threadpool, dialer and import threads) keeps the sync engine.
+_async_url, _async_connect_args = async_url(SQLALCHEMY_DATABASE_URL)
+if ENGINE_PROFILE["statement_timeout_ms"] and _async_url.get_backend_name() == "postgresql":
+    _async_connect_args["server_settings"] = {"statement_timeout": str(ENGINE_PROFILE["statement_timeout_ms"])}
+async_engine = create_async_engine(
+    _async_url, connect_args=_async_connect_args,
+    **engine_options(ENGINE_PROFILE, _async_url, db_pool.pool_class(db_pool.TimedAsyncQueuePool, db_pool.async_metrics))
+)
+apply_pragmas(async_engine.sync_engine, ENGINE_PROFILE["pragmas"])
+db_pool.instrument(async_engine.sync_engine, db_pool.async_metrics)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
 
@@ -26,3 +194,8 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,149 @@
+import threading
+import time
+from collections import deque
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+# Connection pool metrics for GET /admin/db_pool.
+# Checkout wait is timed around the pool's own get (the only place the wait for a free
+# connection, or for opening a new one, can be observed); how long each connection stays
+# checked out comes from the checkout/checkin pool events. Recent samples are kept in a
+# bounded window so the percentiles follow the current load.
+
+WINDOW = 2048
+
+
+def _percentile(values: list, q: float):
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(len(values) * q))], 2)
+
+
+class PoolMetrics:
+    def __init__(self, name: str):
+        self.name = name
+        self.pool = None
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.connects = 0
+        self.peak_checked_out = 0
+        self.waits = deque(maxlen=WINDOW)  # ms
+        self.held = deque(maxlen=WINDOW)  # ms
+
+    def record_wait(self, ms: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+                self.waits.append(ms)
+
+    def record_checkout(self, checked_out: int):
+        with self._lock:
+            self.peak_checked_out = max(self.peak_checked_out, checked_out)
+
+    def record_held(self, ms: float):
+        with self._lock:
+            self.held.append(ms)
+
+    def record_connect(self):
+        with self._lock:
+            self.connects += 1
+
+    def snapshot(self) -> dict:
+        pool = self.pool
+        with self._lock:
+            waits, held = list(self.waits), list(self.held)
+            snapshot = {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "connects": self.connects,
+                "peak_checked_out": self.peak_checked_out,
+            }
+        if isinstance(pool, QueuePool):
+            snapshot.update({
+                "pool_size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "overflow": max(pool.overflow(), 0),
+            })
+        snapshot["wait_ms"] = {
+            "avg": round(sum(waits) / len(waits), 2) if waits else None,
+            "p50": _percentile(waits, 0.5),
+            "p99": _percentile(waits, 0.99),
+            "max": round(max(waits), 2) if waits else None,
+        }
+        snapshot["held_ms"] = {
+            "avg": round(sum(held) / len(held), 2) if held else None,
+            "p99": _percentile(held, 0.99),
+            "max": round(max(held), 2) if held else None,
+        }
+        return snapshot
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = self.timeouts = self.connects = self.peak_checked_out = 0
+            self.waits.clear()
+            self.held.clear()
+
+
+class _TimedGet:
+    metrics: PoolMetrics = None
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeout:
+            self.metrics.record_wait((time.perf_counter() - started) * 1000, timed_out=True)
+            raise
+        self.metrics.record_wait((time.perf_counter() - started) * 1000)
+        return connection
+
+
+class TimedQueuePool(_TimedGet, QueuePool):
+    pass
+
+
+class TimedAsyncQueuePool(_TimedGet, AsyncAdaptedQueuePool):
+    pass
+
+
+def pool_class(base, metrics: PoolMetrics):
+    """A pool class bound to metrics (pool.recreate() keeps the class, so the metrics survive dispose)."""
+    return type(base.__name__, (base,), {"metrics": metrics})
+
+
+def instrument(engine, metrics: PoolMetrics):
+    """Follow checkouts/checkins of a sync Engine (for an AsyncEngine pass .sync_engine)."""
+    metrics.pool = engine.pool
+
+    @event.listens_for(engine, "engine_disposed")
+    def disposed(_):
+        metrics.pool = engine.pool
+
+    @event.listens_for(engine, "connect")
+    def connected(dbapi_connection, connection_record):
+        metrics.record_connect()
+
+    @event.listens_for(engine, "checkout")
+    def checked_out(dbapi_connection, connection_record, connection_proxy):
+        connection_record.info["checked_out_at"] = time.perf_counter()
+        if isinstance(engine.pool, QueuePool):
+            metrics.record_checkout(engine.pool.checkedout())
+
+    @event.listens_for(engine, "checkin")
+    def checked_in(dbapi_connection, connection_record):
+        started = connection_record.info.pop("checked_out_at", None)
+        if started is not None:
+            metrics.record_held((time.perf_counter() - started) * 1000)
+
+
+sync_metrics = PoolMetrics("sync")
+async_metrics = PoolMetrics("async")
+
+
+def snapshot() -> dict:
+    return {metrics.name: metrics.snapshot() for metrics in (sync_metrics, async_metrics)}
@@ -0,0 +1,406 @@
+import os
+import socket
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import select, update, and_, func
+from sqlalchemy.orm import Session
+from .database import SessionLocal
+from . import models, pacing, blacklist
+from .windows import get_window
+
+# Identifies this process as the owner of claimed targets (host:pid)
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+# How long a claim is valid. If a worker dies between claiming and dialing,
+# the targets become claimable again after this lease expires.
+LEASE_SECONDS = int(os.getenv("DIALER_LEASE_SECONDS", "300"))
+
+
+def claim_targets(db: Session, scenario_id: int, limit: int, owner: str = WORKER_ID):
+    """
+    Atomically move up to `limit` targets to claimed. Sources, in priority order:
+      1. retries that are due (status=scheduled, next_attempt_at <= now) - one range scan
+         on ix_call_targets_due
+      2. pending targets
+      3. claims whose lease expired (worker died before dialing)
+    Returns a list of (id, phone_number, timezone) rows owned by `owner`.
+
+    - PostgreSQL: UPDATE ... WHERE id IN (SELECT ... FOR UPDATE SKIP LOCKED) RETURNING
+      -> concurrent workers skip rows already locked by another worker.
+    - SQLite: the same single UPDATE ... RETURNING statement; SQLite serializes writers,
+      so the select+update cannot interleave with another claim.
+    """
+    t = models.CallTarget.__table__
+    now = datetime.utcnow()
+
+    sources = [
+        (and_(t.c.status == "scheduled", t.c.next_attempt_at <= now), t.c.next_attempt_at),
+        (t.c.status == "pending", t.c.id),
+        (and_(t.c.status == "claimed", t.c.lease_expires_at < now), t.c.id),
+    ]
+
+    rows = []
+    for condition, order_by in sources:
+        remaining = limit - len(rows)
+        if remaining <= 0:
+            break
+
+        candidates = select(t.c.id).where(
+            t.c.scenario_id == scenario_id, condition
+        ).order_by(order_by).limit(remaining)
+
+        if db.get_bind().dialect.name == "postgresql":
+            candidates = candidates.with_for_update(skip_locked=True)
+
+        stmt = (
+            update(t)
+            .where(t.c.id.in_(candidates.scalar_subquery()))
+            .values(
+                status="claimed",
+                claimed_by=owner,
+                claimed_at=now,
+                lease_expires_at=now + timedelta(seconds=LEASE_SECONDS),
+                updated_at=now,
+            )
+            .returning(t.c.id, t.c.phone_number, t.c.timezone)
+        )
+        rows.extend(db.execute(stmt).fetchall())
+
+    db.commit()
+    return rows
+
+
+def mark_claimed(db: Session, target_id: int, status: str, owner: str = WORKER_ID):
+    """Move a target we claimed to its next status. No-op if the lease was taken over."""
+    t = models.CallTarget.__table__
+    values = dict(status=status, lease_expires_at=None, updated_at=datetime.utcnow())
+    if status == "calling":
+        values["attempt_count"] = func.coalesce(t.c.attempt_count, 0) + 1
+    row = db.execute(
+        update(t)
+        .where(t.c.id == target_id, t.c.status == "claimed", t.c.claimed_by == owner)
+        .values(**values)
+        .returning(t.c.scenario_id)
+    ).first()
+    if row and status in PROGRESS_COUNTER:
+        bump_progress(db, row.scenario_id, **{PROGRESS_COUNTER[status]: 1})
+    return row is not None
+
+
+def defer_claimed(db: Session, target_id: int, until: datetime, owner: str = WORKER_ID):
+    """Put a claimed target back as scheduled (outside its calling window). Not counted as an attempt."""
+    t = models.CallTarget.__table__
+    db.execute(
+        update(t)
+        .where(t.c.id == target_id, t.c.status == "claimed", t.c.claimed_by == owner)
+        .values(status="scheduled", next_attempt_at=until, lease_expires_at=None, updated_at=datetime.utcnow())
+    )
+
+
+# Twilio CallStatus -> CallTarget.status for the final status callback
+TARGET_STATUS_BY_CALL_STATUS = {
+    "completed": "completed",
+    "no-answer": "no_answer",
+    "busy": "busy",
+    "failed": "failed",
+    "canceled": "failed",
+}
+
+# CallTarget.status -> CampaignProgress counter ("calling" counts as dialed)
+PROGRESS_COUNTER = {
+    "calling": "dialed",
+    "completed": "completed",
+    "no_answer": "no_answer",
+    "busy": "busy",
+    "failed": "failed",
+    "opted_out": "opted_out",
+}
+
+
+# Final statuses that may be retried according to the scenario retry policy
+RETRYABLE_STATUSES = {"no_answer", "busy", "failed"}
+
+
+def finish_target(db: Session, target_id: int, call_status: str):
+    """
+    Called from status_callback. Moves a dialed target to its final status in one
+    indexed (primary key) update and bumps the campaign counters.
+    Repeated callbacks are no-ops because only a `calling` target can transition.
+
+    no_answer / busy / failed targets with attempts left are put back as `scheduled`
+    with next_attempt_at set from the scenario backoff instead of being counted as finished.
+    """
+    new_status = TARGET_STATUS_BY_CALL_STATUS.get(call_status)
+    if not new_status:
+        return None
+
+    t = models.CallTarget.__table__
+    row = db.execute(
+        update(t)
+        .where(t.c.id == target_id, t.c.status == "calling")
+        .values(status=new_status, updated_at=datetime.utcnow())
+        .returning(t.c.scenario_id, t.c.attempt_count, t.c.timezone)
+    ).first()
+    if not row:
+        return None
+    return _retry_or_finish(db, target_id, new_status, row)
+
+
+def fail_claimed(db: Session, target_id: int, owner: str = WORKER_ID):
+    """
+    The call could not be placed (Twilio 429/5xx, network error). The target was moved to
+    `calling` (and counted as an attempt) before dialing; take back its dialed count and run
+    the same retry policy as a failed call. No-op if a status callback already finished it.
+    """
+    t = models.CallTarget.__table__
+    row = db.execute(
+        update(t)
+        .where(t.c.id == target_id, t.c.status == "calling", t.c.claimed_by == owner)
+        .values(status="failed", updated_at=datetime.utcnow())
+        .returning(t.c.scenario_id, t.c.attempt_count, t.c.timezone)
+    ).first()
+    if not row:
+        return None
+    bump_progress(db, row.scenario_id, dialed=-1)
+    return _retry_or_finish(db, target_id, "failed", row)
+
+
+def _retry_or_finish(db: Session, target_id: int, new_status: str, row):
+    """Reschedule a retryable outcome with attempts left, otherwise count it as finished."""
+    t = models.CallTarget.__table__
+    if new_status in RETRYABLE_STATUSES:
+        scenario = db.query(models.Scenario).get(row.scenario_id)
+        next_at = next_retry_at(scenario, row.attempt_count or 1, row.timezone) if scenario else None
+        if next_at:
+            db.execute(
+                update(t)
+                .where(t.c.id == target_id)
+                .values(status="scheduled", next_attempt_at=next_at)
+            )
+            return "scheduled"
+
+    bump_progress(db, row.scenario_id, **{PROGRESS_COUNTER[new_status]: 1})
+    return new_status
+
+
+def parse_backoff(value: str):
+    """'30,60,120' -> [30, 60, 120] (minutes). Invalid entries are ignored."""
+    minutes = []
+    for part in (value or "").split(","):
+        part = part.strip()
+        if part.isdigit() and int(part) > 0:
+            minutes.append(int(part))
+    return minutes or [30]
+
+
+def next_retry_at(scenario, attempt_count: int, tz_name: str = None, now: datetime = None):
+    """
+    When to dial again after `attempt_count` attempts, or None if the scenario's
+    max_attempts is used up. The n-th retry waits the n-th backoff value (the last value repeats)
+    and is pushed to the next opening of the start_time-end_time window (in the target's
+    timezone) if it falls outside.
+    """
+    max_attempts = scenario.max_attempts or 1
+    if attempt_count >= max_attempts:
+        return None
+
+    backoff = parse_backoff(scenario.retry_backoff_minutes)
+    wait = backoff[min(attempt_count, len(backoff)) - 1]
+    candidate = (now or datetime.utcnow()) + timedelta(minutes=wait)
+    return get_window(scenario.start_time, scenario.end_time, tz_name).next_open(candidate)
+
+
+def opt_out_target(db: Session, target_id: int):
+    """The callee asked not to be called again during a live call; the final status callback becomes a no-op."""
+    t = models.CallTarget.__table__
+    row = db.execute(
+        update(t)
+        .where(t.c.id == target_id, t.c.status.in_(["claimed", "calling"]))
+        .values(status="opted_out", updated_at=datetime.utcnow())
+        .returning(t.c.scenario_id)
+    ).first()
+    if row:
+        bump_progress(db, row.scenario_id, opted_out=1)
+        db.commit()
+
+
+def bump_progress(db: Session, scenario_id: int, **deltas):
+    """
+    Incrementally update CampaignProgress counters (col = col + delta). Caller commits.
+    One upsert statement, so two first bumps of a scenario (a status callback racing an
+    import chunk) cannot both insert. A missing row counts from zero: a negative delta
+    on it (e.g. deleting a target) inserts 0, not a negative counter.
+    """
+    deltas = {k: v for k, v in deltas.items() if v}
+    if not deltas:
+        return
+
+    t = models.CampaignProgress.__table__
+    now = datetime.utcnow()
+    values = {k: getattr(t.c, k) + v for k, v in deltas.items()}
+    first = {k: max(v, 0) for k, v in deltas.items()}
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        stmt = dialect_insert(t).values(scenario_id=scenario_id, updated_at=now, **first)
+        db.execute(stmt.on_conflict_do_update(index_elements=["scenario_id"], set_={**values, "updated_at": now}))
+        return
+
+    # Other databases: update-then-insert
+    result = db.execute(update(t).where(t.c.scenario_id == scenario_id).values(updated_at=now, **values))
+    if result.rowcount == 0:
+        db.execute(t.insert().values(scenario_id=scenario_id, updated_at=now, **first))
+
+
+# --- Paced dialer worker ---
+TICK_SECONDS = float(os.getenv("DIALER_TICK_SECONDS", "1"))
+MAX_CALLS_PER_TICK = int(os.getenv("DIALER_MAX_CALLS_PER_TICK", "10"))
+ACTIVE_TARGET_STATUSES = ["pending", "scheduled", "claimed", "calling"]
+
+_workers = {}
+_workers_lock = threading.Lock()
+
+
+def place_call(client, scenario_id: int, target):
+    """Originate one outbound call for a claimed target via Twilio."""
+    from urllib.parse import urlparse
+    parsed_base = urlparse(os.getenv("PUBLIC_BASE_URL", ""))
+    base_domain = f"{parsed_base.scheme}://{parsed_base.netloc}"
+    from_number = os.getenv("TWILIO_FROM_NUMBER")
+
+    client.calls.create(
+        to=target.phone_number,
+        from_=from_number,
+        url=f"{base_domain}/twilio/outbound_handler?scenario_id={scenario_id}&call_target_id={target.id}",
+        status_callback=f"{base_domain}/twilio/status_callback?call_target_id={target.id}",
+        status_callback_event=['initiated', 'ringing', 'answered', 'completed']
+    )
+
+
+def dial_claimed(db: Session, client, scenario_id: int, targets):
+    """Dial claimed targets and move them to calling / scheduled / failed. Returns the number of calls placed."""
+    calls_triggered = 0
+    for target in targets:
+        # `calling` is committed before dialing: a fast failed/busy/no-answer callback can
+        # arrive before calls.create returns, and finish_target only moves `calling` targets
+        if not mark_claimed(db, target.id, "calling"):
+            db.commit()
+            continue
+        db.commit()
+        try:
+            place_call(client, scenario_id, target)
+            pacing.controller.call_dialed(target.id)
+            calls_triggered += 1
+        except Exception as e:
+            print(f"Failed to trigger call for {target.phone_number}: {e}")
+            fail_claimed(db, target.id)
+            db.commit()
+    return calls_triggered
+
+
+class DialerWorker(threading.Thread):
+    """
+    Dials one scenario until it runs out of targets or is stopped.
+    Each tick asks the pacing controller how many calls to place, claims that many and dials them.
+    """
+
+    def __init__(self, scenario_id: int):
+        super().__init__(name=f"dialer-{scenario_id}", daemon=True)
+        self.scenario_id = scenario_id
+        self.stop_event = threading.Event()
+
+    def run(self):
+        from twilio.rest import Client
+        client = Client(os.getenv("TWILIO_ACCOUNT_SID"), os.getenv("TWILIO_AUTH_TOKEN"))
+        try:
+            while not self.stop_event.is_set():
+                if not self.tick(client):
+                    break
+                self.stop_event.wait(TICK_SECONDS)
+        except Exception as e:
+            print(f"Dialer worker for scenario {self.scenario_id} crashed: {e}")
+        finally:
+            with _workers_lock:
+                if _workers.get(self.scenario_id) is self:
+                    del _workers[self.scenario_id]
+
+    def tick(self, client) -> bool:
+        """Returns False when the worker should exit."""
+        db = SessionLocal()
+        try:
+            scenario = db.query(models.Scenario).get(self.scenario_id)
+            if not scenario or not scenario.is_active or scenario.is_hard_stopped:
+                return False
+
+            calls = pacing.controller.take(MAX_CALLS_PER_TICK)
+            if not calls:
+                return True
+
+            targets = claim_targets(db, self.scenario_id, calls)
+            # Only placed calls spend budget: give back what was not claimed, blacklisted,
+            # deferred or failed to dial (all of it if the dial step raises)
+            if targets:
+                placed = 0
+                try:
+                    placed = self.dial(db, client, scenario, targets)
+                finally:
+                    pacing.controller.give_back(calls - placed)
+                return True
+            pacing.controller.give_back(calls)
+
+            # Nothing claimable: keep running only while retries or live calls remain
+            remaining = db.query(models.CallTarget.id).filter(
+                models.CallTarget.scenario_id == self.scenario_id,
+                models.CallTarget.status.in_(ACTIVE_TARGET_STATUSES)
+            ).first()
+            return remaining is not None
+        finally:
+            db.close()
+
+    def dial(self, db: Session, client, scenario, targets) -> int:
+        """Drop blacklisted targets, defer the ones outside their window, dial the rest. Returns the calls placed."""
+        # Opt-outs registered after upload are never dialed
+        blacklist.index.maybe_refresh(db)
+        blocked = blacklist.index.filter_blacklisted([t.phone_number for t in targets], db)
+
+        # Targets whose own (timezone-aware) window is closed are deferred, not failed
+        now = datetime.utcnow()
+        in_window = []
+        for target in targets:
+            if target.phone_number in blocked:
+                mark_claimed(db, target.id, "opted_out")
+                continue
+            window = get_window(scenario.start_time, scenario.end_time, target.timezone)
+            if window.contains(now):
+                in_window.append(target)
+            else:
+                defer_claimed(db, target.id, window.next_open(now))
+        db.commit()
+        return dial_claimed(db, client, self.scenario_id, in_window)
+
+
+def start_worker(scenario_id: int) -> bool:
+    """Start the paced dialer for a scenario. Returns False if it is already running."""
+    with _workers_lock:
+        worker = _workers.get(scenario_id)
+        if worker and worker.is_alive():
+            return False
+        worker = DialerWorker(scenario_id)
+        _workers[scenario_id] = worker
+        worker.start()
+        return True
+
+
+def stop_worker(scenario_id: int):
+    with _workers_lock:
+        worker = _workers.pop(scenario_id, None)
+    if worker:
+        worker.stop_event.set()
+
+
+def running_workers():
+    with _workers_lock:
+        return sorted(sid for sid, w in _workers.items() if w.is_alive())
@@ -0,0 +1,114 @@
+import asyncio
+import json
+from collections import deque
+from datetime import datetime
+
+# In-process event bus for the live dashboards (GET /admin/events, Server-Sent Events).
+# Webhooks, the media stream and transcription jobs publish small deltas; every open
+# dashboard gets them pushed instead of re-querying the call log, so database load does
+# not grow with the number of viewers. Single process: the app runs one uvicorn worker.
+
+HISTORY_SIZE = 500  # recent events kept for reconnects (Last-Event-ID)
+QUEUE_SIZE = 1000  # per subscriber; a dashboard that falls further behind is told to resync
+
+
+class Subscription:
+    def __init__(self):
+        self.queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self.resync = False  # set when events were lost: the client must reload its view
+
+    async def get(self):
+        return await self.queue.get()
+
+
+class EventBus:
+    def __init__(self):
+        self._loop = None
+        self._subscribers = set()
+        self._history = deque(maxlen=HISTORY_SIZE)
+        self._next_id = 1
+
+    def bind(self, loop: asyncio.AbstractEventLoop):
+        self._loop = loop
+
+    def publish(self, event_type: str, data: dict):
+        """Callable from any thread (sync routes, worker threads) or from the event loop; never blocks."""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._dispatch(event_type, data)
+        else:
+            loop.call_soon_threadsafe(self._dispatch, event_type, data)
+
+    def _dispatch(self, event_type: str, data: dict):
+        # Runs on the event loop only, so ids are assigned in delivery order without a lock
+        event = {"id": self._next_id, "type": event_type, "data": data}
+        self._next_id += 1
+        self._history.append(event)
+        for subscription in self._subscribers:
+            self._offer(subscription, event)
+
+    def _offer(self, subscription: Subscription, event: dict):
+        if subscription.resync:
+            return
+        try:
+            subscription.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            subscription.resync = True
+
+    def subscribe(self, last_event_id: int = None) -> Subscription:
+        """Must be called on the event loop. Replays missed events when the gap is still in history."""
+        subscription = Subscription()
+        if last_event_id is not None:
+            missed = [event for event in self._history if event["id"] > last_event_id]
+            oldest = self._history[0]["id"] if self._history else self._next_id
+            if last_event_id < oldest - 1:
+                subscription.resync = True
+            for event in missed:
+                self._offer(subscription, event)
+        self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self._subscribers.discard(subscription)
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+
+bus = EventBus()
+
+
+def publish(event_type: str, **data):
+    bus.publish(event_type, data)
+
+
+def call_summary(call) -> dict:
+    """The fields a log row needs to render a call that just started."""
+    return {
+        "call_sid": call.call_sid,
+        "scenario_id": call.scenario_id,
+        "scenario_name": call.scenario.name if call.scenario else None,
+        "from_number": call.from_number,
+        "to_number": call.to_number,
+        "status": call.status,
+        "direction": call.direction,
+        "started_at": call.started_at,
+    }
+
+
+def _default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def format_sse(event: dict) -> str:
+    data = json.dumps(event["data"], ensure_ascii=False, separators=(",", ":"), default=_default)
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {data}\n\n"
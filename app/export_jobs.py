@@ -0,0 +1,193 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from sqlalchemy.orm import Session
+from .database import SessionLocal
+from . import models, log_export, job_heartbeat
+
+# Generated ZIPs live here until they expire
+EXPORT_DIR = os.getenv("EXPORT_DIR", "./data/exports")
+# Same filters requested again within this window -> the existing ZIP is returned
+FRESH_MINUTES = int(os.getenv("EXPORT_FRESH_MINUTES", "60"))
+# Completed ZIPs older than this are deleted from disk
+RETENTION_HOURS = int(os.getenv("EXPORT_RETENTION_HOURS", "24"))
+# Worker processes building ZIPs (deflate + AES run there, not in the API process)
+WORKERS = int(os.getenv("EXPORT_WORKERS", "1"))
+# Audio exports write their progress to the job row at most this often
+PROGRESS_SECONDS = 1.0
+
+ACTIVE_STATUSES = ["queued", "running"]
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def filters_key(filters: log_export.ExportFilters) -> str:
+    # Unset options are dropped so the keys of existing exports stay the same when one is added
+    normalized = {key: value for key, value in filters.as_dict().items() if value not in (None, "") and value is not False}
+    return hashlib.sha256(json.dumps(normalized, sort_keys=True).encode()).hexdigest()
+
+
+def artifact_path(job_id: int) -> str:
+    return os.path.join(EXPORT_DIR, f"export_{job_id}.zip")
+
+
+def build_export(job_id: int):
+    """Runs in a worker process: writes the ZIP to a .part file, then renames it into place."""
+    db = SessionLocal()
+    path = artifact_path(job_id)
+    partial = path + ".part"
+    try:
+        job = db.query(models.ExportJob).get(job_id)
+        job.status = "running"
+        job.started_at = datetime.utcnow()
+        db.commit()
+
+        os.makedirs(EXPORT_DIR, exist_ok=True)
+        filters = log_export.ExportFilters(**job.filters_json)
+        with open(partial, "wb") as out:
+            for chunk in log_export.stream_zip(filters, progress=_progress_recorder(db, job)):
+                out.write(chunk)
+        os.replace(partial, path)
+
+        job.path = path
+        job.size_bytes = os.path.getsize(path)
+        job.status = "completed"
+        job.finished_at = datetime.utcnow()
+        db.commit()
+    except Exception as e:
+        print(f"Export job {job_id} failed: {e}")
+        db.rollback()
+        _mark_failed(db, job_id, str(e))
+        if os.path.exists(partial):
+            os.remove(partial)
+    finally:
+        db.close()
+
+
+def _progress_recorder(db: Session, job: models.ExportJob):
+    last_write = 0.0
+
+    def record(done: int, total: int, failed: int, written: int):
+        nonlocal last_write
+        now = time.monotonic()
+        if now - last_write < PROGRESS_SECONDS and done != total:
+            return
+        last_write = now
+        job.audio_total, job.audio_done, job.audio_failed, job.audio_bytes = total, done, failed, written
+        db.commit()
+
+    return record
+
+
+def _mark_failed(db: Session, job_id: int, error: str):
+    job = db.query(models.ExportJob).get(job_id)
+    if job and job.status in ACTIVE_STATUSES:
+        job.status = "failed"
+        job.error = error
+        job.finished_at = datetime.utcnow()
+        db.commit()
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # spawn, not fork: the API process runs dialer/import threads that must not be forked
+            _executor = ProcessPoolExecutor(max_workers=WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _executor
+
+
+def _on_done(job_id: int, future):
+    """Worker process died (or could not start): the job would otherwise stay running forever."""
+    global _executor
+    error = future.exception()
+    if error is None:
+        return
+    print(f"Export worker for job {job_id} crashed: {error}")
+    with _executor_lock:
+        _executor = None # a broken pool rejects every later submit
+    db = SessionLocal()
+    try:
+        _mark_failed(db, job_id, str(error) or error.__class__.__name__)
+    finally:
+        db.close()
+
+
+def submit(job_id: int):
+    # The heartbeat runs in this process: the job lives as long as this process's pool does
+    job_heartbeat.start(models.ExportJob, ACTIVE_STATUSES)
+    future = _get_executor().submit(build_export, job_id)
+    future.add_done_callback(lambda f: _on_done(job_id, f))
+
+
+def prune_expired(db: Session, now: datetime = None):
+    cutoff = (now or datetime.utcnow()) - timedelta(hours=RETENTION_HOURS)
+    jobs = db.query(models.ExportJob).filter(
+        models.ExportJob.status == "completed", models.ExportJob.finished_at < cutoff
+    ).all()
+    for job in jobs:
+        if job.path and os.path.exists(job.path):
+            os.remove(job.path)
+        job.status = "expired"
+    if jobs:
+        db.commit()
+
+
+def find_reusable(db: Session, key: str, now: datetime = None):
+    """An export of the same filters that is still being built or finished within FRESH_MINUTES."""
+    fresh_since = (now or datetime.utcnow()) - timedelta(minutes=FRESH_MINUTES)
+    jobs = db.query(models.ExportJob).filter(
+        models.ExportJob.filters_key == key,
+        models.ExportJob.status.in_(ACTIVE_STATUSES + ["completed"])
+    ).order_by(models.ExportJob.id.desc()).limit(5).all()
+    for job in jobs:
+        if job.status in ACTIVE_STATUSES:
+            return job
+        if job.finished_at and job.finished_at >= fresh_since and job.path and os.path.exists(job.path):
+            return job
+    return None
+
+
+def request_export(db: Session, filters: log_export.ExportFilters):
+    """Returns (job, cached). A new job is queued only when nothing reusable exists."""
+    prune_expired(db)
+    key = filters_key(filters)
+    job = find_reusable(db, key)
+    if job:
+        return job, True
+    job = models.ExportJob(filters_key=key, filters_json=filters.as_dict(),
+                           owner=job_heartbeat.OWNER, heartbeat_at=datetime.utcnow())
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    submit(job.id)
+    return job, False
+
+
+def resume_all():
+    """
+    On startup, rebuild exports that were queued or running in a process that is gone (stale
+    heartbeat): the source data is still there. Exports of live processes are left to them,
+    so no two processes write the same .part file.
+    """
+    db = SessionLocal()
+    try:
+        jobs = db.query(models.ExportJob.id, models.ExportJob.heartbeat_at).filter(
+            models.ExportJob.status.in_(ACTIVE_STATUSES)
+        ).all()
+        job_ids = [
+            job_id for job_id, heartbeat_at in jobs
+            if job_heartbeat.is_stale(heartbeat_at)
+            and job_heartbeat.take_over(db, models.ExportJob, job_id, status="queued", started_at=None)
+        ]
+        db.commit()
+    finally:
+        db.close()
+    for job_id in job_ids:
+        submit(job_id)
@@ -0,0 +1,188 @@
+import csv
+import os
+import shutil
+import threading
+import uuid
+from datetime import datetime
+from sqlalchemy.orm import Session
+from .database import SessionLocal
+from . import models, importer, job_heartbeat
+
+# Uploaded lists and per-job error CSVs are staged here until the job finishes
+STAGING_DIR = os.getenv("IMPORT_STAGING_DIR", "./data/imports")
+COPY_BUFFER_BYTES = 1024 * 1024
+
+ACTIVE_STATUSES = ["queued", "running"]
+
+_workers = {}
+_workers_lock = threading.Lock()
+
+
+def stage_upload(db: Session, scenario_id: int, upload) -> models.ImportJob:
+    """Copy an UploadFile to the staging dir (streamed, 1 MB at a time) and create a queued job."""
+    os.makedirs(STAGING_DIR, exist_ok=True)
+    path = os.path.join(STAGING_DIR, f"{uuid.uuid4().hex}.csv")
+    with open(path, "wb") as staged:
+        shutil.copyfileobj(upload.file, staged, COPY_BUFFER_BYTES)
+    job = models.ImportJob(
+        scenario_id=scenario_id,
+        filename=upload.filename,
+        staged_path=path,
+        total_bytes=os.path.getsize(path),
+        owner=job_heartbeat.OWNER,
+        heartbeat_at=datetime.utcnow(),
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+class RejectWriter:
+    """Writes rejected rows to the error CSV: original columns + error_reason, header from the first row."""
+
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.writer = None
+        self.count = 0
+
+    def write(self, row: dict, reason: str):
+        if self.writer is None:
+            fieldnames = [key for key in row if key is not None] + ["error_reason"]
+            self.writer = csv.DictWriter(self.fileobj, fieldnames=fieldnames, extrasaction="ignore")
+            self.writer.writeheader()
+        self.writer.writerow({**row, "error_reason": reason})
+        self.count += 1
+
+
+def _apply_stats(job: models.ImportJob, stats: dict):
+    for key in ("rows_read", "accepted", "duplicates", "invalid", "blacklisted"):
+        setattr(job, key, stats[key])
+    seconds = stats.get("seconds") or 0
+    job.rows_per_sec = round(stats["rows_read"] / seconds, 1) if seconds > 0 else None
+
+
+class ImportWorker(threading.Thread):
+    """Runs one import job off the request path; cancel() stops it at the next chunk boundary."""
+
+    def __init__(self, job_id: int):
+        super().__init__(name=f"import-{job_id}", daemon=True)
+        self.job_id = job_id
+        self.cancel_event = threading.Event()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def run(self):
+        db = SessionLocal()
+        staged_path = None
+        try:
+            job = db.query(models.ImportJob).get(self.job_id)
+            staged_path = job.staged_path
+            job.status = "running"
+            job.started_at = datetime.utcnow()
+            db.commit()
+
+            error_path = os.path.splitext(staged_path)[0] + ".errors.csv"
+            with open(staged_path, "rb") as source, \
+                    open(error_path, "w", newline="", encoding="utf-8-sig") as errors:
+                rejects = RejectWriter(errors)
+
+                def progress(stats):
+                    _apply_stats(job, stats)
+                    job.bytes_read = source.tell()
+                    db.commit()
+                    # Canceled from another process (the commit expired job.status: this reloads it)
+                    if job.status == "canceled":
+                        self.cancel_event.set()
+
+                stats = importer.import_targets(
+                    db, job.scenario_id, source,
+                    progress=progress, cancel=self.cancel_event, reject=rejects.write,
+                )
+
+            _apply_stats(job, stats)
+            job.rows_per_sec = stats["rows_per_sec"]
+            job.status = "canceled" if stats["canceled"] else "completed"
+            if not stats["canceled"]:
+                job.bytes_read = job.total_bytes
+            if rejects.count:
+                job.error_path = error_path
+            else:
+                os.remove(error_path)
+            job.finished_at = datetime.utcnow()
+            db.commit()
+        except Exception as e:
+            print(f"Import job {self.job_id} failed: {e}")
+            db.rollback()
+            job = db.query(models.ImportJob).get(self.job_id)
+            if job:
+                error_path = os.path.splitext(job.staged_path)[0] + ".errors.csv"
+                if os.path.exists(error_path):
+                    job.error_path = error_path # rows rejected before the failure
+                job.status = "failed"
+                job.error = str(e)
+                job.finished_at = datetime.utcnow()
+                db.commit()
+        finally:
+            db.close()
+            if staged_path and os.path.exists(staged_path):
+                os.remove(staged_path)
+            with _workers_lock:
+                _workers.pop(self.job_id, None)
+
+
+def start_job(job_id: int):
+    job_heartbeat.start(models.ImportJob, ACTIVE_STATUSES)
+    with _workers_lock:
+        if job_id in _workers:
+            return
+        worker = ImportWorker(job_id)
+        _workers[job_id] = worker
+    worker.start()
+
+
+def cancel_job(job_id: int) -> bool:
+    with _workers_lock:
+        worker = _workers.get(job_id)
+    if not worker:
+        return False
+    worker.cancel()
+    return True
+
+
+def eta_seconds(job: models.ImportJob, now: datetime = None):
+    """Remaining time extrapolated from bytes consumed so far."""
+    if job.status != "running" or not job.started_at or not job.bytes_read or not job.total_bytes:
+        return None
+    elapsed = ((now or datetime.utcnow()) - job.started_at).total_seconds()
+    remaining = max(job.total_bytes - job.bytes_read, 0)
+    return round(elapsed * remaining / job.bytes_read, 1)
+
+
+def resume_all():
+    """
+    On startup, restart queued jobs whose process is gone (stale heartbeat). Jobs that were
+    running in such a process are marked failed: re-uploading the file resumes them, already
+    imported rows become duplicates. Jobs of live processes are left alone.
+    """
+    db = SessionLocal()
+    try:
+        jobs = db.query(models.ImportJob).filter(models.ImportJob.status.in_(ACTIVE_STATUSES)).all()
+        queued = []
+        for job in jobs:
+            if not job_heartbeat.is_stale(job.heartbeat_at) or not job_heartbeat.take_over(db, models.ImportJob, job.id):
+                continue
+            if job.status == "queued" and job.staged_path and os.path.exists(job.staged_path):
+                queued.append(job.id)
+            else:
+                if job.staged_path and os.path.exists(job.staged_path):
+                    os.remove(job.staged_path)
+                job.status = "failed"
+                job.error = "Interrupted by a restart"
+                job.finished_at = datetime.utcnow()
+        db.commit()
+    finally:
+        db.close()
+    for job_id in queued:
+        start_job(job_id)
@@ -0,0 +1,162 @@
+import codecs
+import csv
+import time
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from . import models, dialer, blacklist, windows, phone
+
+# Header names accepted for the phone number column
+PHONE_KEYS = ['phone_number', '電話番号', 'tel', 'phone']
+
+# Rows per normalization pass + INSERT batch (large enough for the vectorized phone path)
+CHUNK_ROWS = 20_000
+SNIFF_BYTES = 64 * 1024
+
+
+def detect_encoding(fileobj) -> str:
+    """Pick utf-8-sig / cp932 from the first chunk, then rewind. Falls back to lossy utf-8."""
+    sample = fileobj.read(SNIFF_BYTES)
+    fileobj.seek(0)
+    for encoding in ('utf-8-sig', 'cp932'):
+        try:
+            # final=False: a multibyte character cut at the end of the sample is not an error
+            codecs.getincrementaldecoder(encoding)().decode(sample, final=False)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    return 'utf-8'
+
+
+def iter_lines(fileobj, encoding: str, chunk_size: int = SNIFF_BYTES):
+    """Decode a binary file chunk by chunk and yield lines (with their newline, as csv expects)."""
+    decoder = codecs.getincrementaldecoder(encoding)(errors='ignore')
+    pending = ''
+    while True:
+        chunk = fileobj.read(chunk_size)
+        pending += decoder.decode(chunk, final=not chunk)
+        parts = pending.split('\n')
+        pending = parts.pop()
+        for part in parts:
+            yield part + '\n'
+        if not chunk:
+            break
+    if pending:
+        yield pending
+
+
+def open_csv(fileobj):
+    """DictReader over a binary upload, decoded incrementally (never the whole file in memory)."""
+    reader = csv.DictReader(iter_lines(fileobj, detect_encoding(fileobj)))
+    # Clean headers (remove BOM or spaces)
+    if reader.fieldnames:
+        reader.fieldnames = [f.strip().replace('\ufeff', '') for f in reader.fieldnames]
+    return reader
+
+
+def insert_targets_stmt(db: Session):
+    """Bulk INSERT that skips (scenario_id, phone_number) pairs that already exist."""
+    table = models.CallTarget.__table__
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as pg_insert
+        return pg_insert(table).on_conflict_do_nothing(index_elements=["scenario_id", "phone_number"])
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+        return sqlite_insert(table).on_conflict_do_nothing(index_elements=["scenario_id", "phone_number"])
+    return insert(table)
+
+
+def import_targets(
+    db: Session,
+    scenario_id: int,
+    fileobj,
+    chunk_rows: int = CHUNK_ROWS,
+    progress=None,
+    cancel=None,
+    reject=None,
+):
+    """
+    Stream a CSV of targets into call_targets.
+    - existing numbers for the scenario are loaded once into a set (one query)
+    - numbers are normalized/validated per chunk with the vectorized path (app.phone)
+    - duplicates inside the file and against existing targets are dropped in memory
+    - rows are inserted in chunked executemany statements with ON CONFLICT DO NOTHING
+    Optional hooks (used by background import jobs):
+    - progress(stats) is called after every chunk, once the chunk is committed
+    - cancel is a threading.Event checked between chunks; rows already committed are kept
+    - reject(row, reason) receives every row that was not imported (validation reason for invalid ones)
+    Returns counters and throughput.
+    """
+    started = time.perf_counter()
+    stats = {"rows_read": 0, "accepted": 0, "duplicates": 0, "invalid": 0, "blacklisted": 0, "canceled": False}
+
+    seen = {row[0] for row in db.query(models.CallTarget.phone_number).filter(
+        models.CallTarget.scenario_id == scenario_id
+    ).yield_per(10000)}
+    blacklist.index.maybe_refresh(db)
+
+    # RETURNING reports the rows actually inserted: a conflict with a concurrent import of
+    # the same scenario is skipped by ON CONFLICT and must not be counted
+    stmt = insert_targets_stmt(db).returning(models.CallTarget.__table__.c.phone_number)
+
+    def rejected(row, counter, reason=None):
+        stats[counter] += 1
+        if reject:
+            reject(row, reason or counter)
+
+    def process(rows):
+        """Normalize a chunk in one vectorized pass, filter it, insert it, report progress."""
+        raw = []
+        for row in rows:
+            # Support various possible header names for phone numbers
+            raw.append(next((row[key] for key in PHONE_KEYS if key in row), None))
+        numbers, reasons = phone.validate_many(raw)
+        blacklisted = blacklist.index.filter_blacklisted([n for n in numbers if n], db)
+
+        batch, batch_rows = [], []
+        for row, number, reason in zip(rows, numbers, reasons):
+            if reason:
+                rejected(row, "invalid", reason)
+            elif number in seen:
+                rejected(row, "duplicates", "duplicate")
+            elif number in blacklisted:
+                rejected(row, "blacklisted")
+            else:
+                seen.add(number)
+                batch_rows.append(row)
+                batch.append({
+                    "scenario_id": scenario_id,
+                    "phone_number": number,
+                    "metadata_json": row,
+                    "timezone": windows.timezone_for(row),
+                })
+
+        if batch:
+            inserted = {r[0] for r in db.execute(stmt, batch)}
+            for row, values in zip(batch_rows, batch):
+                if values["phone_number"] not in inserted:
+                    rejected(row, "duplicates", "duplicate")
+            dialer.bump_progress(db, scenario_id, total=len(inserted))
+            db.commit()
+            stats["accepted"] += len(inserted)
+        if progress:
+            stats["seconds"] = time.perf_counter() - started
+            progress(stats)
+
+    rows = []
+    for row in open_csv(fileobj):
+        stats["rows_read"] += 1
+        rows.append(row)
+        if len(rows) >= chunk_rows:
+            process(rows)
+            rows = []
+            if cancel is not None and cancel.is_set():
+                stats["canceled"] = True
+                break
+    else:
+        process(rows)
+
+    seconds = time.perf_counter() - started
+    stats["seconds"] = round(seconds, 3)
+    stats["rows_per_sec"] = round(stats["rows_read"] / seconds, 1) if seconds > 0 else None
+    return stats
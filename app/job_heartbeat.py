@@ -0,0 +1,79 @@
+import os
+import socket
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import or_, update
+from .database import SessionLocal
+
+# Ownership of background jobs (imports, exports) across processes.
+# A job records the process running it (owner, host:pid) and a heartbeat_at that a thread
+# of that process refreshes while the job is active. With several uvicorn workers or
+# replicas (or the old release during a rolling deploy) other live processes may be running
+# jobs, so a starting process only recovers jobs whose heartbeat is stale, and takes each
+# one over with a conditional UPDATE so two starting processes never recover the same job.
+
+OWNER = f"{socket.gethostname()}:{os.getpid()}"
+HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", "15"))
+# A job whose heartbeat is older than this belongs to a process that is gone
+STALE_SECONDS = float(os.getenv("JOB_STALE_SECONDS", "90"))
+
+_threads = {}
+_threads_lock = threading.Lock()
+
+
+class Heartbeat(threading.Thread):
+    """Refreshes heartbeat_at of the active jobs of one model owned by this process."""
+
+    def __init__(self, model, active_statuses: list, interval: float = HEARTBEAT_SECONDS):
+        super().__init__(name=f"heartbeat-{model.__tablename__}", daemon=True)
+        self.model = model
+        self.active_statuses = active_statuses
+        self.interval = interval
+        self.stop_event = threading.Event()
+
+    def beat(self):
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(self.model)
+                .where(self.model.owner == OWNER, self.model.status.in_(self.active_statuses))
+                .values(heartbeat_at=datetime.utcnow())
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            try:
+                self.beat()
+            except Exception as e:
+                print(f"Job heartbeat for {self.model.__tablename__} failed: {e}")
+
+
+def start(model, active_statuses: list):
+    """Start the heartbeat of `model` jobs in this process (idempotent)."""
+    with _threads_lock:
+        thread = _threads.get(model)
+        if thread is None or not thread.is_alive():
+            thread = Heartbeat(model, active_statuses)
+            _threads[model] = thread
+            thread.start()
+
+
+def is_stale(heartbeat_at, now: datetime = None) -> bool:
+    return heartbeat_at is None or heartbeat_at < (now or datetime.utcnow()) - timedelta(seconds=STALE_SECONDS)
+
+
+def take_over(db, model, job_id: int, now: datetime = None, **values) -> bool:
+    """Make this process the owner of a job whose heartbeat is stale. Caller commits."""
+    now = now or datetime.utcnow()
+    result = db.execute(
+        update(model)
+        .where(model.id == job_id, or_(
+            model.heartbeat_at.is_(None),
+            model.heartbeat_at < now - timedelta(seconds=STALE_SECONDS),
+        ))
+        .values(owner=OWNER, heartbeat_at=now, **values)
+    )
+    return result.rowcount == 1
@@ -0,0 +1,301 @@
+import csv
+import io
+import os
+import tempfile
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+from typing import Optional
+from zipfile import ZIP_STORED
+import httpx
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from .database import SessionLocal
+from . import models, recordings
+
+# Password of the exported AES-256 ZIP (shared with the admins out of band)
+ZIP_PASSWORD = b"attendme"
+
+# Rows fetched per server-side cursor batch; one ZIP chunk is sent per batch
+CHUNK_ROWS = 2_000
+
+LOG_HEADER = ["CallSid", "Date", "To", "From", "ScenarioName", "Status", "Question", "AnswerType", "Transcript", "RecordingURL"]
+MESSAGE_HEADER = ["CallSid", "ScenarioName", "Date", "RecordingUrl", "Transcript", "RecordingSid"]
+RECORDING_HEADER = ["CallSid", "Kind", "RecordingSid", "File", "Result", "Bytes"]
+
+# Recordings downloaded in parallel for audio exports (network-bound: threads are enough).
+# At most 2x this many files are held in memory while they wait to be written.
+# More workers than RECORDINGS_MAX_CONNECTIONS only wait for a pooled connection.
+AUDIO_WORKERS = int(os.getenv("EXPORT_AUDIO_WORKERS", "8"))
+
+
+class ExportFilters:
+    def __init__(
+        self,
+        to_number: Optional[str] = None,
+        from_number: Optional[str] = None,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        scenario_status: str = "active",
+        scenario_id: Optional[int] = None,
+        include_audio: bool = False,
+    ):
+        self.to_number = to_number
+        self.from_number = from_number
+        self.start_date = start_date
+        self.end_date = end_date
+        self.scenario_status = scenario_status
+        self.scenario_id = scenario_id
+        # Not a filter, but part of what identifies an export (cache key, job arguments)
+        self.include_audio = include_audio
+
+    def as_dict(self) -> dict:
+        return dict(vars(self))
+
+    def date_range(self) -> tuple:
+        """(start, end) datetimes, end exclusive; ValueError if a date is not YYYY-MM-DD."""
+        start_dt = datetime.strptime(self.start_date, "%Y-%m-%d") if self.start_date else None
+        end_dt = datetime.strptime(self.end_date, "%Y-%m-%d") + timedelta(days=1) if self.end_date else None
+        return start_dt, end_dt
+
+    def apply(self, query):
+        """Filter a query that outer-joins Scenario to Call."""
+        if self.scenario_id:
+            query = query.filter(models.Call.scenario_id == self.scenario_id)
+        # active/deleted only match calls that have a scenario, as the former inner join did
+        if self.scenario_status == "active":
+            query = query.filter(models.Scenario.id.isnot(None), models.Scenario.deleted_at.is_(None))
+        elif self.scenario_status == "deleted":
+            query = query.filter(models.Scenario.deleted_at.isnot(None))
+
+        if self.to_number:
+            query = query.filter(models.Call.to_number == self.to_number)
+        if self.from_number:
+            query = query.filter(models.Call.from_number == self.from_number)
+
+        start_dt, end_dt = self.date_range()
+        if start_dt:
+            query = query.filter(models.Call.started_at >= start_dt)
+        if end_dt:
+            query = query.filter(models.Call.started_at < end_dt)
+        return query
+
+
+def format_domestic(phone):
+    if not phone: return ""
+    if phone.startswith("+81"): return "0" + phone[3:]
+    return phone
+
+
+def format_date(value: Optional[datetime]) -> str:
+    return value.strftime("%Y-%m-%d %H:%M:%S") if value else ""
+
+
+def iter_log_rows(db: Session, filters: ExportFilters, chunk_rows: int = CHUNK_ROWS):
+    """One CSV row per answer (or one per call without answers), newest call first."""
+    C, A, Q, S = models.Call, models.Answer, models.Question, models.Scenario
+    query = db.query(
+        C.call_sid, C.started_at, C.to_number, C.from_number, C.status, S.name,
+        A.id, A.answer_type, A.transcript_text, A.recording_url_twilio, Q.text
+    ).outerjoin(S, C.scenario_id == S.id).outerjoin(A, A.call_sid == C.call_sid).outerjoin(Q, A.question_id == Q.id)
+    query = filters.apply(query).order_by(C.started_at.desc(), C.call_sid.desc(), A.id)
+
+    # yield_per: server-side cursor on PostgreSQL, fetchmany batches on SQLite
+    for sid, started_at, to_number, from_number, call_status, scenario_name, answer_id, answer_type, transcript, url, q_text in query.yield_per(chunk_rows):
+        row = [sid, format_date(started_at), format_domestic(to_number), format_domestic(from_number), scenario_name or "Unknown", call_status]
+        if answer_id is None:
+            yield row + ["-", "-", "-", "-"]
+        else:
+            yield row + [q_text or "Unknown", answer_type, transcript or "", url or ""]
+
+
+def iter_message_rows(db: Session, filters: ExportFilters, chunk_rows: int = CHUNK_ROWS):
+    C, M, S = models.Call, models.Message, models.Scenario
+    query = db.query(
+        C.call_sid, S.name, C.started_at, M.recording_url, M.transcript_text, M.recording_sid
+    ).join(M, M.call_sid == C.call_sid).outerjoin(S, C.scenario_id == S.id)
+    query = filters.apply(query).order_by(C.started_at.desc(), C.call_sid.desc(), M.id)
+
+    for sid, scenario_name, started_at, url, transcript, recording_sid in query.yield_per(chunk_rows):
+        yield [sid, scenario_name or "Unknown", format_date(started_at), url or "", transcript or "", recording_sid or ""]
+
+
+def iter_recordings(db: Session, filters: ExportFilters, chunk_rows: int = CHUNK_ROWS):
+    """(call_sid, started_at, kind, recording_sid, file name) of every call and answer recording."""
+    C, A, S = models.Call, models.Answer, models.Scenario
+    query = db.query(
+        C.call_sid, C.started_at, C.recording_sid, A.id, A.recording_sid
+    ).outerjoin(S, C.scenario_id == S.id).outerjoin(A, A.call_sid == C.call_sid)
+    query = filters.apply(query).order_by(C.started_at.desc(), C.call_sid.desc(), A.id)
+
+    last_sid = None
+    for sid, started_at, call_recording, answer_id, answer_recording in query.yield_per(chunk_rows):
+        if sid != last_sid and call_recording:
+            yield sid, started_at, "call", call_recording, f"recordings/{sid}/call_{call_recording}.mp3"
+        last_sid = sid
+        if answer_recording:
+            yield sid, started_at, "answer", answer_recording, f"recordings/{sid}/answer_{answer_id}_{answer_recording}.mp3"
+
+
+def count_recordings(db: Session, filters: ExportFilters) -> int:
+    C, A, S = models.Call, models.Answer, models.Scenario
+    calls = filters.apply(db.query(func.count(C.call_sid)).outerjoin(S, C.scenario_id == S.id)).filter(
+        C.recording_sid.isnot(None)
+    ).scalar()
+    answers = filters.apply(db.query(func.count(A.id)).select_from(C).outerjoin(S, C.scenario_id == S.id).join(
+        A, A.call_sid == C.call_sid
+    )).filter(A.recording_sid.isnot(None)).scalar()
+    return calls + answers
+
+
+def _zip_time(value: Optional[datetime]) -> tuple:
+    value = value if value and value.year >= 1980 else datetime.now()
+    return value.timetuple()[:6]
+
+
+class ChunkSink(io.RawIOBase):
+    """
+    Write-only, non-seekable target for the ZIP writer: collects what was written since
+    the last take(). zipfile sees no seek() and switches to data descriptors, so entries
+    are written front to back without going back to patch sizes/CRCs.
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._buffer += data
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def take(self) -> bytes:
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+
+def _write_audio(zf, sink: ChunkSink, db: Session, filters: ExportFilters, chunk_rows: int, workers: int, progress=None):
+    """
+    Add every recording to the ZIP as soon as it arrives (stored, not deflated: MP3 does not
+    compress), then a manifest CSV with the result per recording. Downloads run on a thread
+    pool with a bounded window, so memory holds at most 2 x workers recordings.
+    progress(done, total, failed, bytes) is called after each recording.
+    """
+    total = count_recordings(db, filters) if progress else None
+    done = failed = written = 0
+    items = iter_recordings(db, filters, chunk_rows)
+    manifest = tempfile.SpooledTemporaryFile(max_size=1024 * 1024, mode="w+", encoding="utf-8", newline="")
+    writer = csv.writer(manifest)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="export-audio") as pool:
+        pending = {}
+
+        def submit_next() -> bool:
+            item = next(items, None)
+            if item is not None:
+                pending[pool.submit(recordings.read, item[3])] = item
+            return item is not None
+
+        for _ in range(workers * 2):
+            if not submit_next():
+                break
+        while pending:
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                call_sid, started_at, kind, recording_sid, name = pending.pop(future)
+                size = 0
+                try:
+                    data = future.result()
+                except recordings.RecordingNotFound:
+                    result = "not_found"
+                except httpx.HTTPError as e:
+                    result = f"error: {e}"
+                else:
+                    info = zf.zipinfo_cls(name, date_time=_zip_time(started_at))
+                    info.compress_type = ZIP_STORED
+                    zf.writestr(info, data)
+                    result, size = "ok", len(data)
+                done += 1
+                failed += result != "ok"
+                written += size
+                writer.writerow([call_sid, kind, recording_sid, name if size else "", result, size])
+                submit_next()
+                if progress:
+                    progress(done, total, failed, written)
+                chunk = sink.take()
+                if chunk:
+                    yield chunk
+
+    manifest.seek(0)
+    today = datetime.now().strftime("%Y%m%d")
+    with zf.open(f"{today}_recordings.csv", 'w', force_zip64=True) as entry:
+        text = io.TextIOWrapper(entry, encoding='utf-8', newline='')
+        csv.writer(text).writerow(RECORDING_HEADER)
+        while True:
+            block = manifest.read(64 * 1024)
+            if not block:
+                break
+            text.write(block)
+            text.flush()
+            yield sink.take()
+        text.flush()
+        text.detach()
+    manifest.close()
+    yield sink.take()
+
+
+def stream_zip(
+    filters: ExportFilters,
+    chunk_rows: int = CHUNK_ROWS,
+    db: Optional[Session] = None,
+    progress=None,
+    audio_workers: int = AUDIO_WORKERS,
+):
+    """
+    Yield the encrypted ZIP (logs CSV + messages CSV, plus the recordings when
+    filters.include_audio) piece by piece.
+    Memory stays at one row batch plus the deflate/AES state, whatever the export size.
+    Uses its own session unless one is given: the request's session is closed before
+    a streaming body is sent.
+    """
+    import pyzipper  # only export requests pay for it (see app/warmup.py)
+    own_session = db is None
+    if own_session:
+        db = SessionLocal()
+    sink = ChunkSink()
+    today = datetime.now().strftime("%Y%m%d")
+    entries = [
+        (f"{today}_logs.csv", LOG_HEADER, iter_log_rows),
+        (f"{today}_messages.csv", MESSAGE_HEADER, iter_message_rows),
+    ]
+    try:
+        with pyzipper.AESZipFile(sink, 'w', compression=pyzipper.ZIP_DEFLATED, encryption=pyzipper.WZ_AES) as zf:
+            zf.setpassword(ZIP_PASSWORD)
+            zf.setencryption(pyzipper.WZ_AES, nbits=256)
+            for name, header, rows in entries:
+                # Size unknown up front: force_zip64 so entries over 4 GiB stay valid
+                with zf.open(name, 'w', force_zip64=True) as entry:
+                    text = io.TextIOWrapper(entry, encoding='utf-8', newline='')
+                    writer = csv.writer(text)
+                    writer.writerow(header)
+                    for i, row in enumerate(rows(db, filters, chunk_rows), 1):
+                        writer.writerow(row)
+                        if i % chunk_rows == 0:
+                            text.flush()
+                            chunk = sink.take()
+                            if chunk:
+                                yield chunk
+                    text.flush()
+                    text.detach()  # the ZIP entry is closed by the with block, not the wrapper
+                yield sink.take()
+            if filters.include_audio:
+                yield from _write_audio(zf, sink, db, filters, chunk_rows, audio_workers, progress)
+        yield sink.take()
+    finally:
+        if own_session:
+            db.close()
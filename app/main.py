@@ -1,10 +1,15 @@
+import os
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
-from .database import engine, Base
+from .database import engine
 from .routers import twilio, admin, realtime
 
-# Create tables
-Base.metadata.create_all(bind=engine)
+# Nothing here touches the database or imports the heavy SDKs at import time: the SDKs load
+# in the warm-up (app/warmup.py). uvicorn only binds the port once every startup hook has
+# returned, so the schema upgrade delays the first answered request unless the deploy runs
+# `python migrate.py` as its release step and sets MIGRATE_ON_STARTUP=0 (Procfile,
+# render.yaml, railway.toml).
+MIGRATE_ON_STARTUP = os.getenv("MIGRATE_ON_STARTUP", "1") == "1"
 
 app = FastAPI(title="Twilio Scenario System")
 
@@ -15,6 +20,68 @@ app.include_router(admin.router)
 app.include_router(realtime.router)
 
 
+@app.on_event("startup")
+def upgrade_schema():
+    # Create tables, add new columns/indexes, run pending data migrations.
+    # With MIGRATE_ON_STARTUP=0 only check that the release step did (one query); upgrade
+    # anyway if not, e.g. a SQLite file the release step's container never saw.
+    from .migrations import is_current, upgrade
+    if MIGRATE_ON_STARTUP or not is_current(engine):
+        upgrade(engine)
+
+
+@app.on_event("startup")
+async def bind_event_bus():
+    # Publishers in worker threads hand events to this loop (see app/events.py)
+    import asyncio
+    from .events import bus
+    bus.bind(asyncio.get_running_loop())
+
+
+@app.on_event("startup")
+def load_blacklist():
+    from .database import SessionLocal
+    from .blacklist import index
+    db = SessionLocal()
+    try:
+        index.load(db)
+    finally:
+        db.close()
+
+
+@app.on_event("startup")
+def resume_dialers():
+    # Re-arm window timers for scenarios that were dialing before a restart
+    from .scheduling import resume_all
+    resume_all()
+
+
+@app.on_event("startup")
+def resume_import_jobs():
+    from .import_jobs import resume_all
+    resume_all()
+
+
+@app.on_event("startup")
+def start_recording_prefetch():
+    # Keeps the newest calls' recordings in the local cache (see app/recordings.py)
+    from .recordings import start_prefetcher
+    start_prefetcher()
+
+
+@app.on_event("startup")
+def resume_export_jobs():
+    from .export_jobs import resume_all
+    resume_all()
+
+
+@app.on_event("startup")
+async def start_warmup():
+    import asyncio
+    from .warmup import start
+    start(asyncio.get_running_loop())
+
+
 @app.get("/")
 def read_root():
     return {"message": "System is running"}
@@ -0,0 +1,154 @@
+from datetime import datetime
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.schema import CreateIndex
+from .database import Base, engine as default_engine, create_index, ddl_connection
+from . import models, search
+
+# Schema upgrades for SQLite and PostgreSQL. The models are the source of truth:
+#   1. create_all() creates missing tables (with their indexes)
+#   2. columns declared on the models but missing in the database are added
+#   3. versioned data migrations (MIGRATIONS) run once each, recorded in schema_migrations
+#   4. indexes declared on the models but missing in the database are created
+# Every step is idempotent, so upgrade() is safe to run on every start.
+# Steps 3 and 4 run on a ddl_connection: on PostgreSQL each statement commits on its own and
+# indexes are built CONCURRENTLY, so the release still serving traffic keeps writing.
+
+
+def _literal_default(column, dialect: str):
+    default = column.default
+    if default is None or not default.is_scalar:
+        return None
+    value = default.arg
+    if isinstance(value, bool):
+        if dialect == "postgresql":
+            return "TRUE" if value else "FALSE"
+        return "1" if value else "0"
+    if isinstance(value, (int, float)):
+        return str(value)
+    if isinstance(value, str):
+        return "'" + value.replace("'", "''") + "'"
+    return None
+
+
+def add_missing_columns(conn: Connection):
+    inspector = inspect(conn)
+    dialect = conn.dialect.name
+    for table in Base.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing or column.primary_key:
+                continue
+            ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(dialect=conn.dialect)}"
+            default = _literal_default(column, dialect)
+            if default is not None:
+                ddl += f" DEFAULT {default}"
+            conn.execute(text(ddl))
+            print(f"- Added {table.name}.{column.name}")
+
+
+def sync_indexes(conn: Connection):
+    inspector = inspect(conn)
+    postgresql = conn.dialect.name == "postgresql"
+    for table in Base.metadata.sorted_tables:
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            # PostgreSQL: create_index checks validity itself (a failed build leaves an INVALID index)
+            if index.name in existing and not postgresql:
+                continue
+            ddl = str(CreateIndex(index).compile(dialect=conn.dialect))
+            try:
+                if postgresql:
+                    if not create_index(conn, index.name, ddl):
+                        continue
+                else:
+                    # Savepoint: a failed plain index must not abort the rest
+                    with conn.begin_nested():
+                        create_index(conn, index.name, ddl)
+                print(f"- Created index {index.name}")
+            except Exception as e:
+                # Code relies on unique indexes (ON CONFLICT targets): never run without one
+                if index.unique:
+                    raise
+                print(f"- Could not create index {index.name}: {e}")
+
+
+# --- Versioned data migrations ---
+def _metadata_json_to_jsonb(conn: Connection):
+    # SQLite keeps the TEXT column (JSON1 reads it as-is); PostgreSQL needs a real JSONB
+    if conn.dialect.name != "postgresql":
+        return
+    column = next(c for c in inspect(conn).get_columns("call_targets") if c["name"] == "metadata_json")
+    if column["type"].__class__.__name__ != "JSONB":
+        conn.execute(text(
+            "ALTER TABLE call_targets ALTER COLUMN metadata_json TYPE JSONB USING metadata_json::jsonb"
+        ))
+
+
+def _transcript_search_index(conn: Connection):
+    search.install(conn)
+
+
+def _dedupe_call_targets(conn: Connection):
+    # The baseline schema allowed the same number twice in a scenario. Keep the first row
+    # (min id) of each (scenario_id, phone_number), point calls at it, and create the unique
+    # index the importer's ON CONFLICT relies on. NULLs never conflict in a unique index:
+    # leave them. On SQLite all of it is one transaction; on PostgreSQL a duplicate inserted
+    # before the concurrent build finishes fails it, and the migration (not yet recorded)
+    # runs again on the next upgrade.
+    later = (
+        "SELECT t.id FROM call_targets t WHERE EXISTS (SELECT 1 FROM call_targets k "
+        "WHERE k.scenario_id = t.scenario_id AND k.phone_number = t.phone_number AND k.id < t.id)"
+    )
+    conn.execute(text(
+        "UPDATE calls SET call_target_id = (SELECT MIN(k.id) FROM call_targets t JOIN call_targets k "
+        "ON k.scenario_id = t.scenario_id AND k.phone_number = t.phone_number WHERE t.id = calls.call_target_id) "
+        f"WHERE call_target_id IN ({later})"
+    ))
+    deleted = conn.execute(text(f"DELETE FROM call_targets WHERE id IN ({later})")).rowcount
+    if deleted:
+        print(f"- Removed {deleted} duplicate call targets")
+    index = next(i for i in models.CallTarget.__table__.indexes if i.name == "uq_call_targets_scenario_phone")
+    if conn.dialect.name == "postgresql" or not inspect(conn).has_index("call_targets", index.name):
+        create_index(conn, index.name, str(CreateIndex(index).compile(dialect=conn.dialect)))
+
+
+MIGRATIONS = [
+    (1, "call_targets.metadata_json as JSONB", _metadata_json_to_jsonb),
+    (2, "transcript full-text search index", _transcript_search_index),
+    (3, "unique (scenario_id, phone_number) on call_targets", _dedupe_call_targets),
+    (4, "transcript search index keyed on stable ids", _transcript_search_index),
+]
+
+
+def applied_versions(conn: Connection) -> set:
+    return {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+
+def is_current(engine: Engine = default_engine) -> bool:
+    """Whether every migration has been applied (False on a database upgrade() never ran on)."""
+    with engine.connect() as conn:
+        if not inspect(conn).has_table(models.SchemaMigration.__tablename__):
+            return False
+        return {version for version, _, _ in MIGRATIONS} <= applied_versions(conn)
+
+
+def upgrade(engine: Engine = default_engine):
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        add_missing_columns(conn)
+
+    with engine.connect() as conn:
+        done = applied_versions(conn)
+    for version, name, migrate in MIGRATIONS:
+        if version in done:
+            continue
+        with ddl_connection(engine) as conn:
+            migrate(conn)
+            conn.execute(models.SchemaMigration.__table__.insert().values(
+                version=version, name=name, applied_at=datetime.utcnow()
+            ))
+        print(f"- Applied migration {version}: {name}")
+
+    with ddl_connection(engine) as conn:
+        sync_indexes(conn)
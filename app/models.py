@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, BigInteger, String, Boolean, Date, DateTime, ForeignKey, Text, Index, Float, JSON
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from .database import Base
@@ -18,6 +19,7 @@ class Scenario(Base):
     end_time = Column(String, default="18:00")
     is_active = Column(Boolean, default=True) # ソフト停止用
     is_hard_stopped = Column(Boolean, default=False) # ハード停止用
+    is_dialing = Column(Boolean, default=False) # 架電開始済み (稼働時間内は自動で発信・時間外は待機)
     
     silence_timeout_short = Column(Integer, default=15) # 15秒ごとのメッセージ
     silence_timeout_long = Column(Integer, default=60) # 60秒で切断
@@ -29,6 +31,12 @@ class Scenario(Base):
     default_expand_details = Column(Boolean, default=False)
     # Target condition: Voice is connected until disconnected (record everything)
     auto_record = Column(Boolean, default=True) 
+
+    # Retry policy for no-answer / busy / failed targets
+    max_attempts = Column(Integer, default=1) # 1 = no retry
+    retry_backoff_minutes = Column(String, default="30,60,120") # n-th retry waits n-th value (minutes)
+    indexed_metadata_keys = Column(String, default="") # カンマ区切り: 絞り込み用にインデックスを張るCSV列
+    config_version = Column(Integer, default=1) # scenario/question/ending edits bump this (see app/scenario_cache.py)
     
     deleted_at = Column(DateTime, nullable=True) # Soft delete functionality
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -50,6 +58,10 @@ class EndingGuidance(Base):
     
     scenario = relationship("Scenario", back_populates="ending_guidances")
 
+    __table_args__ = (
+        Index("ix_ending_guidances_scenario_sort", "scenario_id", "sort_order"),
+    )
+
 class PhoneNumber(Base):
     __tablename__ = "phone_numbers"
 
@@ -73,20 +85,134 @@ class Question(Base):
 
     scenario = relationship("Scenario", back_populates="questions")
 
+    __table_args__ = (
+        # Stream setup / scenario editor: questions of a scenario in order
+        Index("ix_questions_scenario_sort", "scenario_id", "sort_order"),
+    )
+
 class CallTarget(Base):
     __tablename__ = "call_targets"
     
     id = Column(Integer, primary_key=True, index=True)
     scenario_id = Column(Integer, ForeignKey("scenarios.id"))
     phone_number = Column(String, index=True)
-    status = Column(String, default="pending") # pending, calling, completed, failed, opted_out
-    metadata_json = Column(Text, nullable=True) # CSVの他カラムを保存
+    status = Column(String, default="pending") # pending, scheduled, claimed, calling, completed, no_answer, busy, failed, opted_out
+    metadata_json = Column(JSON().with_variant(JSONB(), "postgresql"), nullable=True) # CSVの他カラム (PG: JSONB, SQLite: JSON1)
+    timezone = Column(String, nullable=True) # IANA名 (metadataのtimezone/regionから). NULL = CALLING_DEFAULT_TIMEZONE
+
+    # Dialer claim (see app/dialer.py)
+    claimed_by = Column(String, nullable=True) # worker id (host:pid)
+    claimed_at = Column(DateTime, nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True)
+
+    # Retry scheduling (status=scheduled until next_attempt_at)
+    attempt_count = Column(Integer, default=0)
+    next_attempt_at = Column(DateTime, nullable=True)
     
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     scenario = relationship("Scenario", back_populates="targets")
 
+    __table_args__ = (
+        # Due retries: scenario_id = ? AND status = 'scheduled' AND next_attempt_at <= now
+        Index("ix_call_targets_due", "scenario_id", "status", "next_attempt_at"),
+        # Pending / expired claims: scenario_id = ? AND status = ? ORDER BY id (no sort step)
+        Index("ix_call_targets_scenario_status_id", "scenario_id", "status", "id"),
+        # Target list pages without a status filter: scenario_id = ? ORDER BY id
+        Index("ix_call_targets_scenario_id", "scenario_id", "id"),
+        # One row per number per scenario; bulk imports rely on it for ON CONFLICT DO NOTHING
+        Index("uq_call_targets_scenario_phone", "scenario_id", "phone_number", unique=True),
+    )
+
+class CampaignProgress(Base):
+    __tablename__ = "campaign_progress"
+
+    # One row per scenario, counters are bumped incrementally (see dialer.bump_progress)
+    scenario_id = Column(Integer, ForeignKey("scenarios.id"), primary_key=True)
+    total = Column(Integer, default=0)
+    dialed = Column(Integer, default=0)
+    completed = Column(Integer, default=0)
+    no_answer = Column(Integer, default=0)
+    busy = Column(Integer, default=0)
+    failed = Column(Integer, default=0)
+    opted_out = Column(Integer, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class ImportJob(Base):
+    __tablename__ = "import_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    scenario_id = Column(Integer, ForeignKey("scenarios.id"), index=True)
+    filename = Column(String, nullable=True)
+    status = Column(String, default="queued") # queued, running, completed, canceled, failed
+    staged_path = Column(String) # uploaded CSV on local disk
+    error_path = Column(String, nullable=True) # CSV of rows that were not imported
+    total_bytes = Column(Integer, default=0)
+    bytes_read = Column(Integer, default=0)
+    rows_read = Column(Integer, default=0)
+    accepted = Column(Integer, default=0)
+    duplicates = Column(Integer, default=0)
+    invalid = Column(Integer, default=0)
+    blacklisted = Column(Integer, default=0)
+    rows_per_sec = Column(Float, nullable=True)
+    error = Column(Text, nullable=True)
+    # Process running the job and its liveness (see app/job_heartbeat.py)
+    owner = Column(String, nullable=True) # host:pid
+    heartbeat_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+class ExportJob(Base):
+    __tablename__ = "export_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    filters_key = Column(String, index=True) # hash of the normalized filters (cache key)
+    filters_json = Column(JSON) # log_export.ExportFilters arguments
+    status = Column(String, default="queued") # queued, running, completed, failed, expired
+    path = Column(String, nullable=True) # generated ZIP on local disk
+    size_bytes = Column(Integer, nullable=True)
+    error = Column(Text, nullable=True)
+    # Audio exports: recordings added so far (failed = not found / not fetched, listed in the manifest)
+    audio_total = Column(Integer, nullable=True)
+    audio_done = Column(Integer, default=0)
+    audio_failed = Column(Integer, default=0)
+    audio_bytes = Column(BigInteger, default=0)
+    # API process whose worker pool builds the job and its liveness (see app/job_heartbeat.py)
+    owner = Column(String, nullable=True) # host:pid
+    heartbeat_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+class CallStatDaily(Base):
+    __tablename__ = "call_stats_daily"
+
+    # One row per scenario, day (CALLING_DEFAULT_TIMEZONE) and classification; counters only grow
+    scenario_id = Column(Integer, primary_key=True) # 0 = call without scenario
+    day = Column(Date, primary_key=True)
+    classification = Column(String, primary_key=True) # "" = not classified
+    calls = Column(Integer, default=0)
+    completed = Column(Integer, default=0)
+    duration_total = Column(Integer, default=0) # seconds, over calls with a duration
+    duration_calls = Column(Integer, default=0)
+    bridged = Column(Integer, default=0)
+    sms_sent = Column(Integer, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        # Date-range reads across scenarios
+        Index("ix_call_stats_daily_day", "day"),
+    )
+
+class Blacklist(Base):
+    __tablename__ = "blacklist"
+
+    phone_number = Column(String, primary_key=True) # E.164 format
+    reason = Column(String, nullable=True) # manual, ai_opt_out, etc
+    created_at = Column(DateTime, default=datetime.utcnow, index=True) # incremental index refresh
+
 
 class Call(Base):
     __tablename__ = "calls"
@@ -95,6 +221,7 @@ class Call(Base):
     from_number = Column(String, index=True)
     to_number = Column(String, index=True)
     scenario_id = Column(Integer, ForeignKey("scenarios.id"), nullable=True)
+    call_target_id = Column(Integer, ForeignKey("call_targets.id"), nullable=True, index=True) # outbound only
     status = Column(String) # queued, ringing, in-progress, completed, busy, failed, no-answer
     direction = Column(String, default="inbound") # inbound, outbound
     
@@ -104,6 +231,7 @@ class Call(Base):
     
     bridge_executed = Column(Boolean, default=False)
     sms_sent_log = Column(Boolean, default=False)
+    stats_counted = Column(Boolean, default=False) # included in call_stats_daily (see app/call_stats.py)
     
     transcript_full = Column(Text, nullable=True) # 高精度文字起こし
     
@@ -120,11 +248,17 @@ class Call(Base):
     def scenario_name(self):
         return self.scenario.name if self.scenario else None
 
+    __table_args__ = (
+        # Keyset pagination of the call log (all calls / per scenario), newest first
+        Index("ix_calls_started_at_sid", "started_at", "call_sid"),
+        Index("ix_calls_scenario_started_at_sid", "scenario_id", "started_at", "call_sid"),
+    )
+
 class Message(Base):
     __tablename__ = "messages"
 
     id = Column(Integer, primary_key=True, index=True)
-    call_sid = Column(String, ForeignKey("calls.call_sid"))
+    call_sid = Column(String, ForeignKey("calls.call_sid"), index=True)
     recording_sid = Column(String, nullable=True)
     recording_url = Column(String, nullable=True)
     transcript_text = Column(Text, nullable=True)
@@ -136,7 +270,7 @@ class Answer(Base):
     __tablename__ = "answers"
 
     id = Column(Integer, primary_key=True, index=True)
-    call_sid = Column(String, ForeignKey("calls.call_sid"))
+    call_sid = Column(String, ForeignKey("calls.call_sid"), index=True)
     question_id = Column(Integer, ForeignKey("questions.id"), nullable=True)
     answer_type = Column(String, default="recording") # recording, dtmf, etc
     
@@ -164,7 +298,7 @@ class TranscriptionLog(Base):
     __tablename__ = "transcription_logs"
     
     id = Column(Integer, primary_key=True, index=True)
-    answer_id = Column(Integer, ForeignKey("answers.id"), nullable=True)
+    answer_id = Column(Integer, ForeignKey("answers.id"), nullable=True, index=True)
     service = Column(String, default="openai_whisper")
     status = Column(String) # success, failed
     
@@ -180,3 +314,10 @@ class TranscriptionLog(Base):
     
     created_at = Column(DateTime, default=datetime.utcnow)
 
+class SchemaMigration(Base):
+    __tablename__ = "schema_migrations"
+
+    # Versioned data migrations already applied (see app/migrations.py)
+    version = Column(Integer, primary_key=True)
+    name = Column(String)
+    applied_at = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,142 @@
+import os
+import threading
+import time
+from collections import deque
+
+# Number of concurrent live AI (Realtime bridge) sessions the dialer aims for
+TARGET_LIVE_SESSIONS = int(os.getenv("PACING_TARGET_LIVE_SESSIONS", "5"))
+MAX_CALLS_PER_SEC = float(os.getenv("PACING_MAX_CALLS_PER_SEC", "2"))
+MIN_CALLS_PER_SEC = float(os.getenv("PACING_MIN_CALLS_PER_SEC", "0.02"))
+
+# Twilio final statuses that mean the callee never picked up
+UNANSWERED_STATUSES = {"no-answer", "busy", "failed", "canceled"}
+FINAL_STATUSES = UNANSWERED_STATUSES | {"completed"}
+
+
+class PacingController:
+    """
+    Adaptive dial-rate controller.
+
+    Little's law: live_sessions = dial_rate * answer_rate * avg_duration, so the steady-state
+    rate for a target is target / (answer_rate * avg_duration). answer_rate and avg_duration are
+    EWMAs fed by status_callback outcomes; a proportional term on (target - live) corrects
+    for estimation error. Calls already dialed but not yet finished are counted as expected
+    live sessions (in_flight * answer_rate) so bursts do not overshoot; a dial leaves in_flight
+    when its Realtime session starts or its final status arrives.
+    """
+
+    def __init__(
+        self,
+        target_live_sessions: int = TARGET_LIVE_SESSIONS,
+        max_rate: float = MAX_CALLS_PER_SEC,
+        min_rate: float = MIN_CALLS_PER_SEC,
+        alpha: float = 0.05,
+        gain: float = 0.5,
+        history_size: int = 720,
+    ):
+        self.target_live_sessions = target_live_sessions
+        self.max_rate = max_rate
+        self.min_rate = min_rate
+        self.alpha = alpha
+        self.gain = gain
+
+        # Priors until real outcomes arrive
+        self.answer_rate = 0.3
+        self.avg_duration = 90.0
+
+        self.live_sessions = 0
+        self.in_flight = set()  # call_target_ids dialed but not yet answered / finished
+        self.rate = min_rate
+        self.outcomes = 0
+
+        self.history = deque(maxlen=history_size)
+        self._budget = 0.0
+        self._last_tick = None
+        self._lock = threading.Lock()
+
+    # --- Inputs ---
+    def session_started(self, call_target_id: int = None):
+        with self._lock:
+            self.live_sessions += 1
+            self.in_flight.discard(call_target_id)
+
+    def session_ended(self):
+        with self._lock:
+            self.live_sessions = max(self.live_sessions - 1, 0)
+
+    def call_dialed(self, call_target_id: int):
+        with self._lock:
+            self.in_flight.add(call_target_id)
+
+    def record_outcome(self, call_target_id: int, call_status: str, duration: int = None, classification: str = None):
+        """Feed a final Twilio CallStatus (and CallDuration) from status_callback."""
+        if call_status not in FINAL_STATUSES:
+            return
+        answered = call_status == "completed" and bool(duration)
+        with self._lock:
+            self.in_flight.discard(call_target_id)
+            self.outcomes += 1
+            self.answer_rate += self.alpha * ((1.0 if answered else 0.0) - self.answer_rate)
+            if answered:
+                self.avg_duration += self.alpha * (float(duration) - self.avg_duration)
+
+    # --- Decisions ---
+    def take(self, max_calls: int, now: float = None) -> int:
+        """How many calls to place right now (0..max_calls). Call this once per dialer tick."""
+        now = time.time() if now is None else now
+        with self._lock:
+            answer_rate = max(self.answer_rate, 0.01)
+            avg_duration = max(self.avg_duration, 1.0)
+
+            expected_live = self.live_sessions + len(self.in_flight) * answer_rate
+            error = self.target_live_sessions - expected_live
+            base = self.target_live_sessions / (answer_rate * avg_duration)
+            correction = self.gain * error / (answer_rate * avg_duration)
+            self.rate = min(max(base + correction, self.min_rate), self.max_rate)
+
+            elapsed = 0.0 if self._last_tick is None else max(now - self._last_tick, 0.0)
+            self._last_tick = now
+            # Cap the accumulated budget so an idle period does not release a burst
+            self._budget = min(self._budget + self.rate * elapsed, float(max_calls))
+
+            # Never dial more than the remaining headroom is expected to absorb
+            headroom = int(max(error, 0.0) / answer_rate)
+            calls = min(int(self._budget), headroom, max_calls)
+            self._budget -= calls
+
+            self.history.append({
+                "t": now,
+                "rate": round(self.rate, 4),
+                "calls": calls,
+                "live": self.live_sessions,
+                "in_flight": len(self.in_flight),
+                "answer_rate": round(self.answer_rate, 4),
+                "avg_duration": round(self.avg_duration, 1),
+            })
+            return calls
+
+    def give_back(self, calls: int):
+        """Return budget taken for calls that were not placed (blacklisted, deferred, not claimed, dial failed)."""
+        if calls <= 0:
+            return
+        with self._lock:
+            self._budget += calls
+            if self.history:
+                self.history[-1]["calls"] = max(self.history[-1]["calls"] - calls, 0)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "target_live_sessions": self.target_live_sessions,
+                "rate": self.rate,
+                "live_sessions": self.live_sessions,
+                "in_flight": len(self.in_flight),
+                "answer_rate": self.answer_rate,
+                "avg_duration": self.avg_duration,
+                "outcomes": self.outcomes,
+                "history": list(self.history),
+            }
+
+
+# Process-wide controller shared by all dialer workers and the Realtime bridge
+controller = PacingController()
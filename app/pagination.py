@@ -0,0 +1,48 @@
+import base64
+import json
+from datetime import datetime
+from fastapi import HTTPException
+from sqlalchemy import literal, tuple_
+
+# Opaque keyset cursors: the sort key of the last row of a page, base64url-encoded JSON.
+# Datetimes are tagged so they round-trip exactly.
+
+
+def encode_cursor(*values) -> str:
+    payload = [{"dt": v.isoformat()} if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> list:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        values = [datetime.fromisoformat(v["dt"]) if isinstance(v, dict) else v for v in payload]
+    except (ValueError, TypeError, KeyError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if len(values) != size:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+
+def keyset_page(query, columns, cursor: str, limit: int, descending: bool = True):
+    """
+    One page of `query` ordered by `columns` (unique together), starting after `cursor`.
+    The row-value comparison lets both SQLite and PostgreSQL seek straight into a
+    composite index on `columns`, so deep pages cost the same as the first one.
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    if cursor:
+        after = decode_cursor(cursor, len(columns))
+        key = tuple_(*columns)
+        bound = tuple_(*[literal(value, column.type) for value, column in zip(after, columns)])
+        query = query.filter(key < bound if descending else key > bound)
+    order = [c.desc() for c in columns] if descending else [c.asc() for c in columns]
+    rows = query.order_by(*order).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(*[getattr(last, c.key) for c in columns])
+    return rows, next_cursor
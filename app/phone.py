@@ -0,0 +1,152 @@
+import re
+import unicodedata
+from functools import lru_cache
+from typing import Optional, Tuple
+
+# Normalizes Japanese domestic ("090-1234-5678", "03(1234)5678"), international ("+81 90 ...",
+# "010-81-...", "0081...") and full-width ("０９０－１２３４－５６７８") forms to E.164.
+
+DEFAULT_COUNTRY_CODE = "81"
+
+# Removed after NFKC (which already folds full-width digits, "＋", "－", "（）" and spaces to ASCII)
+SEPARATORS = r"[\s\-‐‑‒–—―−ー()./・]"
+_SEPARATORS_RE = re.compile(SEPARATORS)
+_DIGITS_RE = re.compile(r"[0-9]+")
+
+# Validation reasons
+EMPTY = "empty"
+INVALID_CHARACTERS = "invalid_characters"
+TOO_SHORT = "too_short"
+TOO_LONG = "too_long"
+INVALID_JP_LENGTH = "invalid_jp_length"
+
+# E.164: at most 15 digits including the country code; shorter than 8 is never a dialable number
+MIN_DIGITS = 8
+MAX_DIGITS = 15
+# Japanese national significant number: 9 (landline) or 10 (mobile/IP/050) digits
+JP_NSN_LENGTHS = (9, 10)
+
+# Bulk path amortizes the fixed per-call pandas overhead from roughly this many values
+BULK_MIN_SIZE = 20_000
+
+
+def _to_digits(cleaned: str) -> str:
+    """Country code + national number (no '+') for a separator-free string."""
+    if cleaned.startswith("+"):
+        digits = cleaned[1:]
+    elif cleaned.startswith("010"):
+        digits = cleaned[3:]  # Japanese international call prefix
+    elif cleaned.startswith("00"):
+        digits = cleaned[2:]
+    elif cleaned.startswith("0"):
+        digits = DEFAULT_COUNTRY_CODE + cleaned[1:]
+    elif cleaned.startswith(DEFAULT_COUNTRY_CODE) and len(cleaned) in (11, 12):
+        digits = cleaned  # country code written without '+'
+    else:
+        digits = DEFAULT_COUNTRY_CODE + cleaned  # leading zero lost (e.g. by a spreadsheet)
+    # "+81 (0)90..." / "+81090...": the trunk zero is not dialed after the country code
+    if digits.startswith(DEFAULT_COUNTRY_CODE + "0"):
+        digits = DEFAULT_COUNTRY_CODE + digits[3:]
+    return digits
+
+
+@lru_cache(maxsize=100_000)
+def validate(value: str) -> Tuple[Optional[str], Optional[str]]:
+    """(E.164 number, None) or (None, reason). Memoized: webhooks and single adds repeat numbers."""
+    value = value or ""
+    if not value.isascii():
+        value = unicodedata.normalize("NFKC", value)
+    cleaned = _SEPARATORS_RE.sub("", value)
+    if not cleaned:
+        return None, EMPTY
+    digits = _to_digits(cleaned)
+    if not _DIGITS_RE.fullmatch(digits):
+        return None, INVALID_CHARACTERS
+    if len(digits) < MIN_DIGITS:
+        return None, TOO_SHORT
+    if len(digits) > MAX_DIGITS:
+        return None, TOO_LONG
+    if digits.startswith(DEFAULT_COUNTRY_CODE) and len(digits) - len(DEFAULT_COUNTRY_CODE) not in JP_NSN_LENGTHS:
+        return None, INVALID_JP_LENGTH
+    return "+" + digits, None
+
+
+def normalize(value: str) -> Optional[str]:
+    return validate(value)[0]
+
+
+def normalize_or_raw(value: str) -> str:
+    """For webhook To/From: normalize real numbers, keep 'anonymous', 'client:...' etc. unchanged."""
+    if not value:
+        return value
+    return validate(value)[0] or value
+
+
+@lru_cache(maxsize=None)
+def _string_dtype():
+    # Arrow-backed strings run the .str operations in C++; object dtype loops in Python
+    try:
+        import pyarrow  # noqa: F401
+        return "string[pyarrow]"
+    except ImportError:
+        return object
+
+
+def normalize_bulk(values):
+    """
+    Vectorized version of validate() over a sequence (pandas string ops, no per-row Python).
+    Returns a DataFrame with columns `number` (E.164 or None) and `reason` (None when valid).
+    """
+    import numpy as np
+    import pandas as pd
+
+    cc = DEFAULT_COUNTRY_CODE
+    s = pd.Series(values, dtype=_string_dtype()).fillna("")
+    # NFKC has no vectorized kernel: only pay for it on the (few) non-ASCII values
+    non_ascii = ~s.str.isascii()
+    if non_ascii.any():
+        s = s.copy()
+        s[non_ascii] = s[non_ascii].str.normalize("NFKC")
+    cleaned = s.str.replace(SEPARATORS, "", regex=True)
+
+    # Same decisions as _to_digits(): strip the dialing prefix, then add the country code
+    # unless the number was international or already starts with it
+    international = cleaned.str.contains(r"^(?:\+|00)|^010", regex=True)
+    body = cleaned.str.replace(r"^(?:\+|010|00|0)", "", regex=True)
+    with_cc = international | (
+        body.str.startswith(cc) & body.str.len().isin([11, 12]) & ~cleaned.str.startswith("0")
+    )
+    digits = body.where(with_cc, cc + body)
+    digits = digits.str.replace(f"^{cc}0", cc, regex=True)
+
+    digit_count = digits.str.len().to_numpy(dtype=np.int64)
+    reason = np.select(
+        [
+            (cleaned == "").to_numpy(dtype=bool),
+            (~digits.str.fullmatch(r"[0-9]+")).to_numpy(dtype=bool),
+            digit_count < MIN_DIGITS,
+            digit_count > MAX_DIGITS,
+            digits.str.startswith(cc).to_numpy(dtype=bool) & ~np.isin(digit_count - len(cc), JP_NSN_LENGTHS),
+        ],
+        [EMPTY, INVALID_CHARACTERS, TOO_SHORT, TOO_LONG, INVALID_JP_LENGTH],
+        default="",
+    )
+    valid = reason == ""
+    numbers = ("+" + digits).to_numpy(dtype=object)
+    return pd.DataFrame({
+        "number": pd.Series(np.where(valid, numbers, None), index=s.index, dtype=object),
+        "reason": pd.Series(np.where(valid, None, reason), index=s.index, dtype=object),
+    })
+
+
+def validate_many(values) -> Tuple[list, list]:
+    """
+    (numbers, reasons) lists for a chunk. Large chunks take the bulk path when Arrow-backed
+    strings are available; with object dtype pandas is slower than the scalar loop (see
+    benchmarks/phone_normalize.py), so the memoized scalar path is used instead.
+    """
+    if len(values) >= BULK_MIN_SIZE and _string_dtype() is not object:
+        result = normalize_bulk(values)
+        return result["number"].tolist(), result["reason"].tolist()
+    pairs = [validate(value) for value in values]
+    return [p[0] for p in pairs], [p[1] for p in pairs]
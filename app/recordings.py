@@ -0,0 +1,249 @@
+import os
+import re
+import threading
+import httpx
+from .database import SessionLocal
+from . import models
+
+# Local cache of Twilio recordings behind GET /admin/recordings/{sid}.
+# Each recording is downloaded once with a pooled, authenticated client and kept on disk;
+# playback and seeking (HTTP Range) are then served from the file. Files are evicted least
+# recently used first once the directory exceeds CACHE_MB. A background thread prefetches
+# the recordings of the newest calls so opening the call log plays instantly.
+
+RECORDINGS_DIR = os.getenv("RECORDINGS_DIR", "./data/recordings")
+CACHE_MB = int(os.getenv("RECORDINGS_CACHE_MB", "2048"))
+# Newest calls whose call + answer recordings are prefetched (0 disables prefetching)
+PREFETCH_CALLS = int(os.getenv("RECORDINGS_PREFETCH_CALLS", "50"))
+PREFETCH_INTERVAL_SECONDS = float(os.getenv("RECORDINGS_PREFETCH_INTERVAL_SECONDS", "60"))
+TWILIO_API_BASE = os.getenv("TWILIO_API_BASE", "https://api.twilio.com")
+TWILIO_ACCOUNT_SID = os.getenv("TWILIO_ACCOUNT_SID")
+TWILIO_AUTH_TOKEN = os.getenv("TWILIO_AUTH_TOKEN")
+MAX_CONNECTIONS = int(os.getenv("RECORDINGS_MAX_CONNECTIONS", "8"))
+
+SID_RE = re.compile(r"RE[0-9a-fA-F]{32}")
+CHUNK_SIZE = 64 * 1024
+
+
+class RecordingNotFound(Exception):
+    pass
+
+
+_client = None
+_client_lock = threading.Lock()
+_fetch_locks = {}
+_fetch_locks_lock = threading.Lock()
+_evict_lock = threading.Lock()
+
+
+def get_client() -> httpx.Client:
+    """One keep-alive connection pool for every download (thread-safe)."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = httpx.Client(
+                auth=(TWILIO_ACCOUNT_SID or "", TWILIO_AUTH_TOKEN or ""),
+                timeout=httpx.Timeout(30.0, connect=10.0),
+                limits=httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_CONNECTIONS),
+                follow_redirects=True,
+            )
+        return _client
+
+
+def recording_url(recording_sid: str) -> str:
+    return f"{TWILIO_API_BASE}/2010-04-01/Accounts/{TWILIO_ACCOUNT_SID}/Recordings/{recording_sid}.mp3"
+
+
+def cache_path(recording_sid: str) -> str:
+    if not SID_RE.fullmatch(recording_sid or ""):
+        raise RecordingNotFound(recording_sid)
+    return os.path.join(RECORDINGS_DIR, f"{recording_sid}.mp3")
+
+
+def cached_path(recording_sid: str):
+    """Path of the cached file (marked as recently used), or None."""
+    path = cache_path(recording_sid)
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        return None
+    return path
+
+
+def _lock_for(recording_sid: str) -> threading.Lock:
+    with _fetch_locks_lock:
+        return _fetch_locks.setdefault(recording_sid, threading.Lock())
+
+
+def fetch(recording_sid: str) -> str:
+    """
+    Local path of the recording, downloading it first on a miss. Concurrent requests for the
+    same recording share one download. Raises RecordingNotFound, or httpx.HTTPError when
+    Twilio cannot be reached.
+    """
+    path = cached_path(recording_sid)
+    if path:
+        return path
+    try:
+        with _lock_for(recording_sid):
+            path = cached_path(recording_sid)
+            if path:
+                return path
+            path = cache_path(recording_sid)
+            _download(recording_sid, path)
+    finally:
+        with _fetch_locks_lock:
+            _fetch_locks.pop(recording_sid, None)
+    # The caller serves this file next, even when it alone exceeds the budget
+    evict(keep=path)
+    return path
+
+
+def _download(recording_sid: str, path: str):
+    # .part + rename: a reader never sees a half-written file
+    partial = f"{path}.{threading.get_ident()}.part"
+    os.makedirs(RECORDINGS_DIR, exist_ok=True)
+    try:
+        with get_client().stream("GET", recording_url(recording_sid)) as response:
+            if response.status_code == 404:
+                raise RecordingNotFound(recording_sid)
+            response.raise_for_status()
+            with open(partial, "wb") as out:
+                for chunk in response.iter_bytes(CHUNK_SIZE):
+                    out.write(chunk)
+        os.replace(partial, path)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+
+
+def read(recording_sid: str) -> bytes:
+    """
+    Recording bytes for bulk exports: from the cache when present, otherwise straight from
+    Twilio without storing, so an archive of old calls does not evict what the log page plays.
+    """
+    path = cached_path(recording_sid)
+    if path:
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            pass  # evicted in between
+    response = get_client().get(recording_url(recording_sid))
+    if response.status_code == 404:
+        raise RecordingNotFound(recording_sid)
+    response.raise_for_status()
+    return response.content
+
+
+def evict(max_bytes: int = None, keep: str = None):
+    """
+    Delete least recently used recordings until the cache fits in max_bytes (CACHE_MB).
+    `keep` (a path) is never deleted.
+    """
+    max_bytes = CACHE_MB * 1024 * 1024 if max_bytes is None else max_bytes
+    with _evict_lock:
+        try:
+            entries = [entry for entry in os.scandir(RECORDINGS_DIR) if entry.name.endswith(".mp3")]
+        except FileNotFoundError:
+            return
+        files = []
+        for entry in entries:
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+def cache_stats() -> dict:
+    files = total = 0
+    if os.path.isdir(RECORDINGS_DIR):
+        for entry in os.scandir(RECORDINGS_DIR):
+            if entry.name.endswith(".mp3"):
+                files += 1
+                total += entry.stat().st_size
+    return {"files": files, "bytes": total, "max_bytes": CACHE_MB * 1024 * 1024}
+
+
+# --- Prefetch ---
+def newest_recording_sids(db, calls: int = PREFETCH_CALLS) -> list:
+    """Call and answer recordings of the newest calls, newest call first."""
+    rows = db.query(models.Call.call_sid, models.Call.recording_sid).order_by(
+        models.Call.started_at.desc()
+    ).limit(calls).all()
+    if not rows:
+        return []
+    answers = {}
+    for call_sid, sid in db.query(models.Answer.call_sid, models.Answer.recording_sid).filter(
+        models.Answer.call_sid.in_([row.call_sid for row in rows]),
+        models.Answer.recording_sid.isnot(None)
+    ):
+        answers.setdefault(call_sid, []).append(sid)
+    sids = []
+    for row in rows:
+        sids += ([row.recording_sid] if row.recording_sid else []) + answers.get(row.call_sid, [])
+    return sids
+
+
+def prefetch(calls: int = PREFETCH_CALLS) -> int:
+    """Download the newest calls' recordings that are not cached yet. Returns the number fetched."""
+    db = SessionLocal()
+    try:
+        sids = newest_recording_sids(db, calls)
+    finally:
+        db.close()
+    fetched = 0
+    for sid in sids:
+        try:
+            if cached_path(sid):
+                continue
+            fetch(sid)
+            fetched += 1
+        except RecordingNotFound:
+            continue  # not uploaded yet or deleted at Twilio; retried on the next round
+        except httpx.HTTPError as e:
+            print(f"Recording prefetch stopped: {e}")
+            break
+    return fetched
+
+
+class Prefetcher(threading.Thread):
+    def __init__(self, interval: float = PREFETCH_INTERVAL_SECONDS):
+        super().__init__(name="recording-prefetch", daemon=True)
+        self.interval = interval
+        self.stop_event = threading.Event()
+
+    def run(self):
+        while not self.stop_event.is_set():
+            try:
+                prefetch()
+            except Exception as e:
+                print(f"Recording prefetch failed: {e}")
+            self.stop_event.wait(self.interval)
+
+    def stop(self):
+        self.stop_event.set()
+
+
+prefetcher = None
+
+
+def start_prefetcher():
+    global prefetcher
+    if PREFETCH_CALLS <= 0 or not (TWILIO_ACCOUNT_SID and TWILIO_AUTH_TOKEN):
+        return
+    if prefetcher is None or not prefetcher.is_alive():
+        prefetcher = Prefetcher()
+        prefetcher.start()
@@ -1,17 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
-from fastapi.responses import StreamingResponse, Response
+from fastapi import APIRouter, BackgroundTasks, Depends, Header, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse, Response, FileResponse, JSONResponse
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import func
+from sqlalchemy.orm import Session, joinedload, selectinload
 from typing import List, Optional
-import csv
+import asyncio
+import httpx
 import io
 import os
-import requests
 import secrets
-from datetime import datetime, timedelta, timezone
+import unicodedata
+from datetime import datetime, timedelta
 import json
-from ..database import get_db
-from .. import models, schemas
+from ..database import get_db, ENGINE_PROFILE
+from .. import models, schemas, dialer, pacing, scheduling, windows, blacklist, importer, import_jobs, phone, target_metadata, pagination, log_export, export_jobs, call_stats, search, events, scenario_cache, recordings, db_pool
 
 security = HTTPBasic()
 
@@ -82,12 +84,23 @@ TWILIO_ACCOUNT_SID = os.getenv("TWILIO_ACCOUNT_SID")
 TWILIO_AUTH_TOKEN = os.getenv("TWILIO_AUTH_TOKEN")
 
 # --- Scenarios ---
+def _cached_json(request: Request, cached) -> Response:
+    # Body and ETag from app/scenario_cache.py; an unchanged resource is answered with 304
+    tag, body = cached
+    headers = {"ETag": tag, "Cache-Control": "no-cache"}
+    if tag in [value.strip() for value in request.headers.get("if-none-match", "").split(",")]:
+        scenario_cache.cache.count_not_modified()
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
 @router.post("/scenarios/", response_model=schemas.Scenario)
 def create_scenario(scenario: schemas.ScenarioCreate, db: Session = Depends(get_db)):
     db_scenario = models.Scenario(**scenario.dict())
     db.add(db_scenario)
     db.commit()
     db.refresh(db_scenario)
+    if db_scenario.indexed_metadata_keys:
+        target_metadata.ensure_indexes(db)
     return db_scenario
 
 @router.put("/scenarios/{scenario_id}", response_model=schemas.Scenario)
@@ -96,10 +109,14 @@ def update_scenario(scenario_id: int, scenario: schemas.ScenarioCreate, db: Sess
     if not db_scenario:
         raise HTTPException(status_code=404, detail="Scenario not found")
     
+    keys_changed = (scenario.indexed_metadata_keys or "") != (db_scenario.indexed_metadata_keys or "")
     for key, value in scenario.dict().items():
         setattr(db_scenario, key, value)
+    scenario_cache.bump(db, scenario_id)
     
     db.commit()
+    if keys_changed:
+        target_metadata.ensure_indexes(db)
     db.refresh(db_scenario)
     return db_scenario
 
@@ -111,100 +128,209 @@ def delete_scenario(scenario_id: int, db: Session = Depends(get_db)):
     
     # Soft delete
     db_scenario.deleted_at = datetime.utcnow()
+    scenario_cache.bump(db, scenario_id)
     db.commit()
     return {"message": "Scenario deleted (soft)"}
 
 @router.get("/scenarios/", response_model=List[schemas.Scenario])
-def read_scenarios(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    return db.query(models.Scenario).filter(models.Scenario.deleted_at.is_(None)).order_by(models.Scenario.id.desc()).offset(skip).limit(limit).all()
+def read_scenarios(request: Request, skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+    return _cached_json(request, scenario_cache.scenario_list(db, skip, limit))
 
 @router.get("/scenarios/{scenario_id}", response_model=schemas.Scenario)
-def read_scenario(scenario_id: int, db: Session = Depends(get_db)):
-    db_scenario = db.query(models.Scenario).options(
-        joinedload(models.Scenario.ending_guidances)
-    ).filter(models.Scenario.id == scenario_id).first()
-    
-    if db_scenario is None:
+def read_scenario(request: Request, scenario_id: int, db: Session = Depends(get_db)):
+    cached = scenario_cache.scenario(db, scenario_id)
+    if cached is None:
         raise HTTPException(status_code=404, detail="Scenario not found")
-    return db_scenario
+    return _cached_json(request, cached)
+
+@router.get("/scenario_cache")
+def read_scenario_cache():
+    # Hit rate of the scenario config cache (admin API + realtime bridge)
+    return scenario_cache.cache.snapshot()
 
 # --- Outbound Targets ---
 from fastapi import UploadFile, File
 
 @router.post("/scenarios/{scenario_id}/upload_targets")
-async def upload_targets(scenario_id: int, file: UploadFile = File(...), db: Session = Depends(get_db)):
-    content = await file.read()
-    
-    # Try different encodings
-    try:
-        decoded = content.decode('utf-8-sig') # Handles UTF-8 BOM
-    except UnicodeDecodeError:
-        try:
-            decoded = content.decode('cp932') # Handles Japanese Shift-JIS
-        except UnicodeDecodeError:
-            decoded = content.decode('utf-8', errors='ignore')
+def upload_targets(scenario_id: int, file: UploadFile = File(...), db: Session = Depends(get_db)):
+    # Plain def: runs in the threadpool, the upload is streamed from its spooled temp file
+    stats = importer.import_targets(db, scenario_id, file.file)
+    message = f"{stats['accepted']} targets added"
+    skipped = []
+    if stats["duplicates"]:
+        skipped.append(f"{stats['duplicates']} duplicates")
+    if stats["blacklisted"]:
+        skipped.append(f"{stats['blacklisted']} opted-out numbers")
+    if stats["invalid"]:
+        skipped.append(f"{stats['invalid']} rows without a number")
+    if skipped:
+        message += f" ({', '.join(skipped)} skipped)"
+    return {"message": message, "stats": stats}
+
+# --- Background Import Jobs ---
+def _import_job_status(job: models.ImportJob) -> schemas.ImportJob:
+    columns = {column.name: getattr(job, column.name) for column in job.__table__.columns}
+    return schemas.ImportJob(**columns, eta_seconds=import_jobs.eta_seconds(job), has_errors=bool(job.error_path))
+
+@router.post("/scenarios/{scenario_id}/import_jobs", response_model=schemas.ImportJob)
+def create_import_job(scenario_id: int, file: UploadFile = File(...), db: Session = Depends(get_db)):
+    if not db.query(models.Scenario).filter(models.Scenario.id == scenario_id).first():
+        raise HTTPException(status_code=404, detail="Scenario not found")
+    job = import_jobs.stage_upload(db, scenario_id, file)
+    import_jobs.start_job(job.id)
+    return _import_job_status(job)
+
+@router.get("/scenarios/{scenario_id}/import_jobs", response_model=List[schemas.ImportJob])
+def list_import_jobs(scenario_id: int, limit: int = 20, db: Session = Depends(get_db)):
+    jobs = db.query(models.ImportJob).filter(
+        models.ImportJob.scenario_id == scenario_id
+    ).order_by(models.ImportJob.id.desc()).limit(limit).all()
+    return [_import_job_status(job) for job in jobs]
+
+@router.get("/import_jobs/{job_id}", response_model=schemas.ImportJob)
+def read_import_job(job_id: int, db: Session = Depends(get_db)):
+    job = db.query(models.ImportJob).get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return _import_job_status(job)
+
+@router.post("/import_jobs/{job_id}/cancel")
+def cancel_import_job(job_id: int, db: Session = Depends(get_db)):
+    job = db.query(models.ImportJob).get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    if job.status not in import_jobs.ACTIVE_STATUSES:
+        return {"message": f"Import job already {job.status}"}
+    if not import_jobs.cancel_job(job_id):
+        # No worker in this process: close the job. A worker in another process sees the
+        # status at its next chunk and stops; a job lost on restart just stays closed.
+        job.status = "canceled"
+        job.finished_at = datetime.utcnow()
+        db.commit()
+    return {"message": "Import job canceling"}
 
-    lines = decoded.splitlines()
-    reader = csv.DictReader(lines)
-    
-    # Clean headers (remove BOM or spaces)
-    if reader.fieldnames:
-        reader.fieldnames = [f.strip().replace('\ufeff', '') for f in reader.fieldnames]
-
-    targets_added = 0
-    for row in reader:
-        # Support various possible header names for phone numbers
-        phone = None
-        for key in ['phone_number', '電話番号', 'tel', 'phone']:
-            if key in row:
-                phone = row[key]
-                break
-        
-        if not phone: continue
-        
-        # Normalize
-        phone = phone.strip()
-        if not phone.startswith('+'):
-            if phone.startswith('0'):
-                phone = '+81' + phone[1:]
-            else:
-                phone = '+81' + phone
-        
-        # Check if already exists in this scenario
-        existing = db.query(models.CallTarget).filter(
-            models.CallTarget.scenario_id == scenario_id,
-            models.CallTarget.phone_number == phone
-        ).first()
-        
-        if not existing:
-            new_target = models.CallTarget(
-                scenario_id=scenario_id,
-                phone_number=phone,
-                metadata_json=json.dumps(row)
-            )
-            db.add(new_target)
-            targets_added += 1
-            
-    db.commit()
-    return {"message": f"{targets_added} targets added"}
+@router.get("/import_jobs/{job_id}/errors")
+def download_import_errors(job_id: int, db: Session = Depends(get_db)):
+    job = db.query(models.ImportJob).get(job_id)
+    if not job or not job.error_path or not os.path.exists(job.error_path):
+        raise HTTPException(status_code=404, detail="No error rows for this import job")
+    return FileResponse(job.error_path, media_type="text/csv", filename=f"import_{job_id}_errors.csv")
 
 @router.get("/scenarios/{scenario_id}/targets", response_model=List[schemas.CallTarget])
-def read_targets(scenario_id: int, db: Session = Depends(get_db)):
-    return db.query(models.CallTarget).filter(models.CallTarget.scenario_id == scenario_id).all()
+def read_targets(
+    scenario_id: int,
+    status: Optional[str] = None,
+    meta: Optional[List[str]] = Query(None), # key:value, repeatable (e.g. meta=地域:東京)
+    db: Session = Depends(get_db)
+):
+    query = db.query(models.CallTarget).filter(models.CallTarget.scenario_id == scenario_id)
+    if status:
+        query = query.filter(models.CallTarget.status == status)
+    query = target_metadata.apply_filters(query, db, target_metadata.parse_filters(meta))
+    return query.all()
+
+# Columns of the outbound target table, sent once per page instead of once per row
+TARGET_ROW_COLUMNS = ["id", "phone_number", "status", "attempt_count", "next_attempt_at", "created_at"]
+
+def filter_targets(query, db: Session, phone_number: Optional[str] = None, meta: Optional[List[str]] = None):
+    if phone_number:
+        number = phone.normalize(phone_number)
+        if number:
+            query = query.filter(models.CallTarget.phone_number == number)
+        else:
+            # Partial input (e.g. the last digits): substring of the E.164 number, national 0 dropped
+            digits = "".join(ch for ch in unicodedata.normalize("NFKC", phone_number) if ch.isdigit()).lstrip("0")
+            if digits:
+                query = query.filter(models.CallTarget.phone_number.contains(digits))
+    return target_metadata.apply_filters(query, db, target_metadata.parse_filters(meta))
+
+@router.get("/scenarios/{scenario_id}/targets/page")
+def read_targets_page(
+    scenario_id: int,
+    cursor: Optional[str] = None,
+    limit: int = Query(200, ge=1, le=1000),
+    status: Optional[str] = None,
+    phone_number: Optional[str] = None,
+    meta: Optional[List[str]] = Query(None),
+    db: Session = Depends(get_db)
+):
+    """
+    Keyset-paginated target list in import order, as compact rows:
+    {columns: [...], rows: [[...], ...], next_cursor}. Each row lists its values in `columns` order.
+    """
+    T = models.CallTarget
+    query = db.query(*[getattr(T, name) for name in TARGET_ROW_COLUMNS]).filter(T.scenario_id == scenario_id)
+    if status:
+        query = query.filter(T.status == status)
+    query = filter_targets(query, db, phone_number, meta)
+    rows, next_cursor = pagination.keyset_page(query, [T.id], cursor, limit, descending=False)
+    return JSONResponse({
+        "columns": TARGET_ROW_COLUMNS,
+        "rows": [[value.isoformat() if isinstance(value, datetime) else value for value in row] for row in rows],
+        "next_cursor": next_cursor,
+    })
+
+@router.get("/scenarios/{scenario_id}/targets/counts")
+def read_target_counts(
+    scenario_id: int,
+    phone_number: Optional[str] = None,
+    meta: Optional[List[str]] = Query(None),
+    db: Session = Depends(get_db)
+):
+    # One GROUP BY over ix_call_targets_scenario_status_id (index-only) for the list header
+    T = models.CallTarget
+    query = db.query(T.status, func.count(T.id)).filter(T.scenario_id == scenario_id)
+    query = filter_targets(query, db, phone_number, meta)
+    by_status = {status: count for status, count in query.group_by(T.status)}
+    return {"total": sum(by_status.values()), "by_status": by_status}
+
+@router.get("/scenarios/{scenario_id}/progress", response_model=schemas.CampaignProgress)
+def read_progress(scenario_id: int, db: Session = Depends(get_db)):
+    progress = db.query(models.CampaignProgress).get(scenario_id)
+    if not progress:
+        return schemas.CampaignProgress(scenario_id=scenario_id)
+    finished = progress.completed + progress.no_answer + progress.busy + progress.failed + (progress.opted_out or 0)
+    columns = {column.name: getattr(progress, column.name) for column in progress.__table__.columns}
+    return schemas.CampaignProgress(**columns, remaining=max(progress.total - finished, 0))
+
+@router.get("/stats", response_model=List[schemas.CallStats])
+def read_stats(
+    group_by: List[str] = Query(["scenario_id", "day", "classification"]),
+    scenario_id: Optional[int] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    # Reads call_stats_daily only: cost depends on scenarios x days, not on the number of calls
+    dimensions = ["scenario_id", "day", "classification"]
+    if any(name not in dimensions for name in group_by):
+        raise HTTPException(status_code=400, detail=f"group_by must be among {', '.join(dimensions)}")
+    group_by = [name for name in dimensions if name in group_by]
+    try:
+        start = datetime.strptime(start_date, "%Y-%m-%d").date() if start_date else None
+        end = datetime.strptime(end_date, "%Y-%m-%d").date() if end_date else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Dates must be YYYY-MM-DD")
+    return call_stats.query_stats(db, group_by, scenario_id, start, end)
 
 @router.get("/scenarios/{scenario_id}/questions", response_model=List[schemas.Question])
-def read_scenario_questions(scenario_id: int, db: Session = Depends(get_db)):
-    return db.query(models.Question).filter(models.Question.scenario_id == scenario_id).order_by(models.Question.sort_order).all()
+def read_scenario_questions(request: Request, scenario_id: int, db: Session = Depends(get_db)):
+    return _cached_json(request, scenario_cache.questions(db, scenario_id))
 
 @router.get("/scenarios/{scenario_id}/ending_guidances", response_model=List[schemas.EndingGuidance])
-def read_scenario_endings(scenario_id: int, db: Session = Depends(get_db)):
-    return db.query(models.EndingGuidance).filter(models.EndingGuidance.scenario_id == scenario_id).order_by(models.EndingGuidance.sort_order).all()
+def read_scenario_endings(request: Request, scenario_id: int, db: Session = Depends(get_db)):
+    return _cached_json(request, scenario_cache.ending_guidances(db, scenario_id))
 
 @router.delete("/targets/{target_id}")
 def delete_target(target_id: int, db: Session = Depends(get_db)):
     target = db.query(models.CallTarget).filter(models.CallTarget.id == target_id).first()
     if not target:
         raise HTTPException(status_code=404, detail="Target not found")
+    counter = dialer.PROGRESS_COUNTER.get(target.status)
+    deltas = {"total": -1}
+    if counter and counter != "dialed":
+        deltas[counter] = -1
+    dialer.bump_progress(db, target.scenario_id, **deltas)
     db.delete(target)
     db.commit()
     return {"message": "Target deleted"}
@@ -212,16 +338,17 @@ def delete_target(target_id: int, db: Session = Depends(get_db)):
 @router.post("/targets/")
 def add_target(target_in: schemas.CallTargetCreate, db: Session = Depends(get_db)):
     # Normalize phone
-    phone = target_in.phone_number.strip()
-    if not phone.startswith('+'):
-        if phone.startswith('0'):
-            phone = '+81' + phone[1:]
-        else:
-            phone = '+81' + phone
-            
+    number, reason = phone.validate(target_in.phone_number)
+    if not number:
+        raise HTTPException(status_code=400, detail=f"Invalid phone number ({reason})")
+
+    blacklist.index.maybe_refresh(db)
+    if blacklist.index.contains(number, db):
+        raise HTTPException(status_code=400, detail="オプトアウト(架電拒否)済みの番号です")
+
     existing = db.query(models.CallTarget).filter(
         models.CallTarget.scenario_id == target_in.scenario_id,
-        models.CallTarget.phone_number == phone
+        models.CallTarget.phone_number == number
     ).first()
     
     if existing:
@@ -229,64 +356,44 @@ def add_target(target_in: schemas.CallTargetCreate, db: Session = Depends(get_db
     
     new_target = models.CallTarget(
         scenario_id=target_in.scenario_id,
-        phone_number=phone,
-        metadata_json=json.dumps({"manual": True})
+        phone_number=number,
+        metadata_json={"manual": True}
     )
     db.add(new_target)
+    dialer.bump_progress(db, target_in.scenario_id, total=1)
     db.commit()
     db.refresh(new_target)
     return new_target
 
 @router.post("/scenarios/{scenario_id}/start_calls")
 def start_calls(scenario_id: int, db: Session = Depends(get_db)):
-    from twilio.rest import Client
-    
     scenario = db.query(models.Scenario).get(scenario_id)
     if not scenario:
         raise HTTPException(status_code=404, detail="Scenario not found")
     
-    # Check working hours (Force JST)
-    jst = timezone(timedelta(hours=9))
-    now_jst = datetime.now(jst)
-    current_time = now_jst.strftime("%H:%M")
-    if not (scenario.start_time <= current_time <= scenario.end_time):
-        scenario.is_active = False # Auto OFF
-        db.commit()
-        raise HTTPException(status_code=400, detail=f"時間外です({scenario.start_time}-{scenario.end_time})。稼働フラグをOFFにしました。")
+    if scenario.is_hard_stopped:
+        raise HTTPException(status_code=400, detail="ハード停止中のシナリオです。")
 
-    targets = db.query(models.CallTarget).filter(
+    has_targets = db.query(models.CallTarget.id).filter(
         models.CallTarget.scenario_id == scenario_id,
-        models.CallTarget.status == "pending"
-    ).limit(10).all() # Process in batches or just trigger 10 for test
-    
-    if not targets:
+        models.CallTarget.status.in_(["pending", "scheduled"])
+    ).first()
+    if not has_targets:
         return {"message": "No pending targets found"}
 
-    client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
-    from urllib.parse import urlparse
-    parsed_base = urlparse(os.getenv("PUBLIC_BASE_URL", ""))
-    base_domain = f"{parsed_base.scheme}://{parsed_base.netloc}"
-    from_number = os.getenv("TWILIO_FROM_NUMBER") # Need this in .env
+    scenario.is_active = True
+    scenario.is_dialing = True
+    scenario_cache.bump(db, scenario_id)
+    db.commit()
 
-    calls_triggered = 0
-    for target in targets:
+    # The window scheduler starts the paced dialer now if the calling window is open and
+    # otherwise at the next opening; it also stops it exactly at end_time (see app/scheduling.py)
+    scheduling.start_dialing(scenario_id)
 
-        try:
-            client.calls.create(
-                to=target.phone_number,
-                from_=from_number,
-                url=f"{base_domain}/twilio/outbound_handler?scenario_id={scenario_id}",
-                status_callback=f"{base_domain}/twilio/status_callback",
-                status_callback_event=['initiated', 'ringing', 'answered', 'completed']
-            )
-            target.status = "calling"
-            calls_triggered += 1
-        except Exception as e:
-            print(f"Failed to trigger call for {target.phone_number}: {e}")
-            target.status = "failed"
-            
-    db.commit()
-    return {"message": f"{calls_triggered} calls initiated"}
+    window = windows.get_window(scenario.start_time, scenario.end_time)
+    if not window.contains(datetime.utcnow()):
+        return {"message": f"時間外です({scenario.start_time}-{scenario.end_time})。稼働時間になると自動で架電を開始します。"}
+    return {"message": "Dialer started"}
 
 @router.post("/scenarios/{scenario_id}/stop")
 def stop_scenario(scenario_id: int, mode: str = "soft", db: Session = Depends(get_db)):
@@ -299,22 +406,56 @@ def stop_scenario(scenario_id: int, mode: str = "soft", db: Session = Depends(ge
         db_scenario.is_active = False
     else:
         db_scenario.is_active = False
+    db_scenario.is_dialing = False
+    scenario_cache.bump(db, scenario_id)
     db.commit()
+    scheduling.stop_dialing(scenario_id)
     return {"message": f"Scenario stopped ({mode})"}
 
 @router.post("/scenarios/{scenario_id}/stop_all")
 def stop_all_calls(scenario_id: int, db: Session = Depends(get_db)):
+    scheduling.stop_dialing(scenario_id)
+    db.query(models.Scenario).filter(models.Scenario.id == scenario_id).update({"is_dialing": False})
+    scenario_cache.bump(db, scenario_id)
     targets = db.query(models.CallTarget).filter(
         models.CallTarget.scenario_id == scenario_id,
-        models.CallTarget.status.in_(["pending", "calling"])
+        models.CallTarget.status.in_(["pending", "scheduled", "claimed", "calling"])
     ).all()
     
     for t in targets:
         t.status = "failed" # or specialized status like 'canceled'
         
+    dialer.bump_progress(db, scenario_id, failed=len(targets))
     db.commit()
     return {"message": f"{len(targets)} calls stopped/canceled"}
 
+# --- Blacklist (opt-out) ---
+@router.get("/blacklist/", response_model=List[schemas.Blacklist])
+def read_blacklist(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+    return db.query(models.Blacklist).order_by(models.Blacklist.created_at.desc()).offset(skip).limit(limit).all()
+
+@router.post("/blacklist/")
+def add_blacklist(entry: schemas.BlacklistCreate, db: Session = Depends(get_db)):
+    number, reason = phone.validate(entry.phone_number)
+    if not number:
+        raise HTTPException(status_code=400, detail=f"Invalid phone number ({reason})")
+    if not blacklist.index.add(db, number, entry.reason):
+        raise HTTPException(status_code=400, detail="Already blacklisted")
+    return {"message": "Blacklisted", "phone_number": number}
+
+@router.delete("/blacklist/{phone_number}")
+def delete_blacklist(phone_number: str, db: Session = Depends(get_db)):
+    if not blacklist.index.remove(db, phone.normalize_or_raw(phone_number)):
+        raise HTTPException(status_code=404, detail="Not blacklisted")
+    return {"message": "Removed from blacklist"}
+
+@router.get("/pacing")
+def read_pacing():
+    # Adaptive pacing state + decision time series (one point per dialer tick)
+    snapshot = pacing.controller.snapshot()
+    snapshot["running_scenarios"] = dialer.running_workers()
+    return snapshot
+
 
 # --- Remaining endpoints (Questions, etc) ---
 # ... (keep existing or update)
@@ -326,6 +467,7 @@ import json
 def create_question(question: schemas.QuestionCreate, db: Session = Depends(get_db)):
     db_question = models.Question(**question.dict())
     db.add(db_question)
+    scenario_cache.bump(db, db_question.scenario_id)
     db.commit()
     db.refresh(db_question)
     return db_question
@@ -339,6 +481,7 @@ def update_question(question_id: int, question_update: schemas.QuestionBase, db:
     db_question.text = question_update.text
     db_question.sort_order = question_update.sort_order
     db_question.is_active = question_update.is_active
+    scenario_cache.bump(db, db_question.scenario_id)
     
     db.commit()
     db.refresh(db_question)
@@ -351,6 +494,7 @@ def delete_question(question_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Question not found")
     
     db.delete(db_question)
+    scenario_cache.bump(db, db_question.scenario_id)
     db.commit()
     return {"message": "Question deleted"}
 
@@ -359,6 +503,7 @@ def delete_question(question_id: int, db: Session = Depends(get_db)):
 def create_ending_guidance(guidance: schemas.EndingGuidanceCreate, db: Session = Depends(get_db)):
     db_guidance = models.EndingGuidance(**guidance.dict())
     db.add(db_guidance)
+    scenario_cache.bump(db, db_guidance.scenario_id)
     db.commit()
     db.refresh(db_guidance)
     return db_guidance
@@ -371,6 +516,7 @@ def update_ending_guidance(guidance_id: int, guidance_update: schemas.EndingGuid
     
     db_guidance.text = guidance_update.text
     db_guidance.sort_order = guidance_update.sort_order
+    scenario_cache.bump(db, db_guidance.scenario_id)
     
     db.commit()
     db.refresh(db_guidance)
@@ -383,6 +529,7 @@ def delete_ending_guidance(guidance_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Guidance not found")
     
     db.delete(db_guidance)
+    scenario_cache.bump(db, db_guidance.scenario_id)
     db.commit()
     return {"message": "Guidance deleted"}
 
@@ -403,7 +550,11 @@ def read_calls(
         joinedload(models.Call.scenario),
         joinedload(models.Call.messages)
     )
-    
+    query = filter_calls(query, to_number, from_number, start_date, end_date, scenario_id)
+    calls = query.order_by(models.Call.started_at.desc()).offset(skip).limit(limit).all()
+    return calls
+
+def filter_calls(query, to_number=None, from_number=None, start_date=None, end_date=None, scenario_id=None):
     if scenario_id:
         query = query.filter(models.Call.scenario_id == scenario_id)
         
@@ -412,103 +563,238 @@ def read_calls(
     if from_number:
         query = query.filter(models.Call.from_number == from_number)
     
-    if start_date:
-        start_dt = datetime.strptime(start_date, "%Y-%m-%d")
+    try:
+        start_dt = datetime.strptime(start_date, "%Y-%m-%d") if start_date else None
+        end_dt = datetime.strptime(end_date, "%Y-%m-%d") + timedelta(days=1) if end_date else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Dates must be YYYY-MM-DD")
+    if start_dt:
         query = query.filter(models.Call.started_at >= start_dt)
-    if end_date:
-        from datetime import timedelta
-        end_dt = datetime.strptime(end_date, "%Y-%m-%d") + timedelta(days=1)
+    if end_dt:
         query = query.filter(models.Call.started_at < end_dt)
-        
-    calls = query.order_by(models.Call.started_at.desc()).offset(skip).limit(limit).all()
-    return calls
+    return query
 
-@router.get("/export_zip")
-def export_calls_zip(
+@router.get("/calls/page", response_model=schemas.CallLogPage)
+def read_calls_page(
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500),
     to_number: Optional[str] = None,
     from_number: Optional[str] = None,
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
-    scenario_status: str = "active",
+    scenario_id: Optional[int] = None,
     db: Session = Depends(get_db)
 ):
-    import pyzipper
-    import io
-    import csv
-    from datetime import datetime, timedelta
-    
+    # Keyset pagination on (started_at, call_sid): constant cost at any depth.
+    # Collections are loaded with one extra IN query each instead of a row-multiplying join.
     query = db.query(models.Call).options(
-        joinedload(models.Call.answers).joinedload(models.Answer.question),
+        selectinload(models.Call.answers).joinedload(models.Answer.question),
         joinedload(models.Call.scenario),
-        joinedload(models.Call.messages)
+        selectinload(models.Call.messages)
     )
-    
-    if scenario_status == "active":
-        query = query.join(models.Scenario).filter(models.Scenario.deleted_at.is_(None))
-    elif scenario_status == "deleted":
-        query = query.join(models.Scenario).filter(models.Scenario.deleted_at.isnot(None))
-    
-    if to_number:
-        query = query.filter(models.Call.to_number == to_number)
-    if from_number:
-        query = query.filter(models.Call.from_number == from_number)
-    
-    if start_date:
-        start_dt = datetime.strptime(start_date, "%Y-%m-%d")
-        query = query.filter(models.Call.started_at >= start_dt)
-    if end_date:
-        end_dt = datetime.strptime(end_date, "%Y-%m-%d") + timedelta(days=1)
-        query = query.filter(models.Call.started_at < end_dt)
-    
-    calls = query.order_by(models.Call.started_at.desc()).all()
-    
-    def format_domestic(phone):
-        if not phone: return ""
-        if phone.startswith("+81"): return "0" + phone[3:]
-        return phone
-        
-    stream = io.StringIO()
-    writer = csv.writer(stream)
-    writer.writerow(["CallSid", "Date", "To", "From", "ScenarioName", "Status", "Question", "AnswerType", "Transcript", "RecordingURL"])
-    
-    msg_stream = io.StringIO()
-    msg_writer = csv.writer(msg_stream)
-    msg_writer.writerow(["CallSid", "ScenarioName", "Date", "RecordingUrl", "Transcript", "RecordingSid"])
-    
-    for call in calls:
-        scenario_name = call.scenario.name if call.scenario else "Unknown"
-        date_str = call.started_at.strftime("%Y-%m-%d %H:%M:%S")
-        to_dom = format_domestic(call.to_number)
-        from_dom = format_domestic(call.from_number)
-        
-        if not call.answers:
-            writer.writerow([call.call_sid, date_str, to_dom, from_dom, scenario_name, call.status, "-", "-", "-", "-"])
-        else:
-            for ans in call.answers:
-                q_text = ans.question.text if ans.question else "Unknown"
-                writer.writerow([call.call_sid, date_str, to_dom, from_dom, scenario_name, call.status, q_text, ans.answer_type, ans.transcript_text or "", ans.recording_url_twilio or ""])
-        
-        for msg in call.messages:
-             msg_writer.writerow([call.call_sid, scenario_name, date_str, msg.recording_url or "", msg.transcript_text or "", msg.recording_sid or ""])
-                
-    zip_buffer = io.BytesIO()
-    with pyzipper.AESZipFile(zip_buffer, 'w', compression=pyzipper.ZIP_DEFLATED, encryption=pyzipper.WZ_AES) as zf:
-        zf.setpassword(b"attendme")
-        zf.setencryption(pyzipper.WZ_AES, nbits=256)
-        today = datetime.now().strftime("%Y%m%d")
-        zf.writestr(f"{today}_logs.csv", stream.getvalue())
-        zf.writestr(f"{today}_messages.csv", msg_stream.getvalue())
-        
-    zip_buffer.seek(0)
+    query = filter_calls(query, to_number, from_number, start_date, end_date, scenario_id)
+    calls, next_cursor = pagination.keyset_page(
+        query, [models.Call.started_at, models.Call.call_sid], cursor, limit
+    )
+    return {"items": calls, "next_cursor": next_cursor}
+
+# Columns of the log table; answers/messages/transcript_full are fetched per call on expand
+CALL_SUMMARY_COLUMNS = [
+    "call_sid", "started_at", "from_number", "to_number", "scenario_id",
+    "status", "direction", "classification", "recording_sid", "bridge_executed",
+]
+
+@router.get("/calls/summary")
+def read_calls_summary(
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    to_number: Optional[str] = None,
+    from_number: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    scenario_id: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Same paging and filters as /calls/page, but plain column rows: no ORM objects, no nested
+    answers/messages, no response_model validation. Shape: {items: [...], next_cursor}.
+    """
+    C = models.Call
+    answer_count = db.query(func.count(models.Answer.id)).filter(
+        models.Answer.call_sid == C.call_sid
+    ).correlate(C).scalar_subquery() # ix_answers_call_sid: index-only count per row
+    query = db.query(
+        *[getattr(C, name) for name in CALL_SUMMARY_COLUMNS],
+        models.Scenario.name.label("scenario_name"),
+        answer_count.label("answer_count")
+    ).outerjoin(models.Scenario, C.scenario_id == models.Scenario.id)
+    query = filter_calls(query, to_number, from_number, start_date, end_date, scenario_id)
+    rows, next_cursor = pagination.keyset_page(query, [C.started_at, C.call_sid], cursor, limit)
+
+    items = []
+    for row in rows:
+        item = row._asdict()
+        item["started_at"] = row.started_at.isoformat() if row.started_at else None
+        item["bridge_executed"] = bool(row.bridge_executed)
+        items.append(item)
+    return JSONResponse({"items": items, "next_cursor": next_cursor})
+
+@router.get("/calls/{call_sid}", response_model=schemas.CallLog)
+def read_call(call_sid: str, db: Session = Depends(get_db)):
+    call = db.query(models.Call).options(
+        selectinload(models.Call.answers).joinedload(models.Answer.question),
+        joinedload(models.Call.scenario),
+        selectinload(models.Call.messages)
+    ).filter(models.Call.call_sid == call_sid).first()
+    if not call:
+        raise HTTPException(status_code=404, detail="Call not found")
+    return call
+
+# --- Recordings ---
+@router.get("/recordings/{recording_sid}")
+def read_recording(recording_sid: str):
+    # Plain def: a cache miss downloads from Twilio in the threadpool (app/recordings.py).
+    # FileResponse answers Range requests, so the player can seek.
+    try:
+        path = recordings.fetch(recording_sid)
+    except recordings.RecordingNotFound:
+        raise HTTPException(status_code=404, detail="Recording not found")
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=502, detail=f"Could not fetch recording: {e}")
+    return FileResponse(path, media_type="audio/mpeg", headers={"Cache-Control": "private, max-age=86400"})
+
+@router.get("/recordings_cache")
+def read_recordings_cache():
+    return recordings.cache_stats()
+
+@router.get("/db_pool")
+def read_db_pool():
+    # Engine profile in effect + checkout wait / connection hold times of the sync and async pools
+    return {"profile": ENGINE_PROFILE, "pools": db_pool.snapshot()}
+
+# --- Live dashboard (Server-Sent Events) ---
+SSE_HEARTBEAT_SECONDS = 15
+
+@router.get("/events")
+async def stream_events(request: Request, last_event_id: Optional[int] = Header(None)):
+    """
+    Pushes call_started / call_status / stream_started / stream_ended / call_flag /
+    transcript_ready / message_transcript_ready deltas. "resync" means events were lost
+    (slow client, or reconnect after a long gap): reload the view once.
+    EventSource resends Last-Event-ID on reconnect, so short drops lose nothing.
+    """
+    subscription = events.bus.subscribe(last_event_id)
+
+    async def stream():
+        try:
+            yield "retry: 3000\n\n"
+            while not await request.is_disconnected():
+                if subscription.resync:
+                    while not subscription.queue.empty():
+                        subscription.queue.get_nowait()
+                    subscription.resync = False
+                    yield "event: resync\ndata: {}\n\n"
+                    continue
+                try:
+                    event = await asyncio.wait_for(subscription.get(), SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n" # keeps proxies from closing an idle stream
+                    continue
+                yield events.format_sse(event)
+        finally:
+            events.bus.unsubscribe(subscription)
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
+
+@router.get("/search", response_model=schemas.SearchPage)
+def search_transcripts(
+    q: str = Query(..., min_length=1),
+    kind: Optional[str] = None, # answer, message, call
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    if kind and kind not in search.SOURCES:
+        raise HTTPException(status_code=400, detail=f"kind must be one of {', '.join(search.SOURCES)}")
+    items, next_cursor = search.search(db, q, cursor, limit, kind)
+    return {"items": items, "next_cursor": next_cursor}
+
+def _export_filters(*args) -> log_export.ExportFilters:
+    # Checked before the export starts: once a ZIP is streaming its status is already sent
+    filters = log_export.ExportFilters(*args)
+    try:
+        filters.date_range()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Dates must be YYYY-MM-DD")
+    return filters
+
+@router.get("/export_zip")
+def export_calls_zip(
+    to_number: Optional[str] = None,
+    from_number: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    scenario_status: str = "active",
+    scenario_id: Optional[int] = None,
+    include_audio: bool = False
+):
+    filters = _export_filters(to_number, from_number, start_date, end_date, scenario_status, scenario_id, include_audio)
     filename = f"logs_{datetime.now().strftime('%Y%m%d%H%M')}.zip"
-    
-    return StreamingResponse(zip_buffer, media_type="application/zip", headers={"Content-Disposition": f"attachment; filename={filename}"})
+    # Rows are read in server-side batches and the ZIP is sent as it is produced
+    return StreamingResponse(
+        log_export.stream_zip(filters),
+        media_type="application/zip",
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
+# --- Background Exports ---
+def _export_job_status(job: models.ExportJob, cached: bool = False) -> schemas.ExportJob:
+    columns = {column.name: getattr(job, column.name) for column in job.__table__.columns}
+    return schemas.ExportJob(**columns, cached=cached)
+
+@router.post("/export_jobs", response_model=schemas.ExportJob)
+def create_export_job(
+    to_number: Optional[str] = None,
+    from_number: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    scenario_status: str = "active",
+    scenario_id: Optional[int] = None,
+    include_audio: bool = False, # add the call/answer recordings (MP3) and a manifest CSV
+    db: Session = Depends(get_db)
+):
+    filters = _export_filters(to_number, from_number, start_date, end_date, scenario_status, scenario_id, include_audio)
+    job, cached = export_jobs.request_export(db, filters)
+    return _export_job_status(job, cached)
+
+@router.get("/export_jobs", response_model=List[schemas.ExportJob])
+def list_export_jobs(limit: int = 20, db: Session = Depends(get_db)):
+    jobs = db.query(models.ExportJob).order_by(models.ExportJob.id.desc()).limit(limit).all()
+    return [_export_job_status(job) for job in jobs]
+
+@router.get("/export_jobs/{job_id}", response_model=schemas.ExportJob)
+def read_export_job(job_id: int, db: Session = Depends(get_db)):
+    job = db.query(models.ExportJob).get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Export job not found")
+    return _export_job_status(job)
+
+@router.get("/export_jobs/{job_id}/download")
+def download_export(job_id: int, db: Session = Depends(get_db)):
+    job = db.query(models.ExportJob).get(job_id)
+    if not job or job.status != "completed" or not job.path or not os.path.exists(job.path):
+        raise HTTPException(status_code=404, detail="Export not available")
+    filename = f"logs_{job.finished_at.strftime('%Y%m%d%H%M')}.zip"
+    # FileResponse answers Range / If-Range requests (206), so interrupted downloads resume
+    return FileResponse(job.path, media_type="application/zip", filename=filename)
 
 # --- Phase 2: Retry Transcription ---
 @router.post("/retranscribe/{answer_id}")
-async def retry_transcription(answer_id: int, db: Session = Depends(get_db)):
+def retry_transcription(answer_id: int, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
     from .twilio import transcribe_with_whisper
-    import asyncio
     
     answer = db.query(models.Answer).filter(models.Answer.id == answer_id).first()
     if not answer:
@@ -520,7 +806,7 @@ async def retry_transcription(answer_id: int, db: Session = Depends(get_db)):
     answer.transcript_status = "processing"
     db.commit()
     
-    # Run async
-    asyncio.create_task(transcribe_with_whisper(answer.id, answer.recording_url_twilio or "", answer.recording_sid))
+    # Blocking download / Whisper call / retry sleeps: the threadpool runs it after the response
+    background_tasks.add_task(transcribe_with_whisper, answer.id, answer.recording_url_twilio or "", answer.recording_sid)
     
     return {"message": "Transcription scheduled"}
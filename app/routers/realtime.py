@@ -5,9 +5,10 @@ import base64
 import asyncio
 import websockets
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends
-from sqlalchemy.orm import Session
-from ..database import SessionLocal
-from .. import models
+from sqlalchemy import select
+from sqlalchemy.orm import Session, selectinload
+from ..database import AsyncSessionLocal
+from .. import models, pacing, blacklist, dialer, call_stats, events, scenario_cache
 import logging
 
 # Configure logging
@@ -79,29 +80,28 @@ async def handle_media_stream(websocket: WebSocket, call_sid: str):
     await websocket.accept()
     logger.info(f"WebSocket connection accepted for call: {call_sid}")
 
-    db = SessionLocal()
+    session_counted = False
     try:
-        call = db.query(models.Call).filter(models.Call.call_sid == call_sid).first()
-        if not call or not call.scenario:
+        # The session is closed before the audio relay starts: a call holds no connection
+        async with AsyncSessionLocal() as db:
+            call = await get_call(db, call_sid)
+            # Scenario, active questions and endings from the shared config cache (app/scenario_cache.py)
+            scenario = await db.run_sync(scenario_cache.call_config, call.scenario_id) if call and call.scenario_id else None
+        if not scenario:
             logger.error(f"Call or Scenario not found for SID: {call_sid}")
             await websocket.close()
             return
 
-        scenario = call.scenario
-        questions = db.query(models.Question).filter(
-            models.Question.scenario_id == scenario.id,
-            models.Question.is_active == True
-        ).order_by(models.Question.sort_order).all()
-
-        ending_guidances = db.query(models.EndingGuidance).filter(
-            models.EndingGuidance.scenario_id == scenario.id
-        ).order_by(models.EndingGuidance.sort_order).all()
+        # Live AI session count drives the adaptive dialer
+        pacing.controller.session_started(call.call_target_id)
+        session_counted = True
+        events.publish("stream_started", call_sid=call_sid)
 
         # Shared state
         state = {
             "current_question_index": 0,
-            "questions": [q.text for q in questions],
-            "ending_texts": [e.text for e in ending_guidances],
+            "questions": list(scenario.questions),
+            "ending_texts": list(scenario.ending_texts),
             "mode": scenario.conversation_mode,
             "last_user_audio_time": asyncio.get_event_loop().time(),
             "silence_count": 0,
@@ -313,7 +313,9 @@ async def handle_media_stream(websocket: WebSocket, call_sid: str):
     except Exception as e:
         logger.exception(f"CRITICAL ERROR in handle_media_stream: {e}")
     finally:
-        db.close()
+        if session_counted:
+            pacing.controller.session_ended()
+            events.publish("stream_ended", call_sid=call_sid)
 
 
 async def initialize_openai_session(openai_ws, scenario, state):
@@ -415,6 +417,12 @@ async def initialize_openai_session(openai_ws, scenario, state):
                         }
                     }
                 },
+                {
+                    "type": "function",
+                    "name": "register_opt_out",
+                    "description": "ユーザーが今後の電話を明確に拒否した場合（「もう電話しないで」等）に、架電停止リストへ登録します。",
+                    "parameters": {"type": "object", "properties": {}}
+                },
                 {
                     "type": "function",
                     "name": "end_call",
@@ -488,6 +496,10 @@ async def handle_function_call(openai_ws, response, state, call_sid):
         await execute_sms_log(call_sid)
         output = "SMS送付の処理を開始しました。"
 
+    elif func_name == "register_opt_out":
+        await execute_opt_out(call_sid)
+        output = "今後お電話しないよう登録しました。"
+
     elif func_name == "end_call":
         # ここで response.create を出すと、余計な「承知しました」等が出たり、質問ループが起きやすい。
         state["is_ending"] = True
@@ -530,35 +542,55 @@ async def handle_ai_response_done(openai_ws, response, state, call_sid, websocke
             pass
 
 
+async def get_call(db, call_sid, *options):
+    return (await db.execute(
+        select(models.Call).options(*options).where(models.Call.call_sid == call_sid)
+    )).scalars().first()
+
+
+# Tool actions run on the event loop mid-call: queries go through the async session, Twilio
+# REST calls through a worker thread, and the sync helpers shared with the admin side via run_sync.
 async def execute_bridge(call_sid, user_name):
     TWILIO_ACCOUNT_SID = os.getenv("TWILIO_ACCOUNT_SID")
     TWILIO_AUTH_TOKEN = os.getenv("TWILIO_AUTH_TOKEN")
     from twilio.rest import Client
-    db = SessionLocal()
-    call = db.query(models.Call).filter(models.Call.call_sid == call_sid).first()
-    if call and call.scenario and call.scenario.bridge_number:
-        client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
-        public_base = os.getenv("PUBLIC_BASE_URL", "").rstrip('/')
-        url = f"{public_base}/twilio/bridge_twiml?number={call.scenario.bridge_number}"
-        client.calls(call_sid).update(url=url)
-        call.bridge_executed = True
-        db.commit()
-    db.close()
+    async with AsyncSessionLocal() as db:
+        call = await get_call(db, call_sid, selectinload(models.Call.scenario))
+        if call and call.scenario and call.scenario.bridge_number:
+            client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
+            public_base = os.getenv("PUBLIC_BASE_URL", "").rstrip('/')
+            url = f"{public_base}/twilio/bridge_twiml?number={call.scenario.bridge_number}"
+            await asyncio.to_thread(client.calls(call_sid).update, url=url)
+            await db.run_sync(call_stats.set_flag, call_sid, "bridge_executed")
+            await db.commit()
+            events.publish("call_flag", call_sid=call_sid, flag="bridge_executed")
+
+
+async def execute_opt_out(call_sid):
+    async with AsyncSessionLocal() as db:
+        call = await get_call(db, call_sid)
+        if call:
+            # Outbound: the callee is To. Inbound: the caller is From.
+            number = call.to_number if call.direction == "outbound" else call.from_number
+            await db.run_sync(blacklist.index.add, number, "ai_opt_out")
+            if call.call_target_id:
+                await db.run_sync(dialer.opt_out_target, call.call_target_id)
 
 
 async def execute_sms_log(call_sid):
     TWILIO_ACCOUNT_SID = os.getenv("TWILIO_ACCOUNT_SID")
     TWILIO_AUTH_TOKEN = os.getenv("TWILIO_AUTH_TOKEN")
     from twilio.rest import Client
-    db = SessionLocal()
-    call = db.query(models.Call).filter(models.Call.call_sid == call_sid).first()
-    if call and call.scenario and call.scenario.sms_template:
-        client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
-        client.messages.create(
-            body=call.scenario.sms_template,
-            from_=call.from_number,
-            to=call.to_number
-        )
-        call.sms_sent_log = True
-        db.commit()
-    db.close()
+    async with AsyncSessionLocal() as db:
+        call = await get_call(db, call_sid, selectinload(models.Call.scenario))
+        if call and call.scenario and call.scenario.sms_template:
+            client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
+            await asyncio.to_thread(
+                client.messages.create,
+                body=call.scenario.sms_template,
+                from_=call.from_number,
+                to=call.to_number
+            )
+            await db.run_sync(call_stats.set_flag, call_sid, "sms_sent_log")
+            await db.commit()
+            events.publish("call_flag", call_sid=call_sid, flag="sms_sent_log")
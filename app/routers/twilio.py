@@ -1,12 +1,12 @@
 from fastapi import APIRouter, Request, Depends, Form, HTTPException, Query
 from fastapi.responses import Response
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from twilio.twiml.voice_response import VoiceResponse
-from ..database import get_db
-from .. import models
+from ..database import get_async_db
+from .. import models, dialer, pacing, phone, call_stats, events
+import asyncio
 import os
-import requests
-from openai import OpenAI
 
 router = APIRouter(
     prefix="/twilio",
@@ -18,9 +18,11 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 TWILIO_ACCOUNT_SID = os.getenv("TWILIO_ACCOUNT_SID")
 TWILIO_AUTH_TOKEN = os.getenv("TWILIO_AUTH_TOKEN")
 
-async def transcribe_with_whisper(answer_id: int, recording_url: str, recording_sid: str):
-    """Transcribe audio using OpenAI Whisper API"""
+def transcribe_with_whisper(answer_id: int, recording_url: str, recording_sid: str):
+    """Transcribe audio using OpenAI Whisper API (blocking: run it in a thread, never on the loop)"""
     import time
+    import requests
+    from openai import OpenAI
     
     try:
         if not OPENAI_API_KEY:
@@ -100,6 +102,8 @@ async def transcribe_with_whisper(answer_id: int, recording_url: str, recording_
             db.add(log_entry)
             
             db.commit()
+            events.publish("transcript_ready", call_sid=answer.call_sid, answer_id=answer_id,
+                           transcript_status="completed", transcript_text=transcript_text)
         else:
             print(f"Warning: Answer mismatch or not found for id={answer_id}, sid={recording_sid}")
 
@@ -137,6 +141,8 @@ async def transcribe_with_whisper(answer_id: int, recording_url: str, recording_
             db.add(log_entry)
             
             db.commit()
+            events.publish("transcript_ready", call_sid=answer.call_sid, answer_id=answer_id,
+                           transcript_status="failed", transcript_text=answer.transcript_text)
         db.close()
         
         # Clean up
@@ -144,9 +150,11 @@ async def transcribe_with_whisper(answer_id: int, recording_url: str, recording_
         if os.path.exists(temp_file):
             os.remove(temp_file)
 
-async def transcribe_message_with_whisper(message_id: int, recording_url: str, recording_sid: str):
-    """Transcribe Message audio using OpenAI Whisper API"""
+def transcribe_message_with_whisper(message_id: int, recording_url: str, recording_sid: str):
+    """Transcribe Message audio using OpenAI Whisper API (blocking: run it in a thread, never on the loop)"""
     import time
+    import requests
+    from openai import OpenAI
     
     try:
         if not OPENAI_API_KEY: return
@@ -188,6 +196,8 @@ async def transcribe_message_with_whisper(message_id: int, recording_url: str, r
         if msg:
             msg.transcript_text = transcript.text
             db.commit()
+            events.publish("message_transcript_ready", call_sid=msg.call_sid, message_id=message_id,
+                           transcript_text=msg.transcript_text)
         db.close()
         
         if os.path.exists(temp_file):
@@ -206,7 +216,7 @@ async def handle_incoming_call(
     To: str = Form(...),
     From: str = Form(...),
     CallSid: str = Form(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     # This is for incoming calls to Twilio numbers
     # We will use the same logic as outbound for consistency
@@ -219,43 +229,50 @@ async def handle_outbound_call(
     From: str = Form(...),
     CallSid: str = Form(...),
     scenario_id: int = Query(...),
-    db: Session = Depends(get_db)
+    call_target_id: int = Query(None),
+    db: AsyncSession = Depends(get_async_db)
 ):
     # This is called when an outbound call is answered
-    return await handle_call_logic(To, From, CallSid, "outbound", db, scenario_id)
+    return await handle_call_logic(To, From, CallSid, "outbound", db, scenario_id, call_target_id)
 
-async def handle_call_logic(To: str, From: str, CallSid: str, direction: str, db: Session, scenario_id: int = None):
+async def handle_call_logic(To: str, From: str, CallSid: str, direction: str, db: AsyncSession, scenario_id: int = None, call_target_id: int = None):
+    # Runs on the event loop: async session for the queries, the Twilio REST call in a thread
     from twilio.rest import Client
+    To, From = phone.normalize_or_raw(To), phone.normalize_or_raw(From)
     
     # 1. Lookup Scenario
     if scenario_id:
-        scenario = db.query(models.Scenario).get(scenario_id)
+        scenario = await db.get(models.Scenario, scenario_id)
     else:
         # Incoming logic
-        phone_entry = db.query(models.PhoneNumber).filter(models.PhoneNumber.to_number == To).first()
-        scenario = phone_entry.scenario if phone_entry else None
+        scenario = (await db.execute(
+            select(models.Scenario).join(models.PhoneNumber, models.PhoneNumber.scenario_id == models.Scenario.id)
+            .where(models.PhoneNumber.to_number == To)
+        )).scalars().first()
 
-    # Create Call record
+    # Create Call record (scenario assigned as an object: call_summary reads it without a lazy load)
     call = models.Call(
         call_sid=CallSid,
         from_number=From,
         to_number=To,
         status="in-progress",
         direction=direction,
-        scenario_id=scenario.id if scenario else None
+        scenario=scenario,
+        call_target_id=call_target_id
     )
     
     # Start Full Call Recording
     if TWILIO_ACCOUNT_SID and TWILIO_AUTH_TOKEN:
         try:
             client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
-            rec = client.calls(CallSid).recordings.create()
+            rec = await asyncio.to_thread(client.calls(CallSid).recordings.create)
             call.recording_sid = rec.sid
         except Exception as e:
             print(f"Failed to start full call recording: {e}")
 
     db.add(call)
-    db.commit()
+    await db.commit()
+    events.publish("call_started", **events.call_summary(call))
 
     vr = VoiceResponse()
 
@@ -285,9 +302,19 @@ async def status_callback(
     CallSid: str = Form(...),
     CallStatus: str = Form(...),
     CallDuration: int = Form(None),
-    db: Session = Depends(get_db)
+    call_target_id: int = Query(None),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    call = db.query(models.Call).filter(models.Call.call_sid == CallSid).first()
+    call = (await db.execute(select(models.Call).where(models.Call.call_sid == CallSid))).scalars().first()
+
+    # Drive the CallTarget state. no-answer/busy calls never reach outbound_handler,
+    # so there is no Call row for them; the id from the callback URL is authoritative.
+    # The dialer/stats helpers are shared with the sync code: run_sync runs them on this
+    # session's async connection, so they do not block the loop either.
+    target_id = call_target_id or (call.call_target_id if call else None)
+    if target_id:
+        await db.run_sync(dialer.finish_target, target_id, CallStatus)
+
     if call:
         call.status = CallStatus
         if CallDuration:
@@ -302,7 +329,16 @@ async def status_callback(
                     call.classification = "担当者に繋いだ"
                 else:
                     call.classification = "聞いたが担当者まで進まなかった"
+
+        # Final status: add the call to the daily rollup (once, however often Twilio retries)
+        await db.run_sync(call_stats.count_call, CallSid)
         
-        db.commit()
+    await db.commit()
+    if call:
+        events.publish("call_status", call_sid=CallSid, status=call.status, duration=call.duration, classification=call.classification)
+
+    # Feed final outcomes to the adaptive dialer
+    if target_id:
+        pacing.controller.record_outcome(target_id, CallStatus, CallDuration, call.classification if call else None)
     return Response(content="OK", media_type="text/plain")
 
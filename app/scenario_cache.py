@@ -0,0 +1,202 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+from types import SimpleNamespace
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from . import models, schemas
+
+# Read cache for scenario configuration (scenario, questions, ending guidances).
+#
+# Every write to a scenario's configuration bumps scenarios.config_version in the same
+# transaction (bump()), so a cached entry is valid exactly while its version matches the
+# row: one primary-key read per request instead of the joined queries + serialization,
+# and correct across processes. The version also makes the HTTP ETag, so unchanged
+# screens are answered with 304. The realtime bridge loads its per-call snapshot here too.
+#
+# The version is read before the data: a write committed in between is cached under the
+# old version and simply missed on the next read, never served as current.
+
+MAX_ENTRIES = int(os.getenv("SCENARIO_CACHE_ENTRIES", "512"))
+
+
+def bump(db: Session, scenario_id: int):
+    """Invalidate a scenario's cached config. Call before the commit of every config write."""
+    table = models.Scenario.__table__
+    db.execute(table.update().where(table.c.id == scenario_id).values(
+        config_version=func.coalesce(table.c.config_version, 1) + 1
+    ))
+
+
+class ScenarioCache:
+    def __init__(self, max_entries: int = MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (version, value), least recently used first
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def get(self, key: tuple, version, load):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        value = load()  # outside the lock: concurrent misses may both load, last one wins
+        with self._lock:
+            self._entries[key] = (version, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def count_not_modified(self):
+        with self._lock:
+            self.not_modified += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "not_modified": self.not_modified,
+            }
+
+
+cache = ScenarioCache()
+
+
+# --- Versions ---
+def scenario_version(db: Session, scenario_id: int):
+    """Current config version, or None if the scenario does not exist."""
+    row = db.query(models.Scenario.config_version).filter(models.Scenario.id == scenario_id).first()
+    if row is None:
+        return None
+    return row[0] or 1
+
+
+def list_version(db: Session) -> tuple:
+    # Versions only grow and scenarios are soft-deleted (a bump), so any write changes this pair
+    count, total = db.query(
+        func.count(models.Scenario.id), func.coalesce(func.sum(models.Scenario.config_version), 0)
+    ).one()
+    return count, total
+
+
+def etag(key: tuple, version) -> str:
+    parts = key + (version if isinstance(version, tuple) else (version,))
+    return 'W/"' + "-".join(str(part) for part in parts) + '"'
+
+
+# --- Loaders (payloads are the JSON bodies the endpoints return) ---
+def _columns(obj) -> dict:
+    return {column.name: getattr(obj, column.name) for column in obj.__table__.columns}
+
+
+def _encode(value) -> bytes:
+    return json.dumps(jsonable_encoder(value), ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def _guidances(db: Session, scenario_id: int) -> list:
+    return db.query(models.EndingGuidance).filter(
+        models.EndingGuidance.scenario_id == scenario_id
+    ).order_by(models.EndingGuidance.sort_order).all()
+
+
+def _questions(db: Session, scenario_id: int, active_only: bool = False) -> list:
+    query = db.query(models.Question).filter(models.Question.scenario_id == scenario_id)
+    if active_only:
+        query = query.filter(models.Question.is_active == True)  # noqa: E712
+    return query.order_by(models.Question.sort_order).all()
+
+
+def _scenario_schema(scenario, guidances) -> schemas.Scenario:
+    return schemas.Scenario(
+        **_columns(scenario),
+        ending_guidances=[schemas.EndingGuidance(**_columns(g)) for g in guidances],
+    )
+
+
+def _load_scenario(db: Session, scenario_id: int) -> bytes:
+    scenario = db.query(models.Scenario).get(scenario_id)
+    return _encode(_scenario_schema(scenario, _guidances(db, scenario_id)))
+
+
+def _load_scenario_list(db: Session, skip: int, limit: int) -> bytes:
+    scenarios = db.query(models.Scenario).filter(
+        models.Scenario.deleted_at.is_(None)
+    ).order_by(models.Scenario.id.desc()).offset(skip).limit(limit).all()
+    guidances = {}
+    if scenarios:
+        for guidance in db.query(models.EndingGuidance).filter(
+            models.EndingGuidance.scenario_id.in_([s.id for s in scenarios])
+        ).order_by(models.EndingGuidance.sort_order):
+            guidances.setdefault(guidance.scenario_id, []).append(guidance)
+    return _encode([_scenario_schema(s, guidances.get(s.id, [])) for s in scenarios])
+
+
+# --- Cached reads ---
+def scenario_list(db: Session, skip: int = 0, limit: int = 100):
+    """(etag, JSON body) of GET /admin/scenarios/."""
+    key = ("scenarios", skip, limit)
+    version = list_version(db)
+    return etag(key, version), cache.get(key, version, lambda: _load_scenario_list(db, skip, limit))
+
+
+def scenario(db: Session, scenario_id: int):
+    """(etag, JSON body) of GET /admin/scenarios/{id}; None when the scenario does not exist."""
+    version = scenario_version(db, scenario_id)
+    if version is None:
+        return None
+    key = ("scenario", scenario_id)
+    return etag(key, version), cache.get(key, version, lambda: _load_scenario(db, scenario_id))
+
+
+def questions(db: Session, scenario_id: int):
+    version = scenario_version(db, scenario_id) or 0
+    key = ("questions", scenario_id)
+    return etag(key, version), cache.get(key, version, lambda: _encode(
+        [schemas.Question(**_columns(q)) for q in _questions(db, scenario_id)]
+    ))
+
+
+def ending_guidances(db: Session, scenario_id: int):
+    version = scenario_version(db, scenario_id) or 0
+    key = ("ending_guidances", scenario_id)
+    return etag(key, version), cache.get(key, version, lambda: _encode(
+        [schemas.EndingGuidance(**_columns(g)) for g in _guidances(db, scenario_id)]
+    ))
+
+
+def call_config(db: Session, scenario_id: int):
+    """
+    What the realtime bridge needs for one call: the scenario's columns as attributes plus
+    `questions` (active question texts) and `ending_texts`, in sort order. None if missing.
+    Treat as read-only: the object is shared by every call of the scenario.
+    """
+    version = scenario_version(db, scenario_id)
+    if version is None:
+        return None
+
+    def load():
+        scenario = db.query(models.Scenario).get(scenario_id)
+        return SimpleNamespace(
+            **_columns(scenario),
+            questions=tuple(q.text for q in _questions(db, scenario_id, active_only=True)),
+            ending_texts=tuple(g.text for g in _guidances(db, scenario_id)),
+        )
+
+    return cache.get(("call_config", scenario_id), version, load)
@@ -0,0 +1,132 @@
+import heapq
+import itertools
+import threading
+from datetime import datetime, timedelta
+from .database import SessionLocal
+from . import models, dialer, scenario_cache
+from .windows import get_window
+
+
+class WindowScheduler(threading.Thread):
+    """
+    Timer queue that wakes dialers exactly at window open/close instead of polling.
+
+    The heap holds (when, seq, scenario_id, generation). At each wake-up the scenario is
+    re-evaluated: its worker is started if the window is open in any timezone of its remaining
+    targets and stopped otherwise, and the next boundary is pushed. cancel() bumps the
+    generation so stale entries are dropped when they come due.
+    """
+
+    def __init__(self):
+        super().__init__(name="window-scheduler", daemon=True)
+        self._heap = []
+        self._seq = itertools.count()
+        self._generations = {}
+        self._cond = threading.Condition()
+
+    def schedule(self, scenario_id: int, when: datetime = None):
+        with self._cond:
+            generation = self._generations.setdefault(scenario_id, 0)
+            heapq.heappush(self._heap, (when or datetime.utcnow(), next(self._seq), scenario_id, generation))
+            self._cond.notify()
+
+    def cancel(self, scenario_id: int):
+        with self._cond:
+            self._generations[scenario_id] = self._generations.get(scenario_id, 0) + 1
+
+    def run(self):
+        while True:
+            with self._cond:
+                while not self._heap:
+                    self._cond.wait()
+                when, _, scenario_id, generation = self._heap[0]
+                delay = (when - datetime.utcnow()).total_seconds()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+                heapq.heappop(self._heap)
+                if generation != self._generations.get(scenario_id, 0):
+                    continue
+            try:
+                next_at = evaluate(scenario_id)
+            except Exception as e:
+                print(f"Window scheduler failed for scenario {scenario_id}: {e}")
+                next_at = datetime.utcnow() + timedelta(minutes=1)
+            if next_at:
+                with self._cond:
+                    if generation == self._generations.get(scenario_id, 0):
+                        heapq.heappush(self._heap, (next_at, next(self._seq), scenario_id, generation))
+
+
+def evaluate(scenario_id: int, now: datetime = None):
+    """
+    Start/stop the dialer for a scenario according to its windows.
+    Returns the next boundary to wake up at, or None when the scenario no longer needs scheduling.
+    """
+    now = now or datetime.utcnow()
+    db = SessionLocal()
+    try:
+        scenario = db.query(models.Scenario).get(scenario_id)
+        if not scenario or not scenario.is_dialing or scenario.is_hard_stopped or scenario.deleted_at:
+            dialer.stop_worker(scenario_id)
+            return None
+
+        zones = [row[0] for row in db.query(models.CallTarget.timezone).filter(
+            models.CallTarget.scenario_id == scenario_id,
+            models.CallTarget.status.in_(dialer.ACTIVE_TARGET_STATUSES)
+        ).distinct().all()]
+        if not zones:
+            # List finished: do not auto-dial targets uploaded later
+            scenario.is_dialing = False
+            scenario_cache.bump(db, scenario_id)
+            db.commit()
+            dialer.stop_worker(scenario_id)
+            return None
+
+        windows = [get_window(scenario.start_time, scenario.end_time, tz) for tz in zones]
+        if any(w.contains(now) for w in windows):
+            dialer.start_worker(scenario_id)
+        else:
+            dialer.stop_worker(scenario_id)
+        return min(w.next_change(now) for w in windows)
+    finally:
+        db.close()
+
+
+scheduler = WindowScheduler()
+
+
+_start_lock = threading.Lock()
+
+
+def ensure_started():
+    with _start_lock:
+        if not scheduler.is_alive():
+            scheduler.start()
+
+
+def start_dialing(scenario_id: int):
+    """(Re)arm a scenario; the dialer starts now if a window is open, else at the next opening."""
+    ensure_started()
+    scheduler.cancel(scenario_id)
+    scheduler.schedule(scenario_id)
+
+
+def stop_dialing(scenario_id: int):
+    scheduler.cancel(scenario_id)
+    dialer.stop_worker(scenario_id)
+
+
+def resume_all():
+    """On startup, re-arm every scenario that was dialing when the process stopped."""
+    ensure_started()
+    db = SessionLocal()
+    try:
+        scenario_ids = [row[0] for row in db.query(models.Scenario.id).filter(
+            models.Scenario.is_dialing == True,
+            models.Scenario.deleted_at.is_(None)
+        ).all()]
+    finally:
+        db.close()
+    for scenario_id in scenario_ids:
+        scheduler.schedule(scenario_id)
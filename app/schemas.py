@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from typing import List, Optional
-from datetime import datetime
+from datetime import date, datetime
 
 # --- EndingGuidance Schemas ---
 class EndingGuidanceBase(BaseModel):
@@ -35,12 +35,16 @@ class ScenarioBase(BaseModel):
     sms_template: Optional[str] = None
     default_expand_details: bool = False
     auto_record: bool = True
+    max_attempts: int = 1
+    retry_backoff_minutes: str = "30,60,120"
+    indexed_metadata_keys: Optional[str] = ""
 
 class ScenarioCreate(ScenarioBase):
     pass
 
 class Scenario(ScenarioBase):
     id: int
+    is_dialing: bool = False
     created_at: datetime
     updated_at: datetime
     deleted_at: Optional[datetime] = None
@@ -71,7 +75,7 @@ class Question(QuestionBase):
 class CallTargetBase(BaseModel):
     phone_number: str
     scenario_id: int
-    metadata_json: Optional[str] = None
+    metadata_json: Optional[dict] = None
 
 class CallTargetCreate(CallTargetBase):
     pass
@@ -79,12 +83,85 @@ class CallTargetCreate(CallTargetBase):
 class CallTarget(CallTargetBase):
     id: int
     status: str
+    attempt_count: int = 0
+    next_attempt_at: Optional[datetime] = None
+    timezone: Optional[str] = None
     created_at: datetime
     updated_at: datetime
 
     class Config:
         orm_mode = True
 
+class CampaignProgress(BaseModel):
+    scenario_id: int
+    total: int = 0
+    dialed: int = 0
+    completed: int = 0
+    no_answer: int = 0
+    busy: int = 0
+    failed: int = 0
+    opted_out: int = 0
+    remaining: int = 0
+
+    class Config:
+        orm_mode = True
+
+
+# --- Import Job Schemas ---
+class ImportJob(BaseModel):
+    id: int
+    scenario_id: int
+    filename: Optional[str] = None
+    status: str
+    total_bytes: int = 0
+    bytes_read: int = 0
+    rows_read: int = 0
+    accepted: int = 0
+    duplicates: int = 0
+    invalid: int = 0
+    blacklisted: int = 0
+    rows_per_sec: Optional[float] = None
+    eta_seconds: Optional[float] = None
+    has_errors: bool = False
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        orm_mode = True
+
+
+class ExportJob(BaseModel):
+    id: int
+    status: str
+    filters_json: Optional[dict] = None
+    size_bytes: Optional[int] = None
+    error: Optional[str] = None
+    cached: bool = False # an existing fresh or in-progress export was reused
+    audio_total: Optional[int] = None
+    audio_done: Optional[int] = 0
+    audio_failed: Optional[int] = 0
+    audio_bytes: Optional[int] = 0
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        orm_mode = True
+
+
+# --- Blacklist Schemas ---
+class BlacklistCreate(BaseModel):
+    phone_number: str
+    reason: Optional[str] = "manual"
+
+class Blacklist(BlacklistCreate):
+    created_at: datetime
+
+    class Config:
+        orm_mode = True
+
 
 # --- PhoneNumber Schemas ---
 class PhoneNumberBase(BaseModel):
@@ -144,3 +221,35 @@ class CallLog(BaseModel):
     class Config:
         orm_mode = True
 
+class CallLogPage(BaseModel):
+    items: List[CallLog]
+    next_cursor: Optional[str] = None
+
+class SearchHit(BaseModel):
+    kind: str # answer, message, call
+    id: Optional[int] = None # answer / message id
+    call_sid: Optional[str] = None
+    snippet: str # HTML-escaped text around the match, terms wrapped in <mark>
+    started_at: Optional[datetime] = None
+    scenario_id: Optional[int] = None
+    to_number: Optional[str] = None
+    from_number: Optional[str] = None
+
+class SearchPage(BaseModel):
+    items: List[SearchHit]
+    next_cursor: Optional[str] = None
+
+class CallStats(BaseModel):
+    # Dimensions not in group_by are omitted (null)
+    scenario_id: Optional[int] = None
+    day: Optional[date] = None
+    classification: Optional[str] = None
+    calls: int = 0
+    completed: int = 0
+    duration_total: int = 0
+    duration_calls: int = 0
+    avg_duration: Optional[float] = None
+    bridged: int = 0
+    bridge_rate: Optional[float] = None # bridged / completed
+    sms_sent: int = 0
+
@@ -0,0 +1,237 @@
+import html
+from sqlalchemy import DateTime, Integer, and_, case, column, func, literal, select, table, text, union_all
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+from . import models, pagination
+from .database import create_index
+
+# Full-text search over Answer.transcript_text, Message.transcript_text and Call.transcript_full.
+#
+# SQLite: one FTS5 table with the trigram tokenizer (works for Japanese, which has no word
+# boundaries). Triggers on the three source tables keep it in sync, so transcription jobs
+# and manual edits need no extra code. rowid = source key * 4 + kind code, so a source row
+# maps to exactly one FTS row and the triggers delete by rowid. The key is the id of answers
+# and messages; calls (keyed by call_sid) have no stable integer (VACUUM may renumber their
+# implicit rowid), so transcript_fts_keys hands out one per call_sid. Each FTS row also
+# carries its source's time, so matches sort newest first like the PostgreSQL path.
+# PostgreSQL: pg_trgm GIN indexes directly on the source columns, queried with ILIKE.
+#
+# Trigram indexes need 3+ characters per term: shorter terms are matched by scanning
+# (the FTS content on SQLite, a sequential scan on PostgreSQL).
+
+FTS_TABLE = "transcript_fts"
+KEYS_TABLE = "transcript_fts_keys"
+MIN_INDEXED_CHARS = 3
+SNIPPET_CHARS = 40
+
+# kind -> (code in the FTS rowid, source table, key column, text column, time column)
+SOURCES = {
+    "answer": (1, "answers", "id", "transcript_text", "created_at"),
+    "message": (2, "messages", "id", "transcript_text", "created_at"),
+    "call": (3, "calls", "call_sid", "transcript_full", "started_at"),
+}
+
+fts = table(FTS_TABLE, column("rowid", Integer), column("kind"), column("call_sid"), column("ts", DateTime), column("body"))
+
+
+def _fts_rowid(kind: str, row: str) -> str:
+    """SQL for the FTS rowid of source row `row` (new / old in triggers, the table when filling)."""
+    code, _, key, _, _ = SOURCES[kind]
+    if key == "call_sid":
+        return f"(SELECT id FROM {KEYS_TABLE} WHERE call_sid = {row}.call_sid) * 4 + {code}"
+    return f"{row}.{key} * 4 + {code}"
+
+
+def _sqlite_fill(kind: str, row: str, source: str = None) -> str:
+    """Statements indexing source row(s): a trigger body (row = new) or the initial fill (row = table)."""
+    _, _, key, text_column, time_column = SOURCES[kind]
+    has_text = f"{row}.{text_column} IS NOT NULL AND {row}.{text_column} != ''"
+    from_clause = f" FROM {source}" if source else ""
+    statements = []
+    if key == "call_sid":
+        statements.append(f"INSERT OR IGNORE INTO {KEYS_TABLE}(call_sid) SELECT {row}.call_sid{from_clause} WHERE {has_text};")
+    statements.append(
+        f"INSERT INTO {FTS_TABLE}(rowid, kind, call_sid, ts, body) "
+        f"SELECT {_fts_rowid(kind, row)}, '{kind}', {row}.call_sid, {row}.{time_column}, {row}.{text_column}"
+        f"{from_clause} WHERE {has_text};"
+    )
+    return " ".join(statements)
+
+
+def _sqlite_triggers(kind: str) -> list:
+    _, source, key, text_column, time_column = SOURCES[kind]
+    delete = f"DELETE FROM {FTS_TABLE} WHERE rowid = {_fts_rowid(kind, 'old')};"
+    forget = f" DELETE FROM {KEYS_TABLE} WHERE call_sid = old.call_sid;" if key == "call_sid" else ""
+    insert = _sqlite_fill(kind, "new")
+    name = f"{FTS_TABLE}_{source}"
+    return [
+        f"CREATE TRIGGER {name}_ai AFTER INSERT ON {source} BEGIN {insert} END",
+        f"CREATE TRIGGER {name}_au AFTER UPDATE OF {text_column}, {time_column}, call_sid ON {source} BEGIN {delete} {insert} END",
+        f"CREATE TRIGGER {name}_ad AFTER DELETE ON {source} BEGIN {delete}{forget} END",
+    ]
+
+
+def install(conn: Connection) -> bool:
+    """(Re)build the search index from existing rows and (re)create its triggers. Returns False if unsupported."""
+    if conn.dialect.name == "postgresql":
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        for kind, (_, source, _, text_column, _) in SOURCES.items():
+            name = f"ix_{source}_{text_column}_trgm"
+            create_index(conn, name, f"CREATE INDEX IF NOT EXISTS {name} ON {source} USING gin ({text_column} gin_trgm_ops)")
+        return True
+
+    if conn.dialect.name != "sqlite":
+        return False
+    try:
+        with conn.begin_nested():
+            conn.execute(text(f"DROP TABLE IF EXISTS {FTS_TABLE}"))
+            conn.execute(text(
+                f"CREATE VIRTUAL TABLE {FTS_TABLE} "
+                f"USING fts5(kind UNINDEXED, call_sid UNINDEXED, ts UNINDEXED, body, tokenize='trigram')"
+            ))
+    except Exception as e:
+        # SQLite < 3.34 or built without FTS5: search falls back to scanning the source tables
+        print(f"- Full-text search index unavailable: {e}")
+        return False
+    conn.execute(text(f"CREATE TABLE IF NOT EXISTS {KEYS_TABLE} (id INTEGER PRIMARY KEY, call_sid TEXT NOT NULL UNIQUE)"))
+    conn.execute(text(f"DELETE FROM {KEYS_TABLE}"))
+    for kind, (_, source, _, _, _) in SOURCES.items():
+        for suffix in ("ai", "au", "ad"):
+            conn.execute(text(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{source}_{suffix}"))
+        for statement in _sqlite_fill(kind, source, source).split(";"):
+            if statement.strip():
+                conn.execute(text(statement))
+        for ddl in _sqlite_triggers(kind):
+            conn.execute(text(ddl))
+    return True
+
+
+def has_fts(db: Session) -> bool:
+    return db.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": FTS_TABLE}
+    ).first() is not None
+
+
+def parse_terms(q: str) -> list:
+    """Whitespace (ASCII or full-width) separates terms; all terms must match."""
+    return [term for term in (q or "").replace("　", " ").split(" ") if term]
+
+
+def _phrase(term: str) -> str:
+    return '"' + term.replace('"', '""') + '"'
+
+
+def _like_pattern(term: str) -> str:
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def highlight(body: str, terms: list, width: int = SNIPPET_CHARS) -> str:
+    """
+    HTML snippet around the first match: escaped text with every term wrapped in <mark>.
+    Matching is case-insensitive for ASCII, like the indexes.
+    """
+    lowered = body.lower()
+    needles = [term.lower() for term in terms]
+    positions = [p for p in (lowered.find(n) for n in needles) if p >= 0]
+    first = min(positions) if positions else 0
+    start = max(first - width // 2, 0)
+    end = min(start + width * 2, len(body))
+
+    # Mark spans inside the window, longest term first so overlapping terms do not split
+    marks = [False] * (end - start)
+    for needle in sorted(needles, key=len, reverse=True):
+        position = lowered.find(needle, start)
+        while 0 <= position < end:
+            for i in range(position, min(position + len(needle), end)):
+                marks[i - start] = True
+            position = lowered.find(needle, position + 1)
+
+    parts, inside = [], False
+    for i, char in enumerate(body[start:end]):
+        if marks[i] != inside:
+            parts.append("<mark>" if marks[i] else "</mark>")
+            inside = marks[i]
+        parts.append(html.escape(char))
+    if inside:
+        parts.append("</mark>")
+    return ("…" if start > 0 else "") + "".join(parts) + ("…" if end < len(body) else "")
+
+
+def _sqlite_query(db: Session, terms: list, kind: str = None):
+    """FTS5 matches: same columns and order as _union_query."""
+    ref = case((fts.c.kind == "call", literal(0)), else_=fts.c.rowid // 4)
+    conditions = []
+    indexed = [term for term in terms if len(term) >= MIN_INDEXED_CHARS]
+    if indexed:
+        conditions.append(text(f"{FTS_TABLE} MATCH :match").bindparams(
+            match=" AND ".join(_phrase(term) for term in indexed)
+        ))
+    for term in terms:
+        if len(term) < MIN_INDEXED_CHARS:
+            conditions.append(func.instr(func.lower(fts.c.body), term.lower()) > 0)
+    if kind:
+        conditions.append(fts.c.kind == kind)
+    matches = select(
+        fts.c.ts.label("ts"), fts.c.kind.label("kind"), ref.label("ref"), fts.c.call_sid.label("call_sid"), fts.c.body.label("body")
+    ).where(*conditions).subquery()
+    query = db.query(matches.c.ts, matches.c.kind, matches.c.ref, matches.c.call_sid, matches.c.body)
+    return query, [matches.c.ts, matches.c.kind, matches.c.ref, matches.c.call_sid]
+
+
+def _union_query(db: Session, terms: list, kind: str = None):
+    """PostgreSQL (pg_trgm) and the no-FTS fallback: ILIKE over the source columns."""
+    A, M, C = models.Answer, models.Message, models.Call
+    selects = []
+    for name, model, key, body, ts in (
+        ("answer", A, A.id, A.transcript_text, A.created_at),
+        ("message", M, M.id, M.transcript_text, M.created_at),
+        ("call", C, literal(0), C.transcript_full, C.started_at),
+    ):
+        if kind and kind != name:
+            continue
+        conditions = [body.ilike(_like_pattern(term), escape="\\") for term in terms]
+        selects.append(db.query(
+            ts.label("ts"), literal(name).label("kind"), key.label("ref"),
+            model.call_sid.label("call_sid"), body.label("body")
+        ).filter(and_(*conditions)).statement)
+    matches = union_all(*selects).subquery()
+    query = db.query(matches.c.ts, matches.c.kind, matches.c.ref, matches.c.call_sid, matches.c.body)
+    return query, [matches.c.ts, matches.c.kind, matches.c.ref, matches.c.call_sid]
+
+
+def search(db: Session, q: str, cursor: str = None, limit: int = 20, kind: str = None):
+    """
+    Newest matches first, keyset-paginated. Returns (items, next_cursor); each item has
+    kind, id (answer/message id, None for calls), call_sid, snippet (HTML) and call context.
+    """
+    terms = parse_terms(q)
+    if not terms:
+        return [], None
+
+    dialect = db.get_bind().dialect.name
+    use_fts = dialect == "sqlite" and has_fts(db)
+    query, columns = _sqlite_query(db, terms, kind) if use_fts else _union_query(db, terms, kind)
+    rows, next_cursor = pagination.keyset_page(query, columns, cursor, limit)
+
+    call_sids = {row.call_sid for row in rows if row.call_sid}
+    calls = {}
+    if call_sids:
+        for call in db.query(models.Call).filter(models.Call.call_sid.in_(call_sids)):
+            calls[call.call_sid] = call
+
+    items = []
+    for row in rows:
+        ref = row.ref if row.kind != "call" else None
+        call = calls.get(row.call_sid)
+        items.append({
+            "kind": row.kind,
+            "id": ref,
+            "call_sid": row.call_sid,
+            "snippet": highlight(row.body or "", terms),
+            "started_at": call.started_at if call else None,
+            "scenario_id": call.scenario_id if call else None,
+            "to_number": call.to_number if call else None,
+            "from_number": call.from_number if call else None,
+        })
+    return items, next_cursor
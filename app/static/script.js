@@ -101,6 +101,9 @@ async function selectScenario(scenarioId) {
         document.getElementById('scenario-end-time').value = scenario.end_time || '18:00';
         document.getElementById('scenario-timeout-short').value = scenario.silence_timeout_short || 15;
         document.getElementById('scenario-timeout-long').value = scenario.silence_timeout_long || 60;
+        document.getElementById('scenario-max-attempts').value = scenario.max_attempts || 1;
+        document.getElementById('scenario-retry-backoff').value = scenario.retry_backoff_minutes || '30,60,120';
+        document.getElementById('scenario-indexed-keys').value = scenario.indexed_metadata_keys || '';
         document.getElementById('scenario-greeting').value = scenario.greeting_text || '';
         document.getElementById('scenario-disclaimer').value = scenario.disclaimer_text || '';
 
@@ -259,6 +262,9 @@ if (scenarioForm) {
                 end_time: document.getElementById('scenario-end-time').value,
                 silence_timeout_short: parseInt(document.getElementById('scenario-timeout-short').value) || 15,
                 silence_timeout_long: parseInt(document.getElementById('scenario-timeout-long').value) || 60,
+                max_attempts: parseInt(document.getElementById('scenario-max-attempts').value) || 1,
+                retry_backoff_minutes: document.getElementById('scenario-retry-backoff').value || '30,60,120',
+                indexed_metadata_keys: document.getElementById('scenario-indexed-keys').value,
                 bridge_number: document.getElementById('scenario-bridge').value,
                 sms_template: document.getElementById('scenario-sms').value,
                 default_expand_details: document.getElementById('scenario-expand-details')?.checked || false,
@@ -363,14 +369,57 @@ async function handleFileUpload(input) {
 
     const formData = new FormData();
     formData.append('file', input.files[0]);
+    input.value = '';
 
-    const res = await fetch(`${API_BASE}/scenarios/${scenarioId}/upload_targets`, {
+    // The list is staged and imported by a background job; poll its progress
+    const res = await fetch(`${API_BASE}/scenarios/${scenarioId}/import_jobs`, {
         method: 'POST',
         body: formData
     });
-    const result = await res.json();
-    alert(result.message);
-    loadTargets(scenarioId);
+    if (!res.ok) { alert('アップロードに失敗しました'); return; }
+    const job = await res.json();
+    pollImportJob(job.id, scenarioId);
+}
+
+let importPollTimer = null;
+
+async function pollImportJob(jobId, scenarioId) {
+    clearTimeout(importPollTimer);
+    const res = await fetch(`${API_BASE}/import_jobs/${jobId}`);
+    if (!res.ok) return;
+    const job = await res.json();
+    renderImportJob(job);
+
+    if (job.status === 'queued' || job.status === 'running') {
+        importPollTimer = setTimeout(() => pollImportJob(jobId, scenarioId), 1000);
+    } else {
+        loadTargets(scenarioId);
+    }
+}
+
+function renderImportJob(job) {
+    const box = document.getElementById('import-status');
+    if (!box) return;
+    const active = job.status === 'queued' || job.status === 'running';
+    const percent = job.total_bytes ? Math.floor(job.bytes_read * 100 / job.total_bytes) : 0;
+    const labels = { queued: '待機中', running: 'インポート中', completed: '完了', canceled: 'キャンセル', failed: '失敗' };
+
+    let html = `<strong>${labels[job.status] || job.status}</strong> ${percent}% ` +
+        `読込 ${job.rows_read.toLocaleString()} / 追加 ${job.accepted.toLocaleString()} / ` +
+        `重複 ${job.duplicates.toLocaleString()} / 無効 ${job.invalid.toLocaleString()} / ` +
+        `拒否 ${job.blacklisted.toLocaleString()}`;
+    if (job.rows_per_sec) html += ` (${Math.round(job.rows_per_sec).toLocaleString()} 行/秒)`;
+    if (job.eta_seconds != null) html += ` 残り約${Math.ceil(job.eta_seconds)}秒`;
+    if (job.error) html += ` <span style="color: var(--danger, #f87171);">${job.error}</span>`;
+    if (active) html += ` <button class="danger small" onclick="cancelImportJob(${job.id})">キャンセル</button>`;
+    if (job.has_errors) html += ` <a href="${API_BASE}/import_jobs/${job.id}/errors">エラー行CSV</a>`;
+
+    box.innerHTML = html;
+    box.style.display = 'block';
+}
+
+async function cancelImportJob(jobId) {
+    await fetch(`${API_BASE}/import_jobs/${jobId}/cancel`, { method: 'POST' });
 }
 
 async function addTargetManually() {
@@ -396,25 +445,73 @@ async function addTargetManually() {
     }
 }
 
+// Keyset-paginated like the call log: loadTargets() starts over, loadMoreTargets() appends
+let targetsScenarioId = null;
+let targetsNextCursor = null;
+
+function targetFilterParams() {
+    // Server-side filters: "列:値" terms on CSV columns (e.g. 地域:東京 担当:山田), plus status and number
+    const params = new URLSearchParams();
+    const filter = document.getElementById('target-filter')?.value.trim();
+    if (filter) filter.split(/\s+/).forEach(term => params.append('meta', term));
+    const phone = document.getElementById('target-phone-filter')?.value.trim();
+    if (phone) params.set('phone_number', phone);
+    return params;
+}
+
 async function loadTargets(scenarioId) {
     if (!scenarioId) return;
-    const res = await fetch(`${API_BASE}/scenarios/${scenarioId}/targets`);
+    targetsScenarioId = scenarioId;
+    targetsNextCursor = null;
+    const tbody = document.querySelector('#targets-table tbody');
+    if (tbody) tbody.innerHTML = '';
+    await Promise.all([fetchTargetsPage(), loadTargetCounts()]);
+}
+
+async function loadMoreTargets() {
+    if (targetsNextCursor) await fetchTargetsPage();
+}
+
+async function fetchTargetsPage() {
+    const scenarioId = targetsScenarioId;
+    const params = targetFilterParams();
+    const status = document.getElementById('target-status-filter')?.value;
+    if (status) params.set('status', status);
+    params.set('limit', '200');
+    if (targetsNextCursor) params.set('cursor', targetsNextCursor);
+
+    const res = await fetch(`${API_BASE}/scenarios/${scenarioId}/targets/page?${params}`);
+    if (!res.ok || scenarioId !== targetsScenarioId) return;
     const data = await res.json();
+    targetsNextCursor = data.next_cursor;
+    const moreButton = document.getElementById('targets-load-more');
+    if (moreButton) moreButton.style.display = targetsNextCursor ? 'inline-block' : 'none';
+
     const tbody = document.querySelector('#targets-table tbody');
     if (!tbody) return;
-    tbody.innerHTML = '';
-    data.forEach(t => {
-        tbody.innerHTML += `
-            <tr>
-                <td>${formatJapanesePhone(t.phone_number)}</td>
-                <td><span class="badge ${t.status}">${t.status}</span></td>
-                <td>${formatJST(t.created_at)}</td>
-                <td>
-                    <button class="secondary small" onclick="deleteTarget(${t.id}, ${scenarioId})">削除</button>
-                </td>
-            </tr>
-        `;
-    });
+    // Compact rows: values in data.columns order
+    const col = Object.fromEntries(data.columns.map((name, i) => [name, i]));
+    tbody.insertAdjacentHTML('beforeend', data.rows.map(row => `
+        <tr>
+            <td>${formatJapanesePhone(row[col.phone_number])}</td>
+            <td><span class="badge ${row[col.status]}">${row[col.status]}</span></td>
+            <td>${formatJST(row[col.created_at])}</td>
+            <td>
+                <button class="secondary small" onclick="deleteTarget(${row[col.id]}, ${scenarioId})">削除</button>
+            </td>
+        </tr>
+    `).join(''));
+}
+
+async function loadTargetCounts() {
+    const box = document.getElementById('targets-counts');
+    if (!box) return;
+    const res = await fetch(`${API_BASE}/scenarios/${targetsScenarioId}/targets/counts?${targetFilterParams()}`);
+    if (!res.ok) return;
+    const counts = await res.json();
+    const parts = Object.entries(counts.by_status)
+        .map(([status, count]) => `<span class="badge ${status}">${status}</span> ${count.toLocaleString()}`);
+    box.innerHTML = `合計 <strong>${counts.total.toLocaleString()}</strong> 件 ` + parts.join(' ');
 }
 
 async function deleteTarget(id, scenarioId) {
@@ -445,19 +542,39 @@ async function stopAllCalls() {
 }
 
 // --- Logs ---
-async function loadLogs() {
-    const toNumber = document.getElementById('filter-to')?.value || '';
-    const startDate = document.getElementById('filter-start-date')?.value || '';
-    const endDate = document.getElementById('filter-end-date')?.value || '';
+// Keyset-paginated: loadLogs() starts over, loadMoreLogs() appends the next page
+let logsNextCursor = null;
+let logsScenarioMap = {};
+let logsRowCount = 0;
 
+async function loadLogs() {
     // 1. Fetch current scenarios to get expansion settings
     const scRes = await fetch(`${API_BASE}/scenarios/`);
     const scenarios = await scRes.json();
-    const scenarioMap = {};
-    scenarios.forEach(s => { scenarioMap[s.id] = s; });
+    logsScenarioMap = {};
+    scenarios.forEach(s => { logsScenarioMap[s.id] = s; });
+
+    const tbody = document.querySelector('#logs-table tbody');
+    if (!tbody) return;
+    tbody.innerHTML = '';
+    logsRowCount = 0;
+    logsNextCursor = null;
 
     // 2. Fetch Logs
-    let url = `${API_BASE}/calls/?limit=100&_cb=${Date.now()}`;
+    await fetchLogsPage();
+}
+
+async function loadMoreLogs() {
+    if (logsNextCursor) await fetchLogsPage();
+}
+
+async function fetchLogsPage() {
+    const toNumber = document.getElementById('filter-to')?.value || '';
+    const startDate = document.getElementById('filter-start-date')?.value || '';
+    const endDate = document.getElementById('filter-end-date')?.value || '';
+
+    let url = `${API_BASE}/calls/summary?limit=100&_cb=${Date.now()}`;
+    if (logsNextCursor) url += `&cursor=${encodeURIComponent(logsNextCursor)}`;
     if (toNumber) url += `&to_number=${encodeURIComponent(toNumber)}`;
     if (typeof currentScenarioFilter !== 'undefined' && currentScenarioFilter) {
         url += `&scenario_id=${currentScenarioFilter}`;
@@ -467,64 +584,140 @@ async function loadLogs() {
 
     const res = await fetch(url);
     const data = await res.json();
+    logsNextCursor = data.next_cursor;
+    const moreButton = document.getElementById('logs-load-more');
+    if (moreButton) moreButton.style.display = logsNextCursor ? 'inline-block' : 'none';
+
     const tbody = document.querySelector('#logs-table tbody');
     if (!tbody) return;
-    tbody.innerHTML = '';
-
-    data.forEach((call, callIdx) => {
-        const detailsId = `details-${callIdx}`;
-
-        // Expansion logic based on scenario setting
-        const sc = scenarioMap[call.scenario_id];
-        const initialDisplay = sc && sc.default_expand_details ? 'block' : 'none';
-        const buttonText = sc && sc.default_expand_details ? '<i class="fas fa-eye-slash"></i> 回答詳細を隠す' : '<i class="fas fa-eye"></i> 回答詳細を表示';
-
-        let answerDataHtml = '';
-        if (call.answers && call.answers.length > 0) {
-            answerDataHtml = `<div id="${detailsId}" class="answer-details-container" style="display: ${initialDisplay}; max-width: 500px; margin-top: 10px; padding: 10px; background: rgba(255, 255, 255, 0.05); border-radius: 8px; border: 1px solid var(--panel-border);">`;
-            call.answers.forEach((answer, idx) => {
-                const qText = answer.question_text || `質問${idx + 1}`;
-                const transcript = answer.transcript_text || '(文字起こしなし)';
-                const audioLink = answer.recording_sid
-                    ? `<audio controls src="${API_BASE}/audio_proxy/${answer.recording_sid}" style="width: 100%; margin-top: 3px; height: 35px;"></audio>`
-                    : '';
-
-                answerDataHtml += `
-                    <div style="margin-bottom: 12px; padding: 10px; background: rgba(0, 0, 0, 0.2); border-left: 4px solid var(--primary); border-radius: 4px;">
-                        <strong style="color: var(--primary); font-size: 0.9em;">Q${idx + 1}: ${escapeHtml(qText)}</strong><br>
-                        <div style="margin-top: 4px; font-size: 0.95em;">${escapeHtml(transcript)}</div>
-                        ${audioLink}
-                    </div>
-                `;
-            });
-            answerDataHtml += '</div>';
-        }
+    tbody.insertAdjacentHTML('beforeend', data.items.map(renderLogRow).join(''));
+    loadExpandedDetails(tbody);
+}
 
-        const fullRecording = call.recording_sid
-            ? `<div style="margin-bottom: 8px;"><strong>全録音:</strong><br><audio controls src="${API_BASE}/audio_proxy/${call.recording_sid}" style="width: 100%; max-width: 280px; height: 35px;"></audio></div>`
-            : '';
+// Rows come from /calls/summary (no answers); answers are fetched from /calls/{call_sid}
+// the first time a row is expanded, or right away for scenarios that expand by default.
+function renderLogRow(call) {
+    const detailsId = `details-${logsRowCount++}`;
+
+    // Expansion logic based on scenario setting
+    const sc = logsScenarioMap[call.scenario_id];
+    const expanded = !!(sc && sc.default_expand_details);
+    const buttonText = expanded ? '<i class="fas fa-eye-slash"></i> 回答詳細を隠す' : '<i class="fas fa-eye"></i> 回答詳細を表示';
+
+    const answerDataHtml = call.answer_count > 0
+        ? `<div id="${detailsId}" class="answer-details-container" data-call-sid="${escapeHtml(call.call_sid)}" data-loaded="false" style="display: ${expanded ? 'block' : 'none'}; max-width: 500px; margin-top: 10px; padding: 10px; background: rgba(255, 255, 255, 0.05); border-radius: 8px; border: 1px solid var(--panel-border);">読み込み中...</div>`
+        : '';
+
+    const fullRecording = call.recording_sid
+        ? `<div style="margin-bottom: 8px;"><strong>全録音:</strong><br><audio controls src="${API_BASE}/recordings/${call.recording_sid}" style="width: 100%; max-width: 280px; height: 35px;"></audio></div>`
+        : '';
+
+    const toggleButton = call.answer_count > 0
+        ? `<button onclick="toggleAnswerDetails('${detailsId}', this)" class="secondary small" style="margin-top: 5px;">
+            ${buttonText}
+           </button>`
+        : '';
+
+    return `
+        <tr data-call-sid="${escapeHtml(call.call_sid)}">
+            <td style="white-space: nowrap; font-size: 0.85em;">${formatJST(call.started_at)}</td>
+            <td style="white-space: nowrap;">${formatJapanesePhone(call.from_number)}</td>
+            <td style="white-space: nowrap;">${formatJapanesePhone(call.to_number)}</td>
+            <td>${escapeHtml(call.scenario_name || '-')}</td>
+            <td><span class="badge ${call.status}">${call.status}</span></td>
+            <td>
+                ${fullRecording}
+                ${toggleButton}
+                ${answerDataHtml}
+            </td>
+        </tr>
+    `;
+}
 
-        const toggleButton = call.answers && call.answers.length > 0
-            ? `<button onclick="toggleAnswerDetails('${detailsId}', this)" class="secondary small" style="margin-top: 5px;">
-                ${buttonText}
-               </button>`
+function renderAnswers(answers) {
+    return answers.map((answer, idx) => {
+        const qText = answer.question_text || `質問${idx + 1}`;
+        const transcript = answer.transcript_text || '(文字起こしなし)';
+        const audioLink = answer.recording_sid
+            ? `<audio controls src="${API_BASE}/recordings/${answer.recording_sid}" style="width: 100%; margin-top: 3px; height: 35px;"></audio>`
             : '';
 
-        tbody.innerHTML += `
-            <tr>
-                <td style="white-space: nowrap; font-size: 0.85em;">${formatJST(call.started_at)}</td>
-                <td style="white-space: nowrap;">${formatJapanesePhone(call.from_number)}</td>
-                <td style="white-space: nowrap;">${formatJapanesePhone(call.to_number)}</td>
-                <td>${escapeHtml(call.scenario_name || '-')}</td>
-                <td><span class="badge ${call.status}">${call.status}</span></td>
-                <td>
-                    ${fullRecording}
-                    ${toggleButton}
-                    ${answerDataHtml}
-                </td>
-            </tr>
+        return `
+            <div style="margin-bottom: 12px; padding: 10px; background: rgba(0, 0, 0, 0.2); border-left: 4px solid var(--primary); border-radius: 4px;">
+                <strong style="color: var(--primary); font-size: 0.9em;">Q${idx + 1}: ${escapeHtml(qText)}</strong><br>
+                <div data-answer-id="${answer.id}" style="margin-top: 4px; font-size: 0.95em;">${escapeHtml(transcript)}</div>
+                ${audioLink}
+            </div>
         `;
+    }).join('');
+}
+
+async function loadAnswerDetails(container) {
+    if (container.dataset.loaded !== 'false') return;
+    container.dataset.loaded = 'loading';
+    const res = await fetch(`${API_BASE}/calls/${encodeURIComponent(container.dataset.callSid)}`);
+    if (!res.ok) {
+        container.dataset.loaded = 'false';
+        container.textContent = '読み込みに失敗しました';
+        return;
+    }
+    const call = await res.json();
+    container.innerHTML = renderAnswers(call.answers || []);
+    container.dataset.loaded = 'true';
+}
+
+function loadExpandedDetails(root) {
+    root.querySelectorAll('.answer-details-container[data-loaded="false"]').forEach(el => {
+        if (el.style.display !== 'none') loadAnswerDetails(el);
+    });
+}
+
+// --- Live updates (Server-Sent Events) ---
+// The server pushes small deltas; rows already on screen are patched in place,
+// so an open logs page never re-queries the call log.
+let logEvents = null;
+
+function startLogEvents() {
+    if (logEvents || typeof EventSource === 'undefined') return;
+    logEvents = new EventSource(`${API_BASE}/events`);
+
+    logEvents.addEventListener('call_started', (e) => {
+        const call = JSON.parse(e.data);
+        if (!callMatchesLogFilters(call)) return;
+        const tbody = document.querySelector('#logs-table tbody');
+        if (!tbody || findLogRow(call.call_sid)) return;
+        tbody.insertAdjacentHTML('afterbegin', renderLogRow({ ...call, answer_count: 0 }));
+    });
+
+    logEvents.addEventListener('call_status', (e) => {
+        const update = JSON.parse(e.data);
+        const badge = findLogRow(update.call_sid)?.querySelector('.badge');
+        if (!badge) return;
+        badge.className = `badge ${update.status}`;
+        badge.textContent = update.status;
     });
+
+    logEvents.addEventListener('transcript_ready', (e) => {
+        const update = JSON.parse(e.data);
+        const cell = document.querySelector(`#logs-table [data-answer-id="${update.answer_id}"]`);
+        if (cell) cell.textContent = update.transcript_text || '(文字起こしなし)';
+    });
+
+    // Events were lost (slow connection or long disconnect): reload the first page once
+    logEvents.addEventListener('resync', () => loadLogs());
+}
+
+function findLogRow(callSid) {
+    return document.querySelector(`#logs-table tr[data-call-sid="${CSS.escape(callSid)}"]`);
+}
+
+function callMatchesLogFilters(call) {
+    const toNumber = document.getElementById('filter-to')?.value || '';
+    const endDate = document.getElementById('filter-end-date')?.value || '';
+    if (toNumber && call.to_number !== toNumber) return false;
+    if (typeof currentScenarioFilter !== 'undefined' && currentScenarioFilter && call.scenario_id !== currentScenarioFilter) return false;
+    // A new call is "now": it only belongs on screen if the range is open-ended
+    return !endDate;
 }
 
 function toggleAnswerDetails(detailsId, btn) {
@@ -533,6 +726,7 @@ function toggleAnswerDetails(detailsId, btn) {
     if (el.style.display === 'none') {
         el.style.display = 'block';
         btn.innerHTML = '<i class="fas fa-eye-slash"></i> 回答詳細を隠す';
+        loadAnswerDetails(el);
     } else {
         el.style.display = 'none';
         btn.innerHTML = '<i class="fas fa-eye"></i> 回答詳細を表示';
@@ -547,6 +741,7 @@ function toggleAllDetails() {
 
     all.forEach(el => {
         el.style.display = newDisp;
+        if (newDisp === 'block') loadAnswerDetails(el);
     });
 
     // Update all individual buttons to match
@@ -555,8 +750,60 @@ function toggleAllDetails() {
     });
 }
 
-async function exportZIP() {
-    window.location.href = `${API_BASE}/export_zip`;
+let exportPollTimer = null;
+
+async function exportZIP(includeAudio = false) {
+    // Generated in the background; the same filters within the freshness window reuse the last ZIP
+    const params = new URLSearchParams();
+    if (includeAudio) params.set('include_audio', 'true');
+    const toNumber = document.getElementById('filter-to')?.value || '';
+    const startDate = document.getElementById('filter-start-date')?.value || '';
+    const endDate = document.getElementById('filter-end-date')?.value || '';
+    if (toNumber) params.set('to_number', toNumber);
+    if (startDate) params.set('start_date', startDate);
+    if (endDate) params.set('end_date', endDate);
+    if (typeof currentScenarioFilter !== 'undefined' && currentScenarioFilter) {
+        params.set('scenario_id', currentScenarioFilter);
+    }
+
+    const res = await fetch(`${API_BASE}/export_jobs?${params}`, { method: 'POST' });
+    if (!res.ok) {
+        alert('エクスポートの開始に失敗しました');
+        return;
+    }
+    pollExportJob((await res.json()).id);
+}
+
+async function pollExportJob(jobId) {
+    clearTimeout(exportPollTimer);
+    const res = await fetch(`${API_BASE}/export_jobs/${jobId}`);
+    if (!res.ok) return;
+    const job = await res.json();
+    renderExportStatus(job);
+
+    if (job.status === 'queued' || job.status === 'running') {
+        exportPollTimer = setTimeout(() => pollExportJob(jobId), 1000);
+    } else if (job.status === 'completed') {
+        window.location.href = `${API_BASE}/export_jobs/${jobId}/download`;
+    } else {
+        alert(`エクスポートに失敗しました: ${job.error || job.status}`);
+    }
+}
+
+function renderExportStatus(job) {
+    const box = document.getElementById('export-status');
+    if (!box) return;
+    if (job.status !== 'queued' && job.status !== 'running') {
+        box.textContent = '';
+        return;
+    }
+    let text = job.status === 'queued' ? 'エクスポート待機中...' : 'エクスポート中...';
+    if (job.audio_total) {
+        const mb = (job.audio_bytes || 0) / 1024 / 1024;
+        text = `録音 ${job.audio_done.toLocaleString()} / ${job.audio_total.toLocaleString()} 件 (${mb.toFixed(1)} MB)`;
+        if (job.audio_failed) text += ` 取得失敗 ${job.audio_failed.toLocaleString()} 件`;
+    }
+    box.textContent = text;
 }
 
 // --- Helpers ---
@@ -27,7 +27,7 @@ async function loadLogs() {
                 const questionText = answer.question_text || `質問${idx + 1}`;
                 const transcript = answer.transcript_text || '(文字起こしなし)';
                 const audioLink = answer.recording_sid
-                    ? `<audio controls src="${API_BASE}/audio_proxy/${answer.recording_sid}" style="width: 100%; margin-top: 3px;"></audio>`
+                    ? `<audio controls src="${API_BASE}/recordings/${answer.recording_sid}" style="width: 100%; margin-top: 3px;"></audio>`
                     : '';
 
                 answerDataHtml += `
@@ -43,7 +43,7 @@ async function loadLogs() {
 
         // Full call recording
         const fullRecording = call.recording_sid
-            ? `<div style="margin-bottom: 5px;"><strong>全録音:</strong><br><audio controls src="${API_BASE}/audio_proxy/${call.recording_sid}" style="width: 100%; max-width: 300px;"></audio></div>`
+            ? `<div style="margin-bottom: 5px;"><strong>全録音:</strong><br><audio controls src="${API_BASE}/recordings/${call.recording_sid}" style="width: 100%; max-width: 300px;"></audio></div>`
             : '';
 
         // Toggle button for answer data
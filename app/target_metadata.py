@@ -0,0 +1,109 @@
+import hashlib
+from sqlalchemy import literal_column, text
+from sqlalchemy.orm import Session
+from . import models
+from .database import create_index, ddl_connection, drop_index
+
+# CallTarget.metadata_json is JSONB on PostgreSQL and JSON1 text on SQLite. Keys listed in
+# Scenario.indexed_metadata_keys are "promoted": they get a (scenario_id, <key expression>)
+# expression index, so filtering a scenario's targets on them does not scan its whole list.
+
+INDEX_PREFIX = "ix_call_targets_meta_"
+
+
+def parse_keys(value: str) -> list:
+    """'region, 名前' -> ['region', '名前']"""
+    return [key.strip() for key in (value or "").split(",") if key.strip()]
+
+
+def parse_filters(values) -> dict:
+    """['region:東京', 'name:山田'] -> {'region': '東京', 'name': '山田'}"""
+    filters = {}
+    for item in values or []:
+        key, sep, value = item.partition(":")
+        if sep and key.strip():
+            filters[key.strip()] = value.strip()
+    return filters
+
+
+def _quote(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def field_sql(dialect: str, key: str, table: str = "call_targets") -> str:
+    """
+    SQL for the text value of a metadata key. The key is inlined as a literal (not a bound
+    parameter) so the expression is identical to the one the index was created on; the
+    planners only use an expression index on an exact match.
+    """
+    column = f"{table}.metadata_json" if table else "metadata_json"
+    if dialect == "postgresql":
+        return f"({column} ->> {_quote(key)})"
+    path = '$."' + key.replace('"', '\\"') + '"'
+    return f"json_extract({column}, {_quote(path)})"
+
+
+def field(db: Session, key: str):
+    return literal_column(field_sql(db.get_bind().dialect.name, key))
+
+
+def apply_filters(query, db: Session, filters: dict):
+    for key, value in filters.items():
+        query = query.filter(field(db, key) == value)
+    return query
+
+
+def index_name(key: str) -> str:
+    # Keys are arbitrary CSV headers (often Japanese): name indexes by a hash of the key
+    return INDEX_PREFIX + hashlib.blake2b(key.encode(), digest_size=6).hexdigest()
+
+
+def _existing_indexes(db: Session) -> set:
+    rows = db.execute(text(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'call_targets' AND name LIKE :prefix"
+    ), {"prefix": INDEX_PREFIX + "%"})
+    return {row[0] for row in rows}
+
+
+def ensure_indexes(db: Session):
+    """
+    Create expression indexes for every key promoted by a live scenario and drop the ones
+    no scenario uses any more. Indexes are shared between scenarios promoting the same key.
+    """
+    dialect = db.get_bind().dialect.name
+    wanted = {}
+    for (keys,) in db.query(models.Scenario.indexed_metadata_keys).filter(
+        models.Scenario.deleted_at.is_(None)
+    ).all():
+        for key in parse_keys(keys):
+            wanted[index_name(key)] = key
+
+    if dialect == "postgresql":
+        db.commit()  # the concurrent build waits for every open transaction, ours included
+        _sync_postgres_indexes(db.get_bind(), wanted)
+        return
+
+    existing = _existing_indexes(db)
+    for name, key in wanted.items():
+        if name not in existing:
+            db.execute(text(
+                f"CREATE INDEX IF NOT EXISTS {name} ON call_targets (scenario_id, {field_sql(dialect, key, table=None)})"
+            ))
+    for name in existing - set(wanted):
+        db.execute(text(f"DROP INDEX IF EXISTS {name}"))
+    db.commit()
+
+
+def _sync_postgres_indexes(engine, wanted: dict):
+    """CREATE/DROP INDEX CONCURRENTLY (database.create_index), so call_targets stays writable."""
+    with ddl_connection(engine) as conn:
+        existing = {row[0] for row in conn.execute(text(
+            "SELECT indexname FROM pg_indexes WHERE tablename = 'call_targets' AND indexname LIKE :prefix"
+        ), {"prefix": INDEX_PREFIX + "%"})}
+        for name, key in wanted.items():
+            create_index(conn, name, (
+                f"CREATE INDEX IF NOT EXISTS {name} "
+                f"ON call_targets (scenario_id, {field_sql('postgresql', key, table=None)})"
+            ))
+        for name in existing - set(wanted):
+            drop_index(conn, name)
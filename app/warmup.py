@@ -0,0 +1,60 @@
+import asyncio
+import importlib
+import os
+import threading
+import time
+from sqlalchemy import text
+
+# Warm-up after startup.
+# The SDKs that take most of the import time (twilio.rest, openai, pyzipper) are imported
+# inside the functions that use them, so a cold process binds its port about a second
+# sooner. The last startup hook starts this thread, which imports them in the background and
+# opens the async pool's first connection. A webhook arriving while the imports still run
+# shares the CPU (and the GIL) with them, so the first webhook after a deploy is slower than
+# a warm one (26 ms -> 44-49 ms on 1 CPU); only the wait for the port gets shorter.
+# STARTUP_WARMUP_DELAY_SECONDS pushes the imports back. pandas stays lazy: only CSV
+# uploads use it.
+
+ENABLED = os.getenv("STARTUP_WARMUP", "1") == "1"
+DELAY_SECONDS = float(os.getenv("STARTUP_WARMUP_DELAY_SECONDS", "0"))
+# Call path first: webhooks and tool actions use twilio.rest, transcription openai
+MODULES = ("twilio.rest", "openai", "pyzipper")
+
+timings = {}  # name -> seconds
+
+
+def import_modules(modules=MODULES):
+    for name in modules:
+        started = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            print(f"Warm-up import of {name} failed: {e}")
+            continue
+        timings[name] = round(time.perf_counter() - started, 3)
+
+
+async def connect_async_pool():
+    from .database import async_engine
+    started = time.perf_counter()
+    try:
+        async with async_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+    except Exception as e:
+        print(f"Warm-up connection failed: {e}")
+        return
+    timings["async_pool"] = round(time.perf_counter() - started, 3)
+
+
+def _run(loop):
+    time.sleep(DELAY_SECONDS)
+    # async connections belong to the server's loop, so that one is opened there
+    asyncio.run_coroutine_threadsafe(connect_async_pool(), loop)
+    import_modules()
+    print(f"Warm-up done: {timings}")
+
+
+def start(loop: asyncio.AbstractEventLoop):
+    """Schedule the warm-up; call from an async startup hook (the loop serves the requests)."""
+    if ENABLED:
+        threading.Thread(target=_run, args=(loop,), name="warmup", daemon=True).start()
@@ -0,0 +1,94 @@
+import os
+from datetime import datetime, timedelta, timezone, time as dtime
+from functools import lru_cache
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+# Timezone used for scenario windows when a target has no timezone/region of its own
+DEFAULT_TIMEZONE = os.getenv("CALLING_DEFAULT_TIMEZONE", "Asia/Tokyo")
+
+# Region codes accepted in CSV metadata (region / 地域 columns) in addition to IANA names
+REGION_TIMEZONES = {
+    "JP": "Asia/Tokyo",
+    "JST": "Asia/Tokyo",
+    "日本": "Asia/Tokyo",
+    "KR": "Asia/Seoul",
+    "CN": "Asia/Shanghai",
+    "TW": "Asia/Taipei",
+    "SG": "Asia/Singapore",
+    "UK": "Europe/London",
+    "US-EAST": "America/New_York",
+    "US-CENTRAL": "America/Chicago",
+    "US-WEST": "America/Los_Angeles",
+    "HAWAII": "Pacific/Honolulu",
+}
+
+TIMEZONE_KEYS = ["timezone", "tz", "time_zone", "タイムゾーン", "region", "地域"]
+
+
+def _parse_hhmm(value: str) -> dtime:
+    hour, minute = value.strip().split(":")[:2]
+    return dtime(int(hour), int(minute))
+
+
+class CallingWindow:
+    """
+    A daily calling window ("10:00"-"18:00") in one timezone. start is inclusive, end exclusive;
+    a window with start > end wraps midnight. All datetimes in/out are naive UTC like the models.
+    """
+
+    def __init__(self, start_time: str, end_time: str, tz_name: str):
+        self.start = _parse_hhmm(start_time)
+        self.end = _parse_hhmm(end_time)
+        self.tz = ZoneInfo(tz_name)
+
+    def _local(self, now_utc: datetime) -> datetime:
+        return now_utc.replace(tzinfo=timezone.utc).astimezone(self.tz)
+
+    def contains(self, now_utc: datetime) -> bool:
+        t = self._local(now_utc).time()
+        if self.start <= self.end:
+            return self.start <= t < self.end
+        return t >= self.start or t < self.end
+
+    def _next_local(self, local: datetime, at: dtime) -> datetime:
+        for days in range(3):
+            candidate = datetime.combine(local.date() + timedelta(days=days), at, tzinfo=self.tz)
+            if candidate > local:
+                return candidate
+
+    @staticmethod
+    def _to_utc(local: datetime) -> datetime:
+        return local.astimezone(timezone.utc).replace(tzinfo=None)
+
+    def next_open(self, now_utc: datetime) -> datetime:
+        """now_utc if the window is open, else the next opening."""
+        if self.contains(now_utc):
+            return now_utc
+        return self._to_utc(self._next_local(self._local(now_utc), self.start))
+
+    def next_change(self, now_utc: datetime) -> datetime:
+        """The next open or close boundary after now_utc."""
+        local = self._local(now_utc)
+        return self._to_utc(min(self._next_local(local, self.start), self._next_local(local, self.end)))
+
+
+@lru_cache(maxsize=1024)
+def get_window(start_time: str, end_time: str, tz_name: str = None) -> CallingWindow:
+    """Parsed windows are cached; scenarios only change start/end through the editor."""
+    return CallingWindow(start_time or "00:00", end_time or "23:59", tz_name or DEFAULT_TIMEZONE)
+
+
+def timezone_for(metadata: dict):
+    """IANA timezone name from CSV metadata (timezone / region columns), or None for the default."""
+    for key in TIMEZONE_KEYS:
+        value = (metadata or {}).get(key)
+        if not value:
+            continue
+        value = str(value).strip()
+        name = REGION_TIMEZONES.get(value.upper(), value)
+        try:
+            ZoneInfo(name)
+            return name
+        except (ZoneInfoNotFoundError, ValueError):
+            continue
+    return None
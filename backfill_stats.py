@@ -0,0 +1,64 @@
+"""
+Backfill the daily statistics rollup (call_stats_daily) from historical calls.
+
+    python backfill_stats.py              # count calls that are not in the rollup yet
+    python backfill_stats.py --rebuild    # clear the rollup and count every call again
+
+Safe to run while the app is serving: calls are claimed with the same atomic
+"stats_counted = false -> true" update as the status callback, so nothing is counted twice.
+--rebuild briefly shows partial numbers while it recounts.
+"""
+import argparse
+import time
+from sqlalchemy import or_, update
+from app.database import SessionLocal, engine
+from app.migrations import upgrade
+from app import models, call_stats
+
+BATCH = 5_000
+
+
+def rebuild(db):
+    db.query(models.CallStatDaily).delete()
+    db.execute(update(models.Call.__table__).values(stats_counted=False))
+    db.commit()
+
+
+def backfill(db, batch: int = BATCH) -> int:
+    # Keyset over call_sid (primary key) so each batch is an index range, not a rescan
+    Call = models.Call
+    counted = 0
+    last_sid = ""
+    while True:
+        sids = [sid for (sid,) in db.query(Call.call_sid).filter(
+            Call.call_sid > last_sid,
+            or_(Call.stats_counted.is_(None), Call.stats_counted == False)  # noqa: E712
+        ).order_by(Call.call_sid).limit(batch)]
+        if not sids:
+            return counted
+        last_sid = sids[-1]
+        counted += call_stats.count_calls(db, Call.call_sid.in_(sids))
+        db.commit()
+        print(f"- {counted:,} calls counted", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rebuild", action="store_true", help="clear the rollup and recount everything")
+    parser.add_argument("--batch", type=int, default=BATCH)
+    args = parser.parse_args()
+
+    upgrade(engine)
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        if args.rebuild:
+            rebuild(db)
+        counted = backfill(db, args.batch)
+        print(f"Backfill completed: {counted:,} calls in {time.perf_counter() - started:.1f}s")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
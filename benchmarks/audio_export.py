@@ -0,0 +1,146 @@
+"""
+Audio archive export throughput against a fake recording server.
+
+    python benchmarks/audio_export.py [--calls 300] [--answers 2] [--kb 200] [--latency-ms 80]
+
+Starts a local HTTP server that answers Twilio recording URLs with --kb of random bytes after
+--latency-ms (Twilio's per-request latency dominates, not bandwidth), generates calls with a call
+recording and --answers answer recordings each, then builds the encrypted ZIP with
+include_audio for each --workers value and reports recordings/s and MB/s. One recording in
+50 answers 404 and must show up as not_found in the manifest. Exits 1 if the archive does
+not decrypt to the expected recordings.
+"""
+import argparse
+import csv
+import io
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=300)
+    parser.add_argument("--answers", type=int, default=2)
+    parser.add_argument("--kb", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=80)
+    parser.add_argument("--workers", default="1,4,8,16")
+    parser.add_argument("--port", type=int, default=8791)
+    return parser.parse_args()
+
+
+args = parse_args()
+workdir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'audio_export.db')}"
+os.environ["TWILIO_API_BASE"] = f"http://127.0.0.1:{args.port}"
+os.environ["TWILIO_ACCOUNT_SID"] = "ACbench"
+os.environ["TWILIO_AUTH_TOKEN"] = "bench"
+os.environ["RECORDINGS_DIR"] = os.path.join(workdir, "recordings")  # empty: every file is fetched
+os.environ["RECORDINGS_MAX_CONNECTIONS"] = str(max(int(w) for w in args.workers.split(",")))
+
+import pyzipper  # noqa: E402
+from app.database import SessionLocal, engine  # noqa: E402
+from app.migrations import upgrade  # noqa: E402
+from app import models, log_export  # noqa: E402
+
+PAYLOAD = os.urandom(args.kb * 1024)
+
+
+class FakeTwilio(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like api.twilio.com
+
+    def do_GET(self):
+        time.sleep(args.latency_ms / 1000)
+        sid = self.path.rsplit("/", 1)[-1].split(".")[0]
+        if int(sid[-4:], 16) % 50 == 49:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "audio/mpeg")
+        self.send_header("Content-Length", str(len(PAYLOAD)))
+        self.end_headers()
+        self.wfile.write(PAYLOAD)
+
+    def log_message(self, *_):
+        pass
+
+
+def populate() -> int:
+    upgrade(engine)
+    db = SessionLocal()
+    try:
+        start = datetime(2025, 1, 1)
+        calls, answers, n = [], [], 0
+        for i in range(args.calls):
+            sid = f"CA{i:032x}"
+            calls.append({"call_sid": sid, "recording_sid": f"RE{n:032x}", "started_at": start + timedelta(minutes=i)})
+            n += 1
+            for _ in range(args.answers):
+                answers.append({"call_sid": sid, "recording_sid": f"RE{n:032x}"})
+                n += 1
+        db.execute(models.Call.__table__.insert(), calls)
+        db.execute(models.Answer.__table__.insert(), answers)
+        db.commit()
+        return n
+    finally:
+        db.close()
+
+
+def verify(path: str, recordings: int):
+    missing = sum(1 for n in range(recordings) if n % 50 == 49)
+    with pyzipper.AESZipFile(path) as zf:
+        zf.setpassword(log_export.ZIP_PASSWORD)
+        audio = [name for name in zf.namelist() if name.endswith(".mp3")]
+        manifest_name = next(name for name in zf.namelist() if name.endswith("_recordings.csv"))
+        manifest = list(csv.DictReader(io.StringIO(zf.read(manifest_name).decode("utf-8"))))
+        sample = zf.read(audio[0]) if audio else b""
+    ok = (
+        len(audio) == recordings - missing
+        and len(manifest) == recordings
+        and sum(row["Result"] == "not_found" for row in manifest) == missing
+        and sample == PAYLOAD
+    )
+    return ok, len(audio), missing
+
+
+def main():
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), FakeTwilio)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    recordings = populate()
+    print(f"{args.calls:,} calls, {recordings:,} recordings of {args.kb} KB, {args.latency_ms:.0f} ms per request")
+    print(f"{'workers':>8} {'seconds':>9} {'rec/s':>8} {'MB/s':>8} {'ZIP MB':>8}")
+
+    failures = 0
+    for workers in [int(w) for w in args.workers.split(",")]:
+        path = os.path.join(workdir, f"audio_{workers}.zip")
+        last = {}
+        started = time.perf_counter()
+        with open(path, "wb") as out:
+            for chunk in log_export.stream_zip(
+                log_export.ExportFilters(include_audio=True),
+                audio_workers=workers,
+                progress=lambda done, total, failed, written: last.update(done=done, total=total, bytes=written),
+            ):
+                out.write(chunk)
+        elapsed = time.perf_counter() - started
+        ok, files, missing = verify(path, recordings)
+        failures += not ok or last.get("done") != recordings or last.get("total") != recordings
+        print(f"{workers:>8} {elapsed:>9.2f} {recordings / elapsed:>8.1f} "
+              f"{last['bytes'] / elapsed / 1024 / 1024:>8.1f} {os.path.getsize(path) / 1024 / 1024:>8.1f}"
+              f"{'' if ok else '  INVALID ARCHIVE'}", flush=True)
+    server.shutdown()
+    print(f"{files:,} recordings archived, {missing} not found at the source (listed in the manifest)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
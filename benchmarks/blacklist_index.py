@@ -0,0 +1,66 @@
+"""
+Benchmark the in-process opt-out index on a multi-million-entry list.
+
+    python benchmarks/blacklist_index.py [--size 5000000] [--lookups 1000000]
+
+For each mode (set / bloom) reports build time, memory held by the index (tracemalloc),
+lookup throughput for hits and misses, and the observed Bloom false-positive rate
+(false positives are confirmed against the DB in production, so they cost one PK lookup).
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.blacklist import BlacklistIndex  # noqa: E402
+
+
+def numbers(count: int, seed: int):
+    rng = random.Random(seed)
+    for _ in range(count):
+        yield f"+8190{rng.randrange(10 ** 8):08d}"
+
+
+def bench(mode: str, size: int, lookups: int):
+    tracemalloc.start()
+    index = BlacklistIndex(mode=mode)
+    start = time.perf_counter()
+    index.build(numbers(size, seed=1), expected=size)
+    build_seconds = time.perf_counter() - start
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    hits = list(numbers(lookups, seed=1))
+    misses = [f"+8180{i:08d}" for i in range(lookups)]
+
+    start = time.perf_counter()
+    for number in hits:
+        index._maybe_contains(number)
+    hit_rate = lookups / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    false_positives = sum(1 for number in misses if index._maybe_contains(number))
+    miss_rate = lookups / (time.perf_counter() - start)
+
+    print(f"{mode:5s}  build {build_seconds:6.1f}s  memory {memory / 1e6:8.1f} MB  "
+          f"hit {hit_rate / 1e6:5.2f}M/s  miss {miss_rate / 1e6:5.2f}M/s  "
+          f"false positives {false_positives / lookups:.4%}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=5_000_000)
+    parser.add_argument("--lookups", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    print(f"{args.size:,} blacklisted numbers, {args.lookups:,} lookups each")
+    for mode in ("set", "bloom"):
+        bench(mode, args.size, args.lookups)
+
+
+if __name__ == "__main__":
+    main()
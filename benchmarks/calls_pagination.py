@@ -0,0 +1,117 @@
+"""
+Call-log page latency by page depth: OFFSET + joinedload vs keyset cursor + selectinload.
+
+    python benchmarks/calls_pagination.py [--calls 1000000] [--db /tmp/calls_bench.db]
+
+Generates the dataset once (reused on later runs: same --db and --calls), then times
+read_calls (offset) and read_calls_page (cursor on started_at, call_sid) at increasing
+depths. Each timing is the median of --repeat runs; 100 rows per page.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=1_000_000)
+    parser.add_argument("--db", default="/tmp/calls_bench.db")
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=5)
+    return parser.parse_args()
+
+
+args = parse_args()
+os.environ["DATABASE_URL"] = f"sqlite:///{args.db}"
+
+from app.database import SessionLocal, engine, Base  # noqa: E402
+from app import models, pagination  # noqa: E402
+from app.routers.admin import read_calls, read_calls_page  # noqa: E402
+
+
+def populate(calls: int, batch: int = 50_000):
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        if db.query(models.Call).count() >= calls:
+            return
+        print(f"generating {calls:,} calls ...", flush=True)
+        db.query(models.Answer).delete()
+        db.query(models.Call).delete()
+        scenario = models.Scenario(name="bench", greeting_text="bench")
+        db.add(scenario)
+        db.flush()
+        question = models.Question(scenario_id=scenario.id, text="q", sort_order=1)
+        db.add(question)
+        db.commit()
+
+        rng = random.Random(1)
+        start = datetime(2025, 1, 1)
+        for offset in range(0, calls, batch):
+            rows, answers = [], []
+            for i in range(offset, min(offset + batch, calls)):
+                sid = f"CA{i:032x}"
+                rows.append({
+                    "call_sid": sid,
+                    "from_number": "+815012345678",
+                    "to_number": f"+8190{rng.randrange(10 ** 8):08d}",
+                    "scenario_id": scenario.id,
+                    "status": "completed",
+                    "direction": "outbound",
+                    "started_at": start + timedelta(seconds=i * 30 + rng.randrange(30)),
+                })
+                if i % 5 == 0:  # a fifth of the calls reached the questions
+                    answers += [{"call_sid": sid, "question_id": question.id, "transcript_text": "はい"}] * 3
+            db.execute(models.Call.__table__.insert(), rows)
+            db.execute(models.Answer.__table__.insert(), answers)
+            db.commit()
+    finally:
+        db.close()
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    populate(args.calls)
+    db = SessionLocal()
+    size = args.page_size
+    filters = dict(to_number=None, from_number=None, start_date=None, end_date=None, scenario_id=None)
+    print(f"{args.calls:,} calls, {size} per page, median of {args.repeat}")
+    print(f"{'page':>8} {'offset':>10} {'offset ms':>10} {'keyset ms':>10}")
+    try:
+        for page in (1, 10, 100, 1_000, 5_000, 9_999):
+            skip = (page - 1) * size
+            if skip >= args.calls:
+                break
+            cursor = None
+            if skip:
+                # Cursor of the last row of the previous page (not timed)
+                last = db.query(models.Call.started_at, models.Call.call_sid).order_by(
+                    models.Call.started_at.desc(), models.Call.call_sid.desc()
+                ).offset(skip - 1).first()
+                cursor = pagination.encode_cursor(last.started_at, last.call_sid)
+
+            offset_ms = timed(lambda: read_calls(skip=skip, limit=size, db=db, **filters), args.repeat)
+            db.expunge_all()
+            keyset_ms = timed(lambda: read_calls_page(cursor=cursor, limit=size, db=db, **filters), args.repeat)
+            db.expunge_all()
+            print(f"{page:>8,} {skip:>10,} {offset_ms:>10.1f} {keyset_ms:>10.1f}", flush=True)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
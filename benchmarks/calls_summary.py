@@ -0,0 +1,110 @@
+"""
+Call-log list payload: full CallLog objects vs the /calls/summary projection.
+
+    python benchmarks/calls_summary.py [--calls 20000] [--page 1000] [--db /tmp/calls_summary_bench.db]
+
+Generates calls with answers, messages and a full transcript once (reused on later runs),
+then requests one page of --page rows from /admin/calls/ (nested CallLog, as the logs page
+used to) and from /admin/calls/summary through the ASGI app, and reports response size
+and median request time over --repeat runs.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=20_000)
+    parser.add_argument("--page", type=int, default=1000)
+    parser.add_argument("--db", default="/tmp/calls_summary_bench.db")
+    parser.add_argument("--repeat", type=int, default=5)
+    return parser.parse_args()
+
+
+args = parse_args()
+os.environ["DATABASE_URL"] = f"sqlite:///{args.db}"
+
+from fastapi.testclient import TestClient  # noqa: E402
+from app.main import app  # noqa: E402
+from app.database import SessionLocal, engine  # noqa: E402
+from app.migrations import upgrade  # noqa: E402
+from app import models  # noqa: E402
+
+TRANSCRIPT = "お電話ありがとうございます。担当の者から改めてご連絡いたします。" * 20
+
+
+def populate(calls: int, batch: int = 5_000):
+    upgrade(engine)
+    db = SessionLocal()
+    try:
+        if db.query(models.Call).count() >= calls:
+            return
+        print(f"generating {calls:,} calls ...", flush=True)
+        scenario = models.Scenario(name="bench", greeting_text="bench")
+        db.add(scenario)
+        db.flush()
+        questions = [models.Question(scenario_id=scenario.id, text=f"質問{i}です。ご都合はいかがですか", sort_order=i) for i in range(5)]
+        db.add_all(questions)
+        db.commit()
+
+        rng = random.Random(1)
+        start = datetime(2025, 1, 1)
+        for offset in range(0, calls, batch):
+            rows, answers, messages = [], [], []
+            for i in range(offset, min(offset + batch, calls)):
+                sid = f"CA{i:032x}"
+                rows.append({
+                    "call_sid": sid, "from_number": "+815012345678",
+                    "to_number": f"+8190{rng.randrange(10 ** 8):08d}", "scenario_id": scenario.id,
+                    "status": "completed", "direction": "outbound", "recording_sid": f"RE{i:032x}",
+                    "transcript_full": TRANSCRIPT, "started_at": start + timedelta(seconds=i * 30),
+                })
+                answers += [{
+                    "call_sid": sid, "question_id": q.id, "transcript_text": "はい、来週の火曜日の午後なら大丈夫です",
+                    "recording_sid": f"RE{i:030x}{q.sort_order:02d}", "recording_url_twilio": f"https://api.twilio.com/rec/RE{i:032x}",
+                    "transcript_status": "completed", "created_at": start,
+                } for q in questions]
+                messages.append({"call_sid": sid, "transcript_text": "折り返しお願いします", "created_at": start})
+            db.execute(models.Call.__table__.insert(), rows)
+            db.execute(models.Answer.__table__.insert(), answers)
+            db.execute(models.Message.__table__.insert(), messages)
+            db.commit()
+    finally:
+        db.close()
+
+
+def measure(client, url):
+    samples, size = [], 0
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        response = client.get(url)
+        samples.append((time.perf_counter() - started) * 1000)
+        response.raise_for_status()
+        size = len(response.content)
+    return statistics.median(samples), size
+
+
+def main():
+    populate(args.calls)
+    with TestClient(app) as client:
+        client.auth = ("admin", "attendme")
+        full_ms, full_size = measure(client, f"/admin/calls/?limit={args.page}")
+        summary_ms, summary_size = measure(client, f"/admin/calls/summary?limit={args.page}")
+        detail_ms, detail_size = measure(client, f"/admin/calls/CA{0:032x}")
+    print(f"{args.page:,}-row page, median of {args.repeat}")
+    print(f"{'endpoint':<18} {'KiB':>10} {'ms':>10}")
+    print(f"{'/calls/':<18} {full_size / 1024:>10.1f} {full_ms:>10.1f}")
+    print(f"{'/calls/summary':<18} {summary_size / 1024:>10.1f} {summary_ms:>10.1f}")
+    print(f"{'/calls/{sid}':<18} {detail_size / 1024:>10.1f} {detail_ms:>10.1f}  (one expanded row)")
+    print(f"payload x{full_size / summary_size:.1f} smaller, time x{full_ms / summary_ms:.1f} faster")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Concurrent writes per database engine profile (app/database.py).
+
+    python benchmarks/db_concurrent_writes.py [--writers 8] [--readers 2] [--seconds 5]
+    python benchmarks/db_concurrent_writes.py --postgres-url postgresql://...   # adds the postgresql profile
+
+Runs the write pattern of the webhooks, transcription tasks and bridge (insert a call, move
+its target to completed, commit) from --writers threads, while --readers threads run the
+dashboard's status counts, against a fresh database for each profile. Each profile runs in
+its own process because the engine is built at import. Reports committed writes/s, commit
+latency percentiles, failed writes ("database is locked") and the pool's checkout wait
+from app/db_pool.py.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--readers", type=int, default=2)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--targets", type=int, default=50_000)
+    parser.add_argument("--postgres-url")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def percentile(values: list, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))] if values else 0.0
+
+
+def child(args) -> dict:
+    # DATABASE_URL and DB_PROFILE are set by the parent before the app is imported
+    from sqlalchemy import func
+    from sqlalchemy.exc import OperationalError
+    from app.database import SessionLocal, engine, ENGINE_PROFILE
+    from app.migrations import upgrade
+    from app import models, db_pool
+
+    upgrade(engine)
+    db = SessionLocal()
+    scenario = models.Scenario(name="bench", greeting_text="bench")
+    db.add(scenario)
+    db.flush()
+    scenario_id = scenario.id
+    db.execute(models.CallTarget.__table__.insert(), [
+        {"scenario_id": scenario_id, "phone_number": f"+8190{i:08d}", "status": "calling"} for i in range(args.targets)
+    ])
+    first_id = db.query(func.min(models.CallTarget.id)).filter(models.CallTarget.scenario_id == scenario_id).scalar()
+    db.commit()
+    db.close()
+    db_pool.sync_metrics.reset()
+
+    deadline = time.perf_counter() + args.seconds
+    latencies, failures, reads = [], [0], [0]
+    lock = threading.Lock()
+    counter = iter(range(10 ** 9))
+
+    def writer():
+        while time.perf_counter() < deadline:
+            n = next(counter)
+            started = time.perf_counter()
+            db = SessionLocal()
+            try:
+                db.add(models.Call(
+                    call_sid=f"CA{os.getpid():08x}{n:024x}", from_number="+815012345678",
+                    to_number=f"+8190{n % args.targets:08d}", scenario_id=scenario_id,
+                    call_target_id=first_id + n % args.targets, status="completed", direction="outbound",
+                ))
+                db.query(models.CallTarget).filter(models.CallTarget.id == first_id + n % args.targets).update(
+                    {"status": "completed"}, synchronize_session=False
+                )
+                db.commit()
+                with lock:
+                    latencies.append((time.perf_counter() - started) * 1000)
+            except OperationalError:
+                db.rollback()
+                with lock:
+                    failures[0] += 1
+            finally:
+                db.close()
+
+    def reader():
+        while time.perf_counter() < deadline:
+            db = SessionLocal()
+            try:
+                db.query(models.CallTarget.status, func.count()).filter(
+                    models.CallTarget.scenario_id == scenario_id
+                ).group_by(models.CallTarget.status).all()
+                with lock:
+                    reads[0] += 1
+            except OperationalError:
+                with lock:
+                    failures[0] += 1
+            finally:
+                db.close()
+
+    threads = [threading.Thread(target=writer) for _ in range(args.writers)]
+    threads += [threading.Thread(target=reader) for _ in range(args.readers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    pool = db_pool.sync_metrics.snapshot()
+    return {
+        "profile": ENGINE_PROFILE["name"],
+        "writes_per_s": len(latencies) / elapsed,
+        "reads_per_s": reads[0] / elapsed,
+        "p50_ms": percentile(latencies, 0.5),
+        "p99_ms": percentile(latencies, 0.99),
+        "failed": failures[0],
+        "wait_p99_ms": pool["wait_ms"]["p99"] or 0.0,
+        "peak_checked_out": pool["peak_checked_out"],
+    }
+
+
+def main():
+    args = parse_args()
+    if args.child:
+        print(json.dumps(child(args)))
+        return 0
+
+    workdir = tempfile.mkdtemp()
+    runs = [(profile, f"sqlite:///{os.path.join(workdir, profile + '.db')}") for profile in ("sqlite-journal", "sqlite")]
+    if args.postgres_url:
+        runs.append(("postgresql", args.postgres_url))
+    print(f"{args.writers} writer threads + {args.readers} reader threads, {args.seconds:g} s per profile")
+    print(f"{'profile':<15} {'writes/s':>9} {'reads/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'failed':>7} {'wait p99':>9} {'peak conns':>11}")
+    for profile, url in runs:
+        env = dict(os.environ, DATABASE_URL=url, DB_PROFILE=profile)
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", profile, "--writers", str(args.writers),
+             "--readers", str(args.readers), "--seconds", str(args.seconds), "--targets", str(args.targets)],
+            env=env, capture_output=True, text=True,
+        )
+        if output.returncode:
+            print(f"{profile:<15} failed:\n{output.stderr}")
+            return 1
+        r = json.loads(output.stdout.strip().splitlines()[-1])
+        print(f"{r['profile']:<15} {r['writes_per_s']:>9.0f} {r['reads_per_s']:>9.0f} {r['p50_ms']:>8.1f} {r['p99_ms']:>8.1f} "
+              f"{r['failed']:>7} {r['wait_p99_ms']:>9.1f} {r['peak_checked_out']:>11}", flush=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
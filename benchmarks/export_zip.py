@@ -0,0 +1,135 @@
+"""
+Streaming call-log ZIP export: memory stays bounded regardless of the number of calls.
+
+    python benchmarks/export_zip.py [--calls 500000] [--db /tmp/export_bench.db] [--max-mb 64]
+
+Generates the dataset once (reused on later runs), then consumes log_export.stream_zip
+like the HTTP response would, tracking Python heap peak (tracemalloc), time to first
+chunk and throughput. Exits 1 if the peak exceeds --max-mb or the archive does not
+decrypt back to one row per answer / message.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=500_000)
+    parser.add_argument("--db", default="/tmp/export_bench.db")
+    parser.add_argument("--max-mb", type=float, default=64)
+    return parser.parse_args()
+
+
+args = parse_args()
+os.environ["DATABASE_URL"] = f"sqlite:///{args.db}"
+
+import pyzipper  # noqa: E402
+from app.database import SessionLocal, engine  # noqa: E402
+from app.migrations import upgrade  # noqa: E402
+from app import models, log_export  # noqa: E402
+
+
+def populate(calls: int, batch: int = 50_000):
+    upgrade(engine)
+    db = SessionLocal()
+    try:
+        if db.query(models.Call).count() >= calls:
+            return
+        print(f"generating {calls:,} calls ...", flush=True)
+        db.query(models.Answer).delete()
+        db.query(models.Message).delete()
+        db.query(models.Call).delete()
+        scenario = models.Scenario(name="bench", greeting_text="bench")
+        db.add(scenario)
+        db.flush()
+        questions = [models.Question(scenario_id=scenario.id, text=f"質問{i}", sort_order=i) for i in range(3)]
+        db.add_all(questions)
+        db.commit()
+
+        rng = random.Random(1)
+        start = datetime(2025, 1, 1)
+        for offset in range(0, calls, batch):
+            rows, answers, messages = [], [], []
+            for i in range(offset, min(offset + batch, calls)):
+                sid = f"CA{i:032x}"
+                rows.append({
+                    "call_sid": sid,
+                    "from_number": "+815012345678",
+                    "to_number": f"+8190{rng.randrange(10 ** 8):08d}",
+                    "scenario_id": scenario.id,
+                    "status": "completed",
+                    "direction": "outbound",
+                    "started_at": start + timedelta(seconds=i * 30),
+                })
+                if i % 5 == 0:
+                    answers += [{
+                        "call_sid": sid, "question_id": q.id, "answer_type": "recording",
+                        "transcript_text": "はい、大丈夫です", "recording_url_twilio": f"https://api.twilio.com/rec/RE{i:032x}",
+                    } for q in questions]
+                if i % 50 == 0:
+                    messages.append({"call_sid": sid, "recording_sid": f"RE{i:032x}", "transcript_text": "折り返しお願いします"})
+            db.execute(models.Call.__table__.insert(), rows)
+            db.execute(models.Answer.__table__.insert(), answers)
+            db.execute(models.Message.__table__.insert(), messages)
+            db.commit()
+    finally:
+        db.close()
+
+
+def main():
+    populate(args.calls)
+    db = SessionLocal()
+    try:
+        calls = db.query(models.Call).count()
+        answers = db.query(models.Answer).count()
+        calls_with_answers = db.query(models.Answer.call_sid).distinct().count()
+        messages = db.query(models.Message).count()
+    finally:
+        db.close()
+    expected_logs = answers + (calls - calls_with_answers)
+
+    out = tempfile.NamedTemporaryFile(suffix=".zip", delete=False)
+    tracemalloc.start()
+    started = time.perf_counter()
+    first_chunk = None
+    size = 0
+    filters = log_export.ExportFilters(scenario_status="all")
+    for chunk in log_export.stream_zip(filters):
+        if first_chunk is None:
+            first_chunk = time.perf_counter() - started
+        size += len(chunk)
+        out.write(chunk)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    out.close()
+
+    peak_mb = peak / 1024 / 1024
+    print(f"{calls:,} calls, {answers:,} answers, {messages:,} messages")
+    print(f"zip {size / 1024 / 1024:.1f} MiB in {elapsed:.1f}s, first chunk after {first_chunk * 1000:.0f} ms")
+    print(f"python heap peak {peak_mb:.1f} MiB (limit {args.max_mb} MiB)")
+
+    ok = peak_mb <= args.max_mb
+    with pyzipper.AESZipFile(out.name) as zf:
+        zf.setpassword(log_export.ZIP_PASSWORD)
+        for info in zf.infolist():
+            with zf.open(info) as f:
+                lines = sum(1 for _ in f) - 1  # header
+            expected = expected_logs if info.filename.endswith("_logs.csv") else messages
+            print(f"{info.filename}: {lines:,} rows (expected {expected:,})")
+            ok = ok and lines == expected
+    os.unlink(out.name)
+    print("OK" if ok else "FAIL")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,90 @@
+"""
+Throughput of phone-number normalization/validation on a realistic mixed list.
+
+    python benchmarks/phone_normalize.py [--size 1000000] [--chunk 20000]
+
+Compares the plain per-row scalar path (uncached), the memoized scalar path on a warm
+cache, and the vectorized pandas path in import-sized chunks; checks that the bulk and
+scalar paths agree on every value. The bulk path only pays off with Arrow-backed strings
+(pyarrow installed); the string dtype in use is printed.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import phone  # noqa: E402
+
+FULL_WIDTH = str.maketrans("0123456789-+", "０１２３４５６７８９－＋")
+
+
+def sample_numbers(count: int, seed: int = 1):
+    rng = random.Random(seed)
+    for _ in range(count):
+        subscriber = f"{rng.randrange(10 ** 8):08d}"
+        kind = rng.random()
+        if kind < 0.45:
+            yield f"090-{subscriber[:4]}-{subscriber[4:]}"
+        elif kind < 0.60:
+            yield f"+8180{subscriber}"
+        elif kind < 0.70:
+            yield f"080-{subscriber[:4]}-{subscriber[4:]}".translate(FULL_WIDTH)
+        elif kind < 0.80:
+            yield f"03({subscriber[:4]}){subscriber[4:]}"
+        elif kind < 0.85:
+            yield f"9{subscriber}0"  # leading zero lost by a spreadsheet
+        elif kind < 0.90:
+            yield f"+1 415 {subscriber[:3]} {subscriber[3:7]}"
+        elif kind < 0.95:
+            yield subscriber[:rng.randrange(1, 8)]  # truncated
+        else:
+            yield rng.choice(["", "不明", "abc-defg", "090-1234-567X", "なし"])
+
+
+def rate(count: int, seconds: float) -> str:
+    return f"{count / seconds / 1e6:6.2f}M/s ({seconds:6.2f}s)"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=1_000_000)
+    parser.add_argument("--chunk", type=int, default=20_000)
+    args = parser.parse_args()
+
+    values = list(sample_numbers(args.size))
+    print(f"{len(values):,} numbers, chunk size {args.chunk:,}, bulk string dtype {phone._string_dtype()}")
+
+    uncached = phone.validate.__wrapped__
+    start = time.perf_counter()
+    scalar = [uncached(value) for value in values]
+    print(f"scalar (uncached)   {rate(len(values), time.perf_counter() - start)}")
+
+    phone.validate.cache_clear()
+    for value in values[:50_000]:
+        phone.validate(value)
+    repeated = values[:50_000] * (len(values) // 50_000)
+    start = time.perf_counter()
+    for value in repeated:
+        phone.validate(value)
+    print(f"scalar (warm cache) {rate(len(repeated), time.perf_counter() - start)}")
+
+    start = time.perf_counter()
+    bulk_numbers, bulk_reasons = [], []
+    for i in range(0, len(values), args.chunk):
+        result = phone.normalize_bulk(values[i:i + args.chunk])
+        bulk_numbers.extend(result["number"].tolist())
+        bulk_reasons.extend(result["reason"].tolist())
+    print(f"bulk (pandas)       {rate(len(values), time.perf_counter() - start)}")
+
+    mismatches = sum(1 for pair, n, r in zip(scalar, bulk_numbers, bulk_reasons) if pair != (n, r))
+    invalid = sum(1 for _, reason in scalar if reason)
+    print(f"invalid {invalid:,} ({invalid / len(values):.1%}), bulk/scalar mismatches {mismatches}")
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Simulate call outcomes against the adaptive PacingController.
+
+Runs on a virtual clock (no Twilio, no DB). Each placed call rings for a random time, is answered
+with probability ANSWER_RATE (which shifts halfway through to check the controller adapts),
+and an answered call keeps a live AI session for a log-normal duration.
+
+    python benchmarks/simulate_pacing.py [--target 5] [--minutes 120] [--seed 1]
+
+Prints the live-session tracking error and a coarse time series of the pacing decisions.
+Exits 1 if the mean absolute tracking error exceeds the target by more than 50%.
+"""
+import argparse
+import heapq
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.pacing import PacingController  # noqa: E402
+
+
+def simulate(target: int, minutes: int, seed: int, tick: float = 1.0):
+    rng = random.Random(seed)
+    controller = PacingController(target_live_sessions=target, max_rate=5.0, history_size=int(minutes * 60 / tick))
+    events = []  # (time, kind, call id, duration)
+    next_id = 0
+    now = 0.0
+    end = minutes * 60.0
+    errors = []
+
+    while now < end:
+        # Answer rate drops from 35% to 15% halfway through, mean talk time from 90s to 150s
+        answer_rate, mean_duration = (0.35, 90.0) if now < end / 2 else (0.15, 150.0)
+
+        while events and events[0][0] <= now:
+            _, kind, call_id, duration = heapq.heappop(events)
+            if kind == "answered":
+                controller.session_started(call_id)
+                heapq.heappush(events, (now + duration, "hangup", call_id, duration))
+            elif kind == "hangup":
+                controller.session_ended()
+                controller.record_outcome(call_id, "completed", int(duration))
+            else:
+                controller.record_outcome(call_id, kind)
+
+        for _ in range(controller.take(max_calls=10, now=now)):
+            next_id += 1
+            controller.call_dialed(next_id)
+            ring = rng.uniform(5, 30)
+            if rng.random() < answer_rate:
+                duration = rng.lognormvariate(0, 0.5) * mean_duration
+                heapq.heappush(events, (now + ring, "answered", next_id, duration))
+            else:
+                outcome = rng.choice(["no-answer", "no-answer", "busy", "failed"])
+                heapq.heappush(events, (now + ring, outcome, next_id, 0))
+
+        if now > 300:  # ignore warm-up
+            errors.append(abs(controller.live_sessions - target))
+        now += tick
+
+    return controller, errors
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--target", type=int, default=5)
+    parser.add_argument("--minutes", type=int, default=120)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    controller, errors = simulate(args.target, args.minutes, args.seed)
+    mae = sum(errors) / max(len(errors), 1)
+
+    print(f"target live sessions: {args.target}")
+    print(f"mean |live - target|: {mae:.2f}")
+    print(f"final answer_rate={controller.answer_rate:.3f} avg_duration={controller.avg_duration:.1f}s rate={controller.rate:.3f}/s")
+    print("t(min)  rate/s  live  in_flight  answer_rate")
+    history = list(controller.history)
+    for point in history[::max(len(history) // 12, 1)]:
+        print(f"{point['t'] / 60:6.1f}  {point['rate']:6.3f}  {point['live']:4d}  {point['in_flight']:9d}  {point['answer_rate']:.3f}")
+
+    if mae > args.target * 0.5:
+        print("FAIL: controller does not track the target")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Cold start of the API process: import-time profile and time to the first answered webhook.
+
+    python benchmarks/startup_latency.py [--runs 3] [--top 15]
+
+1. Import profile: runs `python -X importtime -c "import app.main"` in a fresh process and
+   lists the slowest top-level imports (cumulative), then checks that the SDKs deferred to
+   the warm-up (app/warmup.py) and pandas are not imported by app.main. Exits 1 if one is.
+2. Startup latency: starts uvicorn on a fresh SQLite database --runs times and measures the
+   time until GET / answers, the latency of the first POST /twilio/voice right after that
+   (what Twilio waits for after a deploy or a scale-from-zero), and of a webhook once the
+   warm-up has finished. Run with MIGRATE_ON_STARTUP=0 also measured on a migrated database.
+"""
+import argparse
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFERRED = ("twilio.rest", "openai", "pyzipper", "pandas")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--warmup-wait", type=float, default=5, help="seconds before the warm webhook")
+    return parser.parse_args()
+
+
+def import_profile(env: dict, top: int) -> int:
+    code = "import sys, app.main; print(','.join(m for m in %r if m in sys.modules))" % (DEFERRED,)
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT, env=env,
+                            capture_output=True, text=True)
+    if result.returncode:
+        print(result.stderr)
+        return 1
+    rows = []
+    for line in result.stderr.splitlines():
+        match = re.match(r"import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)", line)
+        if match:
+            rows.append((int(match.group(2)), len(match.group(3)) // 2, match.group(4)))
+    # Children are printed before their parent: app.main's subtree ends at app.main and
+    # starts after the previous top-level import
+    end = next(i for i, (_, depth, name) in enumerate(rows) if name == "app.main" and depth == 0)
+    start = max((i for i in range(end) if rows[i][1] == 0), default=-1) + 1
+    total = rows[end][0]
+    # Up to three levels down: the app's modules and the packages they import directly
+    interesting = [(us, name) for us, depth, name in rows[start:end] if depth <= 3]
+    print(f"import app.main: {total / 1000:.0f} ms")
+    for us, name in sorted(interesting, reverse=True)[:top]:
+        print(f"  {us / 1000:>7.0f} ms  {name}")
+    loaded = [name for name in result.stdout.strip().split(",") if name]
+    if loaded:
+        print(f"[FAIL] imported by app.main, should be deferred: {', '.join(loaded)}")
+        return 1
+    print(f"[  ok] deferred until first use / warm-up: {', '.join(DEFERRED)}")
+    return 0
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def webhook(client: httpx.Client, n: int) -> float:
+    started = time.perf_counter()
+    response = client.post("/twilio/voice", data={"To": "+815000000000", "From": "+819011112222", "CallSid": f"CA{n:032x}"})
+    response.raise_for_status()
+    return (time.perf_counter() - started) * 1000
+
+
+def start_once(env: dict, warmup_wait: float, n: int) -> tuple:
+    port = free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=30) as client:
+            while True:
+                try:
+                    client.get("/").raise_for_status()
+                    break
+                except httpx.TransportError:
+                    if server.poll() is not None:
+                        raise RuntimeError("uvicorn exited during startup")
+                    time.sleep(0.01)
+            ready = (time.perf_counter() - started) * 1000
+            first = webhook(client, n)
+            time.sleep(warmup_wait)
+            warm = webhook(client, n + 1)
+        return ready, first, warm
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    args = parse_args()
+    workdir = tempfile.mkdtemp()
+    base_env = dict(os.environ, EXPORT_DIR=os.path.join(workdir, "exports"), RECORDINGS_PREFETCH_CALLS="0")
+    base_env["PYTHONPATH"] = os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")]))
+    failed = import_profile(dict(base_env, DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'profile.db')}"), args.top)
+
+    print(f"\nuvicorn cold start, median of {args.runs}")
+    print(f"{'mode':<34} {'ready ms':>9} {'1st webhook ms':>15} {'warm webhook ms':>16}")
+    migrated = f"sqlite:///{os.path.join(workdir, 'migrated.db')}"
+    modes = [
+        ("fresh db, migrate on startup", lambda i: dict(base_env, DATABASE_URL=f"sqlite:///{os.path.join(workdir, f'fresh{i}.db')}")),
+        ("migrated db, MIGRATE_ON_STARTUP=0", lambda i: dict(base_env, DATABASE_URL=migrated, MIGRATE_ON_STARTUP="0")),
+    ]
+    subprocess.run([sys.executable, "migrate.py"], cwd=ROOT, env=dict(base_env, DATABASE_URL=migrated),
+                   check=True, capture_output=True)
+    for name, env in modes:
+        samples = [start_once(env(i), args.warmup_wait, 1000 * i) for i in range(args.runs)]
+        ready, first, warm = (statistics.median(column) for column in zip(*samples))
+        print(f"{name:<34} {ready:>9.0f} {first:>15.0f} {warm:>16.1f}", flush=True)
+    return failed
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+"""
+Outbound target list payload: the full /targets list vs one /targets/page page + /targets/counts.
+
+    python benchmarks/target_list.py [--targets 100000] [--db /tmp/target_list_bench.db]
+
+Generates one campaign of --targets targets with CSV metadata once (reused on later runs),
+then requests the whole list as the outbound page used to, the first compact page and
+the status counts through the ASGI app, and reports response size and median time.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--targets", type=int, default=100_000)
+    parser.add_argument("--page", type=int, default=200)
+    parser.add_argument("--db", default="/tmp/target_list_bench.db")
+    parser.add_argument("--repeat", type=int, default=5)
+    return parser.parse_args()
+
+
+args = parse_args()
+os.environ["DATABASE_URL"] = f"sqlite:///{args.db}"
+
+from fastapi.testclient import TestClient  # noqa: E402
+from app.main import app  # noqa: E402
+from app.database import SessionLocal, engine  # noqa: E402
+from app.migrations import upgrade  # noqa: E402
+from app import models  # noqa: E402
+
+STATUSES = ["pending", "completed", "no_answer", "busy", "failed"]
+
+
+def populate(targets: int, batch: int = 20_000) -> int:
+    upgrade(engine)
+    db = SessionLocal()
+    try:
+        scenario = db.query(models.Scenario).filter(models.Scenario.name == "bench").first()
+        if scenario and db.query(models.CallTarget).filter(models.CallTarget.scenario_id == scenario.id).count() >= targets:
+            return scenario.id
+        print(f"generating {targets:,} targets ...", flush=True)
+        scenario = models.Scenario(name="bench", greeting_text="bench")
+        db.add(scenario)
+        db.commit()
+        for offset in range(0, targets, batch):
+            db.execute(models.CallTarget.__table__.insert(), [{
+                "scenario_id": scenario.id, "phone_number": f"+8190{i:08d}", "status": STATUSES[i % len(STATUSES)],
+                "metadata_json": {"氏名": f"顧客{i}", "地域": "東京", "担当": "山田"},
+            } for i in range(offset, min(offset + batch, targets))])
+            db.commit()
+        return scenario.id
+    finally:
+        db.close()
+
+
+def measure(client, url):
+    samples, size = [], 0
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        response = client.get(url)
+        samples.append((time.perf_counter() - started) * 1000)
+        response.raise_for_status()
+        size = len(response.content)
+    return statistics.median(samples), size
+
+
+def main():
+    scenario_id = populate(args.targets)
+    with TestClient(app) as client:
+        client.auth = ("admin", "attendme")
+        results = [
+            ("/targets", *measure(client, f"/admin/scenarios/{scenario_id}/targets")),
+            ("/targets/page", *measure(client, f"/admin/scenarios/{scenario_id}/targets/page?limit={args.page}")),
+            ("/targets/counts", *measure(client, f"/admin/scenarios/{scenario_id}/targets/counts")),
+        ]
+    print(f"{args.targets:,} targets, {args.page}-row page, median of {args.repeat}")
+    print(f"{'endpoint':<18} {'KiB':>10} {'ms':>10}")
+    for name, ms, size in results:
+        print(f"{name:<18} {size / 1024:>10.1f} {ms:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Transcript search latency: LIKE scan vs the full-text index (app/search.py).
+
+    python benchmarks/transcript_search.py [--answers 1000000] [--db /tmp/search_bench.db]
+
+Generates a synthetic Japanese corpus once (answers made of random phrases, reused on later
+runs), then times the first page of /admin/search for rare, common and short queries
+against a plain LIKE '%q%' scan of answers.transcript_text. Median of --repeat runs.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--answers", type=int, default=1_000_000)
+    parser.add_argument("--db", default="/tmp/search_bench.db")
+    parser.add_argument("--repeat", type=int, default=5)
+    return parser.parse_args()
+
+
+args = parse_args()
+os.environ["DATABASE_URL"] = f"sqlite:///{args.db}"
+
+from app.database import SessionLocal, engine  # noqa: E402
+from app.migrations import upgrade  # noqa: E402
+from app import models, search  # noqa: E402
+
+PHRASES = [
+    "はい", "いいえ", "大丈夫です", "結構です", "午後なら", "午前中は", "会議中です", "担当者に",
+    "折り返し", "お電話ください", "検討します", "資料を送って", "今は忙しい", "来週の", "火曜日",
+    "木曜日", "見積もり", "契約について", "解約したい", "料金プラン", "よろしくお願いします",
+    "わかりました", "もう一度", "聞こえません", "東京都", "大阪府", "福岡県", "営業時間",
+]
+RARE = "定期点検の予約"  # inserted into 1 in 10,000 answers
+
+
+def populate(answers: int, batch: int = 100_000):
+    upgrade(engine)
+    db = SessionLocal()
+    try:
+        if db.query(models.Answer).count() >= answers:
+            return
+        print(f"generating {answers:,} answers ...", flush=True)
+        db.query(models.Answer).delete()
+        db.commit()
+        rng = random.Random(1)
+        for offset in range(0, answers, batch):
+            rows = []
+            for i in range(offset, min(offset + batch, answers)):
+                words = rng.choices(PHRASES, k=rng.randint(3, 8))
+                if i % 10_000 == 0:
+                    words.insert(rng.randrange(len(words)), RARE)
+                rows.append({"call_sid": f"CA{i // 3:032x}", "transcript_text": "、".join(words) + "。"})
+            db.execute(models.Answer.__table__.insert(), rows)  # FTS rows via the sync triggers
+            db.commit()
+    finally:
+        db.close()
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    populate(args.answers)
+    db = SessionLocal()
+    A = models.Answer
+    print(f"{args.answers:,} answers, first page of 20, median of {args.repeat}")
+    print(f"{'query':<16} {'LIKE ms':>10} {'search ms':>10}")
+    try:
+        for q in (RARE, "契約について", "資料を送って 午後なら", "電話", "該当なしの語句"):
+            terms = search.parse_terms(q)
+
+            def like():
+                query = db.query(A.id, A.transcript_text)
+                for term in terms:
+                    query = query.filter(A.transcript_text.like(f"%{term}%"))
+                return query.order_by(A.id.desc()).limit(20).all()
+
+            like_ms = timed(like, args.repeat)
+            search_ms = timed(lambda: search.search(db, q, limit=20, kind="answer"), args.repeat)
+            print(f"{q:<16} {like_ms:>10.1f} {search_ms:>10.1f}", flush=True)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Event-loop lag while Twilio webhooks hit the database: sync session vs async session.
+
+    python benchmarks/webhook_loop_lag.py [--calls 20000] [--webhooks 400] [--concurrency 50]
+    DATABASE_URL=postgresql://... python benchmarks/webhook_loop_lag.py
+
+The media stream relays audio on the same event loop as the webhooks, in 20 ms frames, so
+every millisecond a webhook blocks the loop is jitter on a live call. This runs a ticker that
+sleeps 5 ms and records how late it wakes up, while --webhooks status callbacks are posted
+through the ASGI app with --concurrency in flight: once against /twilio/status_callback (async
+session, as shipped) and once against the same handler body on the sync session (how the
+webhooks ran before), mounted on a benchmark-only route. Reports webhook throughput and the
+ticker's p50/p99/max lateness.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=20_000)
+    parser.add_argument("--webhooks", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--tick-ms", type=float, default=5)
+    return parser.parse_args()
+
+
+args = parse_args()
+if not os.environ.get("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "webhook_loop_lag.db")
+
+import httpx  # noqa: E402
+from fastapi import Depends, Form, Query  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+from app.main import app  # noqa: E402
+from app.database import SessionLocal, engine, get_db  # noqa: E402
+from app.migrations import upgrade  # noqa: E402
+from app import models, dialer, call_stats  # noqa: E402
+
+
+@app.post("/bench/status_callback_sync")
+async def status_callback_sync(
+    CallSid: str = Form(...),
+    CallStatus: str = Form(...),
+    CallDuration: int = Form(None),
+    call_target_id: int = Query(None),
+    db: Session = Depends(get_db)
+):
+    # The status callback as it was before the async session: blocking queries on the loop
+    call = db.query(models.Call).filter(models.Call.call_sid == CallSid).first()
+    target_id = call_target_id or (call.call_target_id if call else None)
+    if target_id:
+        dialer.finish_target(db, target_id, CallStatus)
+    if call:
+        call.status = CallStatus
+        if CallDuration is not None:
+            call.duration = CallDuration
+        call_stats.count_call(db, CallSid)
+    db.commit()
+    return "OK"
+
+
+def populate() -> list:
+    upgrade(engine)
+    db = SessionLocal()
+    try:
+        scenario = models.Scenario(name="bench", greeting_text="bench")
+        db.add(scenario)
+        db.flush()
+        db.execute(models.CallTarget.__table__.insert(), [
+            {"scenario_id": scenario.id, "phone_number": f"+8190{i:08d}", "status": "calling"} for i in range(args.calls)
+        ])
+        target_ids = [row[0] for row in db.query(models.CallTarget.id).filter(models.CallTarget.scenario_id == scenario.id)]
+        start = datetime(2025, 1, 1)
+        db.execute(models.Call.__table__.insert(), [{
+            "call_sid": f"CA{i:032x}", "from_number": "+815012345678", "to_number": f"+8190{i:08d}",
+            "scenario_id": scenario.id, "call_target_id": target_ids[i], "status": "in-progress",
+            "direction": "outbound", "started_at": start + timedelta(seconds=i),
+        } for i in range(args.calls)])
+        db.commit()
+        return target_ids
+    finally:
+        db.close()
+
+
+async def ticker(stop: asyncio.Event, lateness: list):
+    interval = args.tick_ms / 1000
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lateness.append((time.perf_counter() - started - interval) * 1000)
+
+
+async def run(client, url: str, offset: int, target_ids: list):
+    lateness, stop = [], asyncio.Event()
+    tick = asyncio.create_task(ticker(stop, lateness))
+    await asyncio.sleep(0.2)  # idle baseline samples
+    lateness.clear()
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def post(i: int):
+        n = (offset + i) % args.calls
+        async with semaphore:
+            response = await client.post(
+                f"{url}?call_target_id={target_ids[n]}",
+                data={"CallSid": f"CA{n:032x}", "CallStatus": "completed", "CallDuration": "30"},
+            )
+            response.raise_for_status()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(post(i) for i in range(args.webhooks)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await tick
+    lateness.sort()
+    return elapsed, lateness
+
+
+async def main():
+    target_ids = populate()
+    print(f"{args.calls:,} calls, {args.webhooks:,} status callbacks, {args.concurrency} in flight, "
+          f"{args.tick_ms:g} ms ticker ({engine.dialect.name})")
+    print(f"{'session':<8} {'webhooks/s':>11} {'lag p50 ms':>11} {'lag p99 ms':>11} {'lag max ms':>11}")
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+        for i, (name, url) in enumerate([
+            ("sync", "/bench/status_callback_sync"),
+            ("async", "/twilio/status_callback"),
+        ]):
+            elapsed, lateness = await run(client, url, i * args.webhooks, target_ids)
+            p99 = lateness[min(len(lateness) - 1, int(len(lateness) * 0.99))]
+            print(f"{name:<8} {args.webhooks / elapsed:>11.0f} {statistics.median(lateness):>11.2f} "
+                  f"{p99:>11.2f} {lateness[-1]:>11.2f}", flush=True)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
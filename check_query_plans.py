@@ -0,0 +1,144 @@
+"""
+Query-plan regression check for the hot admin / webhook / dialer queries.
+
+    python check_query_plans.py                 # throwaway SQLite database
+    DATABASE_URL=postgresql://... python check_query_plans.py
+
+Upgrades the database (app.migrations.upgrade), then EXPLAINs each query and exits 1
+if one of them scans a whole table or sorts rows that an index should return in order.
+Run it after touching app/models.py indexes or the queries below.
+"""
+import os
+import sys
+import tempfile
+
+if not os.environ.get("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "plans.db")
+
+from sqlalchemy import text  # noqa: E402
+from app.database import engine  # noqa: E402
+from app.migrations import upgrade  # noqa: E402
+
+# (name, sql, params, sorted_by_index)
+# sorted_by_index: the ORDER BY must be served by the index (no sort step in the plan)
+QUERIES = [
+    ("call log: first page",
+     "SELECT * FROM calls ORDER BY started_at DESC, call_sid DESC LIMIT 101",
+     {}, True),
+    ("call log: next page",
+     "SELECT * FROM calls WHERE (started_at, call_sid) < (:started_at, :call_sid) "
+     "ORDER BY started_at DESC, call_sid DESC LIMIT 101",
+     {"started_at": "2025-01-01 00:00:00", "call_sid": "CA0"}, True),
+    ("call log: by scenario",
+     "SELECT * FROM calls WHERE scenario_id = :scenario_id "
+     "ORDER BY started_at DESC, call_sid DESC LIMIT 101",
+     {"scenario_id": 1}, True),
+    ("call log: answers of a page",
+     "SELECT * FROM answers WHERE call_sid IN (:a, :b)",
+     {"a": "CA1", "b": "CA2"}, False),
+    ("call log: messages of a page",
+     "SELECT * FROM messages WHERE call_sid IN (:a, :b)",
+     {"a": "CA1", "b": "CA2"}, False),
+    ("call detail: by call_sid",
+     "SELECT * FROM calls WHERE call_sid = :call_sid",
+     {"call_sid": "CA1"}, False),
+    ("calls of a target",
+     "SELECT * FROM calls WHERE call_target_id = :target_id",
+     {"target_id": 1}, False),
+    ("stream setup: questions",
+     "SELECT * FROM questions WHERE scenario_id = :scenario_id ORDER BY sort_order",
+     {"scenario_id": 1}, True),
+    ("stream setup: ending guidances",
+     "SELECT * FROM ending_guidances WHERE scenario_id = :scenario_id ORDER BY sort_order",
+     {"scenario_id": 1}, True),
+    ("transcription logs of an answer",
+     "SELECT * FROM transcription_logs WHERE answer_id = :answer_id",
+     {"answer_id": 1}, False),
+    ("webhook: scenario by dialed number",
+     "SELECT * FROM phone_numbers WHERE to_number = :to_number",
+     {"to_number": "+81501234567"}, False),
+    ("dialer: claim due retries",
+     "SELECT id FROM call_targets WHERE scenario_id = :scenario_id AND status = 'scheduled' "
+     "AND next_attempt_at <= :now ORDER BY next_attempt_at LIMIT 10",
+     {"scenario_id": 1, "now": "2025-01-01 00:00:00"}, True),
+    ("dialer: claim pending",
+     "SELECT id FROM call_targets WHERE scenario_id = :scenario_id AND status = 'pending' "
+     "ORDER BY id LIMIT 10",
+     {"scenario_id": 1}, True),
+    ("dialer: claim expired leases",
+     "SELECT id FROM call_targets WHERE scenario_id = :scenario_id AND status = 'claimed' "
+     "AND lease_expires_at < :now ORDER BY id LIMIT 10",
+     {"scenario_id": 1, "now": "2025-01-01 00:00:00"}, True),
+    ("dialer: anything left",
+     "SELECT id FROM call_targets WHERE scenario_id = :scenario_id "
+     "AND status IN ('pending', 'scheduled', 'claimed', 'calling') LIMIT 1",
+     {"scenario_id": 1}, False),
+    ("targets of a scenario",
+     "SELECT * FROM call_targets WHERE scenario_id = :scenario_id",
+     {"scenario_id": 1}, False),
+    ("target list: page",
+     "SELECT id, phone_number, status FROM call_targets WHERE scenario_id = :scenario_id "
+     "AND id > :after ORDER BY id LIMIT 201",
+     {"scenario_id": 1, "after": 0}, True),
+    ("target list: page by status",
+     "SELECT id, phone_number, status FROM call_targets WHERE scenario_id = :scenario_id "
+     "AND status = :status AND id > :after ORDER BY id LIMIT 201",
+     {"scenario_id": 1, "status": "completed", "after": 0}, True),
+    ("target list: status counts",
+     "SELECT status, count(id) FROM call_targets WHERE scenario_id = :scenario_id GROUP BY status",
+     {"scenario_id": 1}, True),
+    ("target by number",
+     "SELECT * FROM call_targets WHERE scenario_id = :scenario_id AND phone_number = :phone",
+     {"scenario_id": 1, "phone": "+819012345678"}, False),
+    ("blacklist: incremental refresh",
+     "SELECT phone_number FROM blacklist WHERE created_at > :since",
+     {"since": "2025-01-01 00:00:00"}, False),
+]
+
+
+def sqlite_problems(conn, sql, params, sorted_by_index):
+    plan = [row[-1] for row in conn.execute(text("EXPLAIN QUERY PLAN " + sql), params)]
+    problems = []
+    for step in plan:
+        # "SCAN calls" = full table scan; "SCAN calls USING INDEX ..." walks an index in order
+        if step.startswith("SCAN ") and "USING" not in step:
+            problems.append(step)
+        if sorted_by_index and "TEMP B-TREE" in step:
+            problems.append(step)
+    return plan, problems
+
+
+def postgresql_problems(conn, sql, params, sorted_by_index):
+    plan = [row[0] for row in conn.execute(text("EXPLAIN " + sql), params)]
+    problems = []
+    for step in plan:
+        node = step.strip().lstrip("-> ").strip()
+        if node.startswith("Seq Scan"):
+            problems.append(node)
+        if sorted_by_index and (node.startswith("Sort ") or node.startswith("Incremental Sort")):
+            problems.append(node)
+    return plan, problems
+
+
+def main():
+    upgrade(engine)
+    dialect = engine.dialect.name
+    check = postgresql_problems if dialect == "postgresql" else sqlite_problems
+    failures = 0
+    with engine.connect() as conn:
+        if dialect == "postgresql":
+            # Empty tables make seq scans the cheapest plan; we only ask whether an index *can* be used
+            conn.execute(text("SET enable_seqscan = off"))
+        for name, sql, params, sorted_by_index in QUERIES:
+            plan, problems = check(conn, sql, params, sorted_by_index)
+            status = "FAIL" if problems else "ok"
+            print(f"[{status:>4}] {name}")
+            for step in plan:
+                print(f"         {step}")
+            failures += bool(problems)
+    print(f"{len(QUERIES) - failures}/{len(QUERIES)} queries use indexes ({dialect})")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
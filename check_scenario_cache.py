@@ -0,0 +1,153 @@
+"""
+Invalidation check for the scenario config cache (app/scenario_cache.py).
+
+    python check_scenario_cache.py                 # throwaway SQLite database
+    DATABASE_URL=postgresql://... python check_scenario_cache.py
+
+Drives the admin API in-process: reads every cached endpoint, then calls each write endpoint
+and checks that the next read returns the new data with a new ETag, that an unchanged read
+is a cache hit answered with 304 for its ETag, and that the realtime bridge's call config
+follows the same writes. Exits 1 on the first stale read. Run it after adding an endpoint
+that writes scenarios, questions or ending guidances.
+"""
+import os
+import sys
+import tempfile
+
+if not os.environ.get("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "scenario_cache.db")
+os.environ.setdefault("EXPORT_DIR", tempfile.mkdtemp())
+
+from fastapi.testclient import TestClient  # noqa: E402
+from app.main import app  # noqa: E402
+from app.database import SessionLocal  # noqa: E402
+from app import models, scenario_cache  # noqa: E402
+
+
+class Stale(Exception):
+    pass
+
+
+def expect(condition: bool, message: str):
+    if not condition:
+        raise Stale(message)
+
+
+class Reader:
+    """Remembers the last ETag of each URL, like a browser revalidating."""
+
+    def __init__(self, client):
+        self.client = client
+        self.etags = {}
+
+    def get(self, url: str):
+        response = self.client.get(url)
+        response.raise_for_status()
+        self.etags[url] = response.headers["etag"]
+        return response.json()
+
+    def revalidate(self, url: str) -> int:
+        return self.client.get(url, headers={"If-None-Match": self.etags[url]}).status_code
+
+
+def call_config(scenario_id: int):
+    db = SessionLocal()
+    try:
+        return scenario_cache.call_config(db, scenario_id)
+    finally:
+        db.close()
+
+
+def run(client) -> list:
+    reader = Reader(client)
+    checks = []
+
+    def changed(name: str, url: str, predicate):
+        # The write must show up on the next read, under a new ETag
+        old = reader.etags.get(url)
+        data = reader.get(url)
+        expect(predicate(data), f"{name}: {url} still serves the old data")
+        expect(reader.etags[url] != old, f"{name}: {url} kept its ETag")
+        expect(reader.revalidate(url) == 304, f"{name}: {url} did not answer 304 when unchanged")
+        checks.append(f"{name}: {url}")
+
+    base = {"name": "cache check", "greeting_text": "こんにちは"}
+    scenario = client.post("/admin/scenarios/", json=base).json()
+    sid = scenario["id"]
+    one, questions, endings = f"/admin/scenarios/{sid}", f"/admin/scenarios/{sid}/questions", f"/admin/scenarios/{sid}/ending_guidances"
+    listing = "/admin/scenarios/"
+
+    changed("create scenario", listing, lambda data: any(s["id"] == sid for s in data))
+    for url in (one, questions, endings):
+        reader.get(url)
+    expect(call_config(sid).questions == (), "call config: unexpected questions")
+
+    hits = scenario_cache.cache.hits
+    reader.get(one)
+    expect(scenario_cache.cache.hits == hits + 1, "unchanged read was not a cache hit")
+
+    client.put(one, json={**base, "name": "renamed"}).raise_for_status()
+    changed("update scenario", one, lambda data: data["name"] == "renamed")
+    changed("update scenario", listing, lambda data: any(s["name"] == "renamed" for s in data))
+
+    question = client.post("/admin/questions/", json={"scenario_id": sid, "text": "ご都合は？", "sort_order": 1}).json()
+    changed("create question", questions, lambda data: [q["text"] for q in data] == ["ご都合は？"])
+    expect(call_config(sid).questions == ("ご都合は？",), "create question: call config is stale")
+
+    client.put(f"/admin/questions/{question['id']}", json={"text": "ご都合は？", "sort_order": 1, "is_active": False}).raise_for_status()
+    changed("update question", questions, lambda data: data[0]["is_active"] is False)
+    expect(call_config(sid).questions == (), "update question: call config still asks an inactive question")
+
+    client.delete(f"/admin/questions/{question['id']}").raise_for_status()
+    changed("delete question", questions, lambda data: data == [])
+
+    guidance = client.post("/admin/ending_guidances/", json={"scenario_id": sid, "text": "失礼いたします", "sort_order": 1}).json()
+    changed("create ending", endings, lambda data: [g["text"] for g in data] == ["失礼いたします"])
+    changed("create ending", one, lambda data: [g["text"] for g in data["ending_guidances"]] == ["失礼いたします"])
+    expect(call_config(sid).ending_texts == ("失礼いたします",), "create ending: call config is stale")
+
+    client.put(f"/admin/ending_guidances/{guidance['id']}", json={"text": "ありがとうございました", "sort_order": 1}).raise_for_status()
+    changed("update ending", endings, lambda data: data[0]["text"] == "ありがとうございました")
+    changed("update ending", listing, lambda data: any(
+        [g["text"] for g in s["ending_guidances"]] == ["ありがとうございました"] for s in data
+    ))
+
+    client.delete(f"/admin/ending_guidances/{guidance['id']}").raise_for_status()
+    changed("delete ending", one, lambda data: data["ending_guidances"] == [])
+
+    # Dialing state is part of the scenario payload
+    db = SessionLocal()
+    try:
+        db.add(models.CallTarget(scenario_id=sid, phone_number="+819012345678", status="pending"))
+        db.commit()
+    finally:
+        db.close()
+    client.post(f"{one}/start_calls").raise_for_status()
+    changed("start calls", one, lambda data: data["is_dialing"] is True)
+    client.post(f"{one}/stop_all").raise_for_status()
+    changed("stop all", one, lambda data: data["is_dialing"] is False)
+    client.post(f"{one}/stop?mode=hard").raise_for_status()
+    changed("hard stop", one, lambda data: data["is_hard_stopped"] is True)
+
+    client.delete(one).raise_for_status()
+    changed("delete scenario", listing, lambda data: all(s["id"] != sid for s in data))
+    return checks
+
+
+def main():
+    with TestClient(app) as client:
+        client.auth = ("admin", "attendme")
+        try:
+            checks = run(client)
+        except Stale as e:
+            print(f"[FAIL] {e}")
+            return 1
+        stats = client.get("/admin/scenario_cache").json()
+    for check in checks:
+        print(f"[  ok] {check}")
+    print(f"{len(checks)} invalidation checks passed; cache {stats}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())